@@ -0,0 +1,37 @@
+"""Command line entry point: python -m src {extract,evaluate,serve,rules,templates} [options].
+
+Each subcommand imports its own stack only when it runs, so `evaluate`
+never loads pdfplumber, the OpenAI client or the pydantic rule schemas.
+"""
+
+import argparse
+import importlib
+import sys
+
+# command -> (module with a main(argv), summary)
+COMMANDS = {
+    "extract": ("src.pipeline", "extract applicability rules from AD PDFs"),
+    "evaluate": ("src.evaluation.stream", "evaluate a fleet file against extracted rules"),
+    "serve": ("src.service", "answer applicability queries over local HTTP"),
+    "rules": ("src.rule_store", "import, query and inspect the SQLite rule store"),
+    "templates": ("src.parsing.template_parser", "template fast-path hit rate and agreement with the LLM"),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src",
+        description="AD applicability pipeline",
+        epilog="commands:\n" + "\n".join(f"  {name:<10} {summary}" for name, (_, summary) in COMMANDS.items())
+               + "\n\nRun `python -m src <command> --help` for a command's options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command", help="one of the commands below")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    sys.argv[0] = f"python -m src {args.command}"  # usage lines in the subcommand's --help
+    return module.main(args.args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""On-disk content-addressed cache for LLM completions."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CACHE_PATH = os.environ.get("AD_LLM_CACHE_PATH", "data/cache/completions.sqlite")
+CACHE_MAX_BYTES = int(os.environ.get("AD_LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+CACHE_MAX_AGE = float(os.environ.get("AD_LLM_CACHE_MAX_AGE", 30 * 24 * 3600))
+# "on" (default), "off" to bypass reads and writes, "refresh" to ignore hits but store new results
+CACHE_MODE = os.environ.get("AD_LLM_CACHE", "on").lower()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_completions_accessed ON completions(accessed_at);
+CREATE INDEX IF NOT EXISTS idx_completions_created ON completions(created_at);
+"""
+
+def cache_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """Hash of (model, messages, params) in canonical JSON form."""
+    blob = json.dumps({"model": model, "messages": messages, "params": params},
+                      sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class CompletionCache:
+    """SQLite-backed completion cache, safe for several threads and processes."""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES,
+                 max_age: float = CACHE_MAX_AGE, evict_every: int = 50):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._init_done = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if not self._init_done:
+                    conn.executescript(_SCHEMA)
+                    self._init_done = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT payload, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.max_age and now - row[1] > self.max_age):
+            with self._lock:
+                self.misses += 1
+            return None
+        self._conn().execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, payload: Dict[str, Any]) -> None:
+        now = time.time()
+        data = json.dumps(payload, ensure_ascii=False, default=str)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO completions (key, model, payload, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", (key, model, data, len(data), now, now))
+        with self._lock:
+            self.writes += 1
+            due = self.writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM completions WHERE key = ?", (key,))
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        conn = self._conn()
+        removed = 0
+        if self.max_age:
+            removed += conn.execute("DELETE FROM completions WHERE created_at < ?",
+                                    (time.time() - self.max_age,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if self.max_bytes and total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM completions ORDER BY accessed_at"):
+                doomed.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM completions WHERE key = ?", doomed)
+            removed += len(doomed)
+        return removed
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM completions")
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "writes": self.writes,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "entries": row[0], "bytes": row[1]}
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> CompletionCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompletionCache()
+        return _cache
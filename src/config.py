@@ -1,40 +1,118 @@
-from openai import OpenAI
-from typing import List, Dict, Any
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
 
-BASE_URL = "https://llm.soji.ai"
-API_KEY = "sk-hZK5AkUvGO0CXMbg67j7Aw"
+from src.cache import CACHE_MODE, cache_key, get_cache
+from src.llm_client import CircuitBreaker, CircuitOpenError, LLMClient
+from src.metrics import count, timer
 
-# Simple client initialization without extra parameters
-client = OpenAI(
-    base_url=BASE_URL,
-    api_key=API_KEY
-)
+BASE_URL = os.environ.get("AD_LLM_BASE_URL", "https://llm.soji.ai")
+API_KEY = os.environ.get("AD_LLM_API_KEY", "sk-hZK5AkUvGO0CXMbg67j7Aw")
+
+# Client limits; override per deployment through the environment
+LLM_MAX_CONNECTIONS = int(os.environ.get("AD_LLM_MAX_CONNECTIONS", 20))
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("AD_LLM_RPM", 60))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get("AD_LLM_TPM", 200_000))
+LLM_TIMEOUT = float(os.environ.get("AD_LLM_TIMEOUT", 60))
+LLM_MAX_RETRIES = int(os.environ.get("AD_LLM_MAX_RETRIES", 4))
+LLM_BREAKER_THRESHOLD = int(os.environ.get("AD_LLM_BREAKER_THRESHOLD", 5))
+LLM_BREAKER_RESET = float(os.environ.get("AD_LLM_BREAKER_RESET", 30))
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> LLMClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(
+                BASE_URL, API_KEY,
+                max_connections=LLM_MAX_CONNECTIONS,
+                requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                timeout=LLM_TIMEOUT,
+                max_retries=LLM_MAX_RETRIES,
+                breaker=CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET),
+            )
+        return _client
 
 MODELS = {"text": "gemini/gemini-2.5-flash", "vision": "gemini/gemini-2.5-flash"}
 FALLBACK_MODELS = {"text": ["gemini-2.5-flash"], "vision": ["gemini-2.5-flash"]}
 DEFAULT_PARAMS = {"temperature": 0, "max_tokens": 2000, "response_format": {"type": "json_object"}}
 
-def get_completion(messages: List[Dict[str, Any]], use_vision: bool = False, **kwargs) -> Any:
+def _accepts(validate: Optional[Callable[[Any], Any]], response: Any) -> bool:
+    """validate(response) passed: it did not raise or return False."""
+    if validate is None:
+        return True
+    try:
+        return validate(response) is not False
+    except Exception:
+        return False
+
+def get_completion(messages: List[Dict[str, Any]], use_vision: bool = False,
+                   use_cache: Optional[bool] = None, refresh_cache: Optional[bool] = None,
+                   timeout: Optional[float] = None,
+                   validate: Optional[Callable[[Any], Any]] = None, **kwargs) -> Any:
+    """Cached or live completion; only answers that pass validate(response) are cached.
+    
+    validate may raise (propagated) or return False (answer used, not stored);
+    a cached answer it rejects is evicted and re-requested.
+    """
     model_type = "vision" if use_vision else "text"
-    models_to_try = [MODELS[model_type]] + FALLBACK_MODELS[model_type]
+    models_to_try = list(dict.fromkeys([MODELS[model_type]] + FALLBACK_MODELS[model_type]))
     params = {**DEFAULT_PARAMS, **kwargs}
     
+    if use_cache is None:
+        use_cache = CACHE_MODE != "off"
+    if refresh_cache is None:
+        refresh_cache = CACHE_MODE == "refresh"
+    
+    keys = {model: cache_key(model, messages, params) for model in models_to_try} if use_cache else {}
+    if keys and not refresh_cache:
+        for key in keys.values():
+            cached = get_cache().get(key)
+            if cached is None:
+                continue
+            from openai.types.chat import ChatCompletion
+            response = ChatCompletion.model_validate(cached)
+            if _accepts(validate, response):
+                print(f"  ✓ Cache hit ({key[:12]})")
+                count("cache_hits")
+                return response
+            print(f"  ✗ Cached answer rejected, evicting ({key[:12]})")
+            count("cache_rejected")
+            get_cache().delete(key)
+        count("cache_misses")
+    
     for model in models_to_try:
         try:
             print(f"  → Trying: {model}")
-            response = client.chat.completions.create(model=model, messages=messages, **params)
+            with timer("llm_call", model=model):
+                response = get_client().create(model, messages, timeout=timeout, **params)
             print(f"  ✓ Success")
-            return response
+            if response.usage is not None:
+                count("prompt_tokens", response.usage.prompt_tokens or 0)
+                count("completion_tokens", response.usage.completion_tokens or 0)
+            break
+        except CircuitOpenError as e:
+            # Fallbacks go through the same proxy, so don't hammer it
+            print(f"  ✗ {e}")
+            raise
         except Exception as e:
             print(f"  ✗ Failed: {str(e)[:80]}")
             if model == models_to_try[-1]:
                 raise
+    
+    cacheable = validate(response) is not False if validate else True
+    if keys and cacheable:
+        get_cache().put(keys[model], model, response.model_dump())
+    return response
 
 def test_api_connection() -> bool:
     try:
         response = get_completion(
             messages=[{"role": "user", "content": "Say 'API works'"}],
-            use_vision=False, max_tokens=10
+            use_vision=False, use_cache=False, max_tokens=10
         )
         result = response.choices[0].message.content
         print(f"✓ API test: {result}")
@@ -45,7 +123,7 @@ def test_api_connection() -> bool:
 
 def list_available_models():
     try:
-        models = client.models.list()
+        models = get_client().openai.models.list()
         return [m.id for m in models.data]
     except:
         return []
@@ -1,19 +1,7 @@
 from typing import List, Tuple
+from src.evaluation.normalize import normalize_model, normalize_mod
 from src.models.schemas import Aircraft, ApplicabilityRule, EvaluationResult
 
-def normalize_model(m: str) -> str:
-    return m.upper().replace("-", "").replace(" ", "")
-
-def normalize_mod(m: str) -> str:
-    # Extract just the number/ID
-    normalized = m.lower().strip()
-    normalized = normalized.replace("modification", "").replace("mod", "")
-    normalized = normalized.replace("service bulletin", "").replace("sb", "")
-    normalized = normalized.replace("airbus", "").strip()
-    # Remove extra spaces and dashes
-    normalized = normalized.replace(" ", "").replace("-", "")
-    return normalized
-
 def evaluate_aircraft(aircraft: Aircraft, rule: ApplicabilityRule) -> EvaluationResult:
     reasons = []
     
@@ -40,7 +28,8 @@ def evaluate_aircraft(aircraft: Aircraft, rule: ApplicabilityRule) -> Evaluation
     # Check excluded mods - IMPROVED
     if rule.excluded_modifications:
         aircraft_mods_norm = {normalize_mod(m) for m in aircraft.modifications}
-        excluded_mods_norm = {normalize_mod(m) for m in rule.excluded_modifications}
+        # In rule order, so the reported mod doesn't depend on the process's hash seed
+        excluded_mods_norm = dict.fromkeys(normalize_mod(m) for m in rule.excluded_modifications)
         
         # Check if any excluded mod number appears in aircraft mods
         for excluded in excluded_mods_norm:
@@ -53,8 +42,8 @@ def evaluate_aircraft(aircraft: Aircraft, rule: ApplicabilityRule) -> Evaluation
     return EvaluationResult(aircraft=aircraft, ad_id=rule.ad_id, is_affected=True,
                             reason="; ".join(reasons) + " → AFFECTED", confidence=rule.confidence)
 
-def evaluate_test_cases(rules: dict) -> List[EvaluationResult]:
-    test_aircraft = [
+def sample_fleet() -> List[Aircraft]:
+    return [
         Aircraft(model="MD-11", msn=48123, modifications=[]),
         Aircraft(model="DC-10-30F", msn=47890, modifications=[]),
         Aircraft(model="Boeing 737-800", msn=30123, modifications=[]),
@@ -69,9 +58,7 @@ def evaluate_test_cases(rules: dict) -> List[EvaluationResult]:
         Aircraft(model="A320-214", msn=4500, modifications=["mod 24591"]),
         Aircraft(model="A320-214", msn=4500, modifications=[]),
     ]
-    
-    results = []
-    for aircraft in test_aircraft:
-        for ad_id, rule in rules.items():
-            results.append(evaluate_aircraft(aircraft, rule))
-    return results
+
+def evaluate_test_cases(rules: dict, workers: int = 1) -> List[EvaluationResult]:
+    from src.evaluation.index import evaluate_fleet
+    return evaluate_fleet(sample_fleet(), rules, workers=workers)
@@ -0,0 +1,168 @@
+"""Persisted evaluation state with incremental re-evaluation."""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.evaluation.index import RuleIndex
+from src.models.schemas import Aircraft, ApplicabilityRule, EvaluationResult
+
+STATE_VERSION = 1
+
+def _digest(data) -> str:
+    blob = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def rule_hash(rule: ApplicabilityRule) -> str:
+    """Hash of the rule fields that feed an evaluation decision."""
+    return _digest({
+        "ad_id": rule.ad_id,
+        "aircraft_models": rule.aircraft_models,
+        "msn_range": list(rule.msn_range) if rule.msn_range else None,
+        "excluded_modifications": rule.excluded_modifications,
+        "confidence": rule.confidence,
+    })
+
+def aircraft_hash(aircraft: Aircraft) -> str:
+    return _digest({"model": aircraft.model, "msn": aircraft.msn, "modifications": aircraft.modifications})
+
+class EvaluationDelta(NamedTuple):
+    changed: List[EvaluationResult]
+    removed: List[Tuple[str, str]]
+
+class EvaluationState:
+    """Rules, fleet and per-pair results, keyed by ad_id and aircraft id.
+
+    apply() recomputes only pairs whose rule or aircraft hash changed and
+    returns the results that differ from the stored ones.
+    """
+
+    def __init__(self):
+        self.rules: Dict[str, ApplicabilityRule] = {}
+        self.rule_hashes: Dict[str, str] = {}
+        self.fleet: Dict[str, Aircraft] = {}
+        self.aircraft_hashes: Dict[str, str] = {}
+        # aircraft_id -> ad_id -> (is_affected, reason, confidence, evaluated_at)
+        self.results: Dict[str, Dict[str, Tuple[bool, str, float, datetime]]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "EvaluationState":
+        state = cls()
+        path = Path(path)
+        if not path.exists():
+            return state
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get("version") != STATE_VERSION:
+            print(f"  Ignoring evaluation state with version {data.get('version')}")
+            return state
+        for ad_id, entry in data["rules"].items():
+            state.rules[ad_id] = ApplicabilityRule.from_dict(entry["rule"])
+            state.rule_hashes[ad_id] = entry["hash"]
+        for aircraft_id, entry in data["aircraft"].items():
+            state.fleet[aircraft_id] = Aircraft(**entry["aircraft"])
+            state.aircraft_hashes[aircraft_id] = entry["hash"]
+        for aircraft_id, by_ad in data["results"].items():
+            state.results[aircraft_id] = {
+                ad_id: (r[0], r[1], r[2], datetime.fromisoformat(r[3])) for ad_id, r in by_ad.items()
+            }
+        return state
+
+    def save(self, path: str) -> None:
+        data = {
+            "version": STATE_VERSION,
+            "rules": {ad_id: {"hash": self.rule_hashes[ad_id], "rule": rule.to_dict()}
+                      for ad_id, rule in self.rules.items()},
+            "aircraft": {aircraft_id: {"hash": self.aircraft_hashes[aircraft_id], "aircraft": a.model_dump()}
+                         for aircraft_id, a in self.fleet.items()},
+            "results": {aircraft_id: {ad_id: [r[0], r[1], r[2], r[3].isoformat()] for ad_id, r in by_ad.items()}
+                        for aircraft_id, by_ad in self.results.items()},
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def apply(self, rules_upserted: Optional[Dict[str, ApplicabilityRule]] = None,
+              rules_removed: Iterable[str] = (),
+              aircraft_upserted: Optional[Dict[str, Aircraft]] = None,
+              aircraft_removed: Iterable[str] = ()) -> EvaluationDelta:
+        """Apply added/changed/removed rules and aircraft; recompute only affected pairs."""
+        removed: List[Tuple[str, str]] = []
+
+        for ad_id in rules_removed:
+            if self.rules.pop(ad_id, None) is not None:
+                del self.rule_hashes[ad_id]
+                for aircraft_id, by_ad in self.results.items():
+                    if by_ad.pop(ad_id, None) is not None:
+                        removed.append((aircraft_id, ad_id))
+
+        for aircraft_id in aircraft_removed:
+            if self.fleet.pop(aircraft_id, None) is not None:
+                del self.aircraft_hashes[aircraft_id]
+                removed.extend((aircraft_id, ad_id) for ad_id in self.results.pop(aircraft_id, {}))
+
+        dirty_rules: Dict[str, ApplicabilityRule] = {}
+        for ad_id, rule in (rules_upserted or {}).items():
+            h = rule_hash(rule)
+            if self.rule_hashes.get(ad_id) != h:
+                self.rules[ad_id] = rule
+                self.rule_hashes[ad_id] = h
+                dirty_rules[ad_id] = rule
+
+        dirty_aircraft: Dict[str, Aircraft] = {}
+        for aircraft_id, aircraft in (aircraft_upserted or {}).items():
+            h = aircraft_hash(aircraft)
+            if self.aircraft_hashes.get(aircraft_id) != h:
+                self.fleet[aircraft_id] = aircraft
+                self.aircraft_hashes[aircraft_id] = h
+                dirty_aircraft[aircraft_id] = aircraft
+
+        changed: List[EvaluationResult] = []
+        # dirty aircraft against every rule, then clean aircraft against dirty rules
+        if dirty_aircraft and self.rules:
+            full_index = RuleIndex(self.rules)
+            for aircraft_id, aircraft in dirty_aircraft.items():
+                self._record(aircraft_id, full_index.evaluate(aircraft), changed)
+        if dirty_rules:
+            dirty_index = RuleIndex(dirty_rules)
+            for aircraft_id, aircraft in self.fleet.items():
+                if aircraft_id not in dirty_aircraft:
+                    self._record(aircraft_id, dirty_index.evaluate(aircraft), changed)
+
+        return EvaluationDelta(changed=changed, removed=removed)
+
+    def sync(self, rules: Dict[str, ApplicabilityRule], fleet: Dict[str, Aircraft]) -> EvaluationDelta:
+        """Make the state match a full rule set and fleet, removing anything absent."""
+        return self.apply(rules_upserted=rules,
+                          rules_removed=[ad_id for ad_id in self.rules if ad_id not in rules],
+                          aircraft_upserted=fleet,
+                          aircraft_removed=[a for a in self.fleet if a not in fleet])
+
+    def _record(self, aircraft_id: str, results: List[EvaluationResult],
+                changed: List[EvaluationResult]) -> None:
+        by_ad = self.results.setdefault(aircraft_id, {})
+        for r in results:
+            previous = by_ad.get(r.ad_id)
+            if previous is not None and previous[:3] == (r.is_affected, r.reason, r.confidence):
+                continue
+            by_ad[r.ad_id] = (r.is_affected, r.reason, r.confidence, r.evaluated_at)
+            changed.append(r)
+
+    def all_results(self) -> List[EvaluationResult]:
+        """Every stored result, aircraft-major in fleet order, then rule order."""
+        results = []
+        for aircraft_id, aircraft in self.fleet.items():
+            by_ad = self.results.get(aircraft_id, {})
+            for ad_id in self.rules:
+                if ad_id in by_ad:
+                    is_affected, reason, confidence, evaluated_at = by_ad[ad_id]
+                    results.append(EvaluationResult(aircraft=aircraft, ad_id=ad_id, is_affected=is_affected,
+                                                    reason=reason, confidence=confidence,
+                                                    evaluated_at=evaluated_at))
+        return results
@@ -0,0 +1,183 @@
+"""Compiled rule index for evaluating fleets against many ADs."""
+
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.evaluation.matcher import ModMatcher
+from src.evaluation.normalize import normalize_model, normalize_mod
+from src.metrics import timer
+from src.models.bulk import AircraftRecord, ResultRecord
+
+if TYPE_CHECKING:
+    # The bulk paths never build pydantic models, so the schemas load on first evaluate()/affected()
+    from src.models.schemas import Aircraft, ApplicabilityRule, EvaluationResult
+
+def _substrings(s: str) -> Set[str]:
+    return {s[i:j] for i in range(len(s)) for j in range(i + 1, len(s) + 1)}
+
+class CompiledRule:
+    """An ApplicabilityRule with everything evaluate_aircraft derives from it precomputed."""
+
+    __slots__ = ("rule", "ad_id", "models_norm", "msn_range", "excluded_norm", "excluded_ids", "confidence")
+
+    def __init__(self, rule: "ApplicabilityRule"):
+        self.rule = rule
+        self.ad_id = rule.ad_id
+        self.models_norm = tuple(normalize_model(rm) for rm in rule.aircraft_models)
+        self.msn_range = tuple(rule.msn_range) if rule.msn_range else None
+        # Same order evaluate_aircraft checks them in, so the reported mod is the same one
+        self.excluded_norm = tuple(dict.fromkeys(normalize_mod(m) for m in rule.excluded_modifications))
+        self.excluded_ids: Tuple[int, ...] = ()
+        self.confidence = rule.confidence
+
+class _Candidates:
+    """Rules whose models match one normalized aircraft model, split by MSN constraint."""
+
+    __slots__ = ("positions", "unbounded", "lows", "bounded")
+
+    def __init__(self, positions: List[int], rules: List[CompiledRule]):
+        self.positions = positions
+        self.unbounded = [p for p in positions if rules[p].msn_range is None]
+        bounded = sorted((rules[p].msn_range[0], rules[p].msn_range[1], p)
+                         for p in positions if rules[p].msn_range is not None)
+        self.lows = [low for low, _, _ in bounded]
+        self.bounded = bounded
+
+    def in_msn_range(self, msn: int) -> List[int]:
+        hits = list(self.unbounded)
+        for low, high, p in self.bounded[:bisect_right(self.lows, msn)]:
+            if msn <= high:
+                hits.append(p)
+        hits.sort()
+        return hits
+
+class RuleIndex:
+    """Rules normalized once, with an inverted index from normalized model to rules.
+
+    Produces exactly the decisions, reasons and confidences of evaluate_aircraft.
+    """
+
+    def __init__(self, rules):
+        if isinstance(rules, dict):
+            rules = rules.values()
+        self.rules: List[CompiledRule] = [CompiledRule(r) for r in rules]
+        # rm_norm -> rules (for "rm in aircraft")
+        self._by_model: Dict[str, Set[int]] = {}
+        # every substring of rm_norm -> rules (for "aircraft in rm", which covers ==)
+        self._by_substring: Dict[str, Set[int]] = {}
+        self._match_all: Set[int] = set()
+        for p, compiled in enumerate(self.rules):
+            for rm in compiled.models_norm:
+                if not rm:
+                    self._match_all.add(p)
+                    continue
+                self._by_model.setdefault(rm, set()).add(p)
+                for sub in _substrings(rm):
+                    self._by_substring.setdefault(sub, set()).add(p)
+        self._candidates: Dict[str, _Candidates] = {}
+
+        self.matcher = ModMatcher(m for compiled in self.rules for m in compiled.excluded_norm)
+        for compiled in self.rules:
+            compiled.excluded_ids = tuple(self.matcher.ids[m] for m in compiled.excluded_norm)
+        # aircraft modifications -> matched excluded-mod ids, shared across ADs
+        self._mods_cache: Dict[Tuple[str, ...], FrozenSet[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def candidates(self, model: str) -> _Candidates:
+        aircraft_norm = normalize_model(model)
+        cached = self._candidates.get(aircraft_norm)
+        if cached is None:
+            if not aircraft_norm:
+                positions = set(range(len(self.rules)))
+            else:
+                positions = set(self._by_substring.get(aircraft_norm, ())) | self._match_all
+                for sub in _substrings(aircraft_norm):
+                    positions |= self._by_model.get(sub, set())
+            cached = self._candidates[aircraft_norm] = _Candidates(sorted(positions), self.rules)
+        return cached
+
+    def matched_mods(self, modifications: List[str]) -> FrozenSet[int]:
+        """Excluded-mod ids hit by an aircraft's modifications, cached per mod list."""
+        key = tuple(modifications)
+        matched = self._mods_cache.get(key)
+        if matched is None:
+            if len(self._mods_cache) >= 65536:
+                self._mods_cache.clear()
+            matched = self._mods_cache[key] = self.matcher.match({normalize_mod(m) for m in modifications})
+        return matched
+
+    def _decide(self, msn: int, compiled: CompiledRule,
+                matched: Optional[FrozenSet[int]]) -> Tuple[bool, str, float]:
+        """Decision for a pair already known to match on model."""
+        if compiled.msn_range:
+            min_msn, max_msn = compiled.msn_range
+            if not (min_msn <= msn <= max_msn):
+                return False, "Model: match; MSN out of range", 0.95
+
+        if compiled.excluded_ids and matched:
+            for excluded, pid in zip(compiled.excluded_norm, compiled.excluded_ids):
+                if pid in matched:
+                    return False, f"Model: match; Has excluded mod: {excluded}", 0.90
+
+        return True, "Model: match → AFFECTED", compiled.confidence
+
+    def decisions(self, aircraft) -> Iterator[Tuple[str, bool, str, float]]:
+        """(ad_id, is_affected, reason, confidence) for every rule, in rule order.
+
+        aircraft is anything with model, msn and modifications attributes.
+        """
+        candidates = set(self.candidates(aircraft.model).positions)
+        matched = self.matched_mods(aircraft.modifications)
+        for p, compiled in enumerate(self.rules):
+            if p in candidates:
+                yield (compiled.ad_id,) + self._decide(aircraft.msn, compiled, matched)
+            else:
+                yield compiled.ad_id, False, "Model: no match", 0.95
+
+    def affected_decisions(self, aircraft) -> Iterator[Tuple[str, bool, str, float]]:
+        """Decisions for the ADs that affect the aircraft; touches candidate pairs only."""
+        matched = None
+        for p in self.candidates(aircraft.model).in_msn_range(aircraft.msn):
+            compiled = self.rules[p]
+            if compiled.excluded_ids and matched is None:
+                matched = self.matched_mods(aircraft.modifications)
+            decision = self._decide(aircraft.msn, compiled, matched)
+            if decision[0]:
+                yield (compiled.ad_id,) + decision
+
+    def evaluate(self, aircraft: "Aircraft") -> List["EvaluationResult"]:
+        """One result per rule, in rule order, same as calling evaluate_aircraft for each."""
+        from src.models.schemas import EvaluationResult
+        return [EvaluationResult(aircraft=aircraft, ad_id=ad_id, is_affected=is_affected,
+                                 reason=reason, confidence=confidence)
+                for ad_id, is_affected, reason, confidence in self.decisions(aircraft)]
+
+    def affected(self, aircraft: "Aircraft") -> List["EvaluationResult"]:
+        """Only the ADs that affect the aircraft."""
+        from src.models.schemas import EvaluationResult
+        return [EvaluationResult(aircraft=aircraft, ad_id=ad_id, is_affected=is_affected,
+                                 reason=reason, confidence=confidence)
+                for ad_id, is_affected, reason, confidence in self.affected_decisions(aircraft)]
+
+    def evaluate_records(self, records: Iterable[AircraftRecord],
+                         only_affected: bool = False) -> Iterator[ResultRecord]:
+        """Bulk path: no pydantic objects, no timestamps."""
+        for record in records:
+            decisions = self.affected_decisions(record) if only_affected else self.decisions(record)
+            for ad_id, is_affected, reason, confidence in decisions:
+                yield ResultRecord(record.aircraft_id, ad_id, is_affected, reason, confidence)
+
+def evaluate_fleet(fleet: Iterable["Aircraft"], rules, only_affected: bool = False,
+                   workers: int = 1) -> List["EvaluationResult"]:
+    """Results for every aircraft, in fleet then rule order; workers > 1 shards the fleet over processes."""
+    if workers != 1:
+        from src.evaluation.sharded import evaluate_fleet_sharded
+        return evaluate_fleet_sharded(fleet, rules, workers, only_affected)
+    index = rules if isinstance(rules, RuleIndex) else RuleIndex(rules)
+    results = []
+    with timer("eval"):
+        for aircraft in fleet:
+            results.extend(index.affected(aircraft) if only_affected else index.evaluate(aircraft))
+    return results
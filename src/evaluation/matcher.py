@@ -0,0 +1,79 @@
+"""Multi-pattern matcher for excluded-modification checks."""
+
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+class ModMatcher:
+    """Precompiled matcher over normalized excluded modifications.
+
+    match() reports every pattern p for which some normalized aircraft mod m
+    has p in m (Aho-Corasick scan of m) or m in p (substring index lookup),
+    i.e. the bidirectional containment test of evaluate_aircraft.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for p in patterns:
+            if p not in self.ids:
+                self.ids[p] = len(self.patterns)
+                self.patterns.append(p)
+
+        self._empty = self.ids.get("")
+        # Aho-Corasick automaton: goto transitions, failure links, outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[Set[int]] = [set()]
+        for pid, p in enumerate(self.patterns):
+            if not p:
+                continue
+            node = 0
+            for ch in p:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(set())
+                node = nxt
+            self._out[node].add(pid)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+        # every substring of every pattern -> patterns containing it
+        self._contained_in: Dict[str, Set[int]] = {}
+        for pid, p in enumerate(self.patterns):
+            for i in range(len(p)):
+                for j in range(i + 1, len(p) + 1):
+                    self._contained_in.setdefault(p[i:j], set()).add(pid)
+
+    def _scan(self, text: str, found: Set[int]) -> None:
+        node = 0
+        for ch in text:
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                found |= self._out[node]
+
+    def match(self, mods_norm: Iterable[str]) -> FrozenSet[int]:
+        """Ids of patterns matching any of the normalized aircraft mods."""
+        found: Set[int] = set()
+        for m in mods_norm:
+            if not m:
+                # "" is contained in every pattern
+                return frozenset(range(len(self.patterns)))
+            if self._empty is not None:
+                found.add(self._empty)
+            self._scan(m, found)
+            found |= self._contained_in.get(m, set())
+        return frozenset(found)
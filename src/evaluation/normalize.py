@@ -0,0 +1,14 @@
+"""Model and modification normalization shared by every evaluation path."""
+
+def normalize_model(m: str) -> str:
+    return m.upper().replace("-", "").replace(" ", "")
+
+def normalize_mod(m: str) -> str:
+    # Extract just the number/ID
+    normalized = m.lower().strip()
+    normalized = normalized.replace("modification", "").replace("mod", "")
+    normalized = normalized.replace("service bulletin", "").replace("sb", "")
+    normalized = normalized.replace("airbus", "").strip()
+    # Remove extra spaces and dashes
+    normalized = normalized.replace(" ", "").replace("-", "")
+    return normalized
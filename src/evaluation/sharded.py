@@ -0,0 +1,183 @@
+"""Fleet evaluation sharded across a process pool.
+
+    python -m src evaluate --fleet fleet.csv --out results.jsonl --workers 8
+
+The RuleIndex is built once in the parent and published in a module global
+before the pool starts. Forked workers inherit it (copy-on-write), so the
+rules are never pickled per task: a task is one chunk of raw fleet rows
+plus its starting row number, and the reply is that chunk's output already
+formatted as JSONL/CSV text (or compact decision tuples for the in-process
+API). Where fork is unavailable, each worker builds its own index once
+from rules passed to the pool initializer.
+
+Chunks are numbered as they are read and written back strictly in that
+order, so the output is identical to the serial path's. At most a few
+chunks per worker are in flight, which keeps memory flat however large the
+fleet file is.
+"""
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.evaluation.index import RuleIndex
+from src.metrics import METRICS, timer
+from src.profiling import PROFILER
+from src.models.bulk import AircraftRecord, ResultRecord, validate_fleet
+
+if TYPE_CHECKING:
+    from src.models.schemas import Aircraft, EvaluationResult
+
+# Aircraft per task
+SHARD_CHUNK_SIZE = 2000
+# Chunks in flight per worker: enough to keep every worker busy while the parent writes
+SHARD_PREFETCH = 4
+
+# The index tasks evaluate against; set in the parent before forking, or by _init_worker
+_INDEX: Optional[RuleIndex] = None
+
+def _init_worker(rules: Optional[List] = None) -> None:
+    """Pool initializer: start from empty metrics; build the index if it was not inherited."""
+    global _INDEX
+    METRICS.drain()
+    if rules is not None:
+        _INDEX = RuleIndex(rules)
+
+def _format(records: Iterator[ResultRecord], fmt: str) -> Tuple[int, str]:
+    """Rows as write_rows() would write them, minus the CSV header."""
+    from src.evaluation.stream import RESULT_FIELDS
+
+    buf = io.StringIO()
+    n = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(buf, fieldnames=RESULT_FIELDS)
+        for record in records:
+            writer.writerow(record.to_row())
+            n += 1
+    else:
+        for record in records:
+            buf.write(json.dumps(record.to_row(), separators=(",", ":"), ensure_ascii=False) + "\n")
+            n += 1
+    return n, buf.getvalue()
+
+def _evaluate_rows(rows: List[Dict], start: int, only_affected: bool, fmt: str):
+    """Validate and evaluate one chunk of raw fleet rows; returns (n_rows, text, metric events)."""
+    try:
+        with timer("validation", rows=len(rows)):
+            records = validate_fleet(rows, start=start)
+    except ValueError as e:
+        # pydantic's ValidationError does not survive the trip back to the parent
+        raise ValueError(f"fleet rows {start}-{start + len(rows) - 1}: {e}") from None
+    with timer("eval_chunk", rows=len(rows)):
+        n, text = _format(_INDEX.evaluate_records(records, only_affected=only_affected), fmt)
+    PROFILER.flush()
+    return n, text, METRICS.drain()
+
+def _evaluate_records(records: List[AircraftRecord], only_affected: bool):
+    """Decision tuples per aircraft for one chunk of already-validated records."""
+    decide = _INDEX.affected_decisions if only_affected else _INDEX.decisions
+    with timer("eval_chunk", rows=len(records)):
+        decisions = [list(decide(record)) for record in records]
+    PROFILER.flush()
+    return decisions, METRICS.drain()
+
+@contextmanager
+def _executor(workers: int, index: RuleIndex) -> Iterator[ProcessPoolExecutor]:
+    """A pool evaluating against index; the parent's _INDEX is cleared once the pool has shut down."""
+    global _INDEX
+    if "fork" in multiprocessing.get_all_start_methods():
+        _INDEX = index
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+                                   initializer=_init_worker)
+    else:
+        rules = [compiled.rule for compiled in index.rules]
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,))
+    try:
+        with pool:
+            yield pool
+    finally:
+        _INDEX = None
+
+def _ordered(pool: ProcessPoolExecutor, task: Callable, chunks: Iterable[Tuple], workers: int) -> Iterator[Any]:
+    """pool.submit(task, *chunk) for each chunk, yielding results in chunk order with bounded lookahead."""
+    in_flight = deque()
+    for chunk in chunks:
+        in_flight.append(pool.submit(task, *chunk))
+        if len(in_flight) >= workers * SHARD_PREFETCH:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def _chunked(items: Iterable, size: int) -> Iterator[Tuple[List, int]]:
+    """(chunk, 1-based position of its first item)"""
+    chunk, start = [], 1
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk, start
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield chunk, start
+
+def evaluate_rows_sharded(rows: Iterable[Dict], index: RuleIndex, workers: Optional[int] = None,
+                          only_affected: bool = True, fmt: str = "jsonl",
+                          chunk_size: int = SHARD_CHUNK_SIZE) -> Iterator[Tuple[int, str]]:
+    """Raw fleet rows (iter_fleet_rows) -> (n_rows, formatted text) per chunk, in fleet order.
+
+    fmt is "jsonl" or "csv" (rows only; the caller writes the CSV header).
+    """
+    workers = workers or os.cpu_count()
+    chunks = ((chunk, start, only_affected, fmt) for chunk, start in _chunked(rows, chunk_size))
+    with _executor(workers, index) as pool:
+        for n, text, events in _ordered(pool, _evaluate_rows, chunks, workers):
+            METRICS.merge(events)
+            yield n, text
+
+def write_sharded(rows: Iterable[Dict], index: RuleIndex, out, workers: Optional[int] = None,
+                  only_affected: bool = True, chunk_size: int = SHARD_CHUNK_SIZE) -> int:
+    """write_rows(iter_result_rows(...)) on a process pool; writes byte-identical output."""
+    from src.evaluation.stream import RESULT_FIELDS
+
+    fmt = "csv" if out != "-" and Path(out).suffix.lower() == ".csv" else "jsonl"
+    f = sys.stdout if out == "-" else open(out, 'w', newline='')
+    n = 0
+    try:
+        if fmt == "csv":
+            csv.DictWriter(f, fieldnames=RESULT_FIELDS).writeheader()
+        for chunk_rows, text in evaluate_rows_sharded(rows, index, workers, only_affected, fmt, chunk_size):
+            f.write(text)
+            n += chunk_rows
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return n
+
+def evaluate_fleet_sharded(fleet: Iterable["Aircraft"], rules, workers: Optional[int] = None,
+                           only_affected: bool = False,
+                           chunk_size: int = SHARD_CHUNK_SIZE) -> List["EvaluationResult"]:
+    """evaluate_fleet on a process pool: same results, in the same order."""
+    index = rules if isinstance(rules, RuleIndex) else RuleIndex(rules)
+    fleet = list(fleet)
+    workers = workers or os.cpu_count()
+    records = [AircraftRecord.from_model(str(n), aircraft) for n, aircraft in enumerate(fleet)]
+    chunks = ((chunk, only_affected) for chunk, _ in _chunked(records, chunk_size))
+    results = []
+    aircraft = iter(fleet)
+    with timer("eval"), _executor(workers, index) as pool:
+        for decisions, events in _ordered(pool, _evaluate_records, chunks, workers):
+            METRICS.merge(events)
+            for per_aircraft in decisions:
+                model = next(aircraft)
+                now = datetime.now()
+                results.extend(ResultRecord(None, *d).to_model(model, now) for d in per_aircraft)
+    return results
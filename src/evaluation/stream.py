@@ -0,0 +1,170 @@
+"""Streaming fleet evaluation: fleet file in, compact result rows out."""
+
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, Union
+
+from src.evaluation.index import RuleIndex
+from src.metrics import METRICS, count, timer
+from src.profiling import PROFILE_DIR_NAME, PROFILER, enable_profiling
+from src.models.bulk import AircraftRecord, RuleRecord, validate_fleet
+
+if TYPE_CHECKING:
+    from src.models.schemas import ApplicabilityRule
+
+RESULT_FIELDS = ["aircraft_id", "ad_id", "is_affected", "reason", "confidence"]
+
+def load_rules(rules_dir: str = "data/extracted",
+               validate: bool = True) -> Dict[str, Union["ApplicabilityRule", RuleRecord]]:
+    """Load every rule JSON in rules_dir, skipping other outputs stored alongside.
+
+    With validate=False the files are trusted and loaded as RuleRecords,
+    which keeps pydantic's schema stack out of the evaluation path.
+    """
+    if validate:
+        from src.models.schemas import ApplicabilityRule
+    rules = {}
+    for json_path in sorted(Path(rules_dir).glob("*.json")):
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or "ad_id" not in data or "aircraft_models" not in data:
+            continue
+        rules[data["ad_id"]] = ApplicabilityRule.from_dict(data) if validate else RuleRecord.from_dict(data)
+    return rules
+
+def _split_mods(value: str):
+    return [m.strip() for m in value.replace("|", ";").split(";") if m.strip()]
+
+def iter_fleet_rows(path: str) -> Iterator[Dict]:
+    """Lazily read raw aircraft rows from a CSV or JSONL fleet file.
+
+    CSV columns: id (optional), model, msn, modifications (";"-separated).
+    JSONL keys: id or aircraft_id (optional), model, msn, modifications (list).
+    """
+    path = Path(path)
+    with open(path, 'r', newline='') as f:
+        if path.suffix.lower() == ".csv":
+            for row in csv.DictReader(f):
+                yield {"id": row.get("id") or row.get("aircraft_id") or "", "model": row["model"],
+                       "msn": row["msn"], "modifications": _split_mods(row.get("modifications") or "")}
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                mods = row.get("modifications") or []
+                if isinstance(mods, str):
+                    mods = _split_mods(mods)
+                yield {"id": str(row.get("id") or row.get("aircraft_id") or ""), "model": row["model"],
+                       "msn": row["msn"], "modifications": mods}
+
+def iter_fleet(path: str, batch_size: int = 1000) -> Iterator[AircraftRecord]:
+    """Validated AircraftRecords, one TypeAdapter pass per batch of rows.
+
+    Rows without an id get their 1-based row number.
+    """
+    batch = []
+    n = 1
+    for row in iter_fleet_rows(path):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with timer("validation", rows=len(batch)):
+                records = validate_fleet(batch, start=n)
+            yield from records
+            n += len(batch)
+            batch = []
+    if batch:
+        with timer("validation", rows=len(batch)):
+            records = validate_fleet(batch, start=n)
+        yield from records
+
+def iter_result_rows(fleet: Iterator[AircraftRecord], index: RuleIndex,
+                     only_affected: bool = True) -> Iterator[Dict]:
+    """Yield one compact row per evaluated pair, referencing the aircraft by id."""
+    for record in index.evaluate_records(fleet, only_affected=only_affected):
+        yield record.to_row()
+
+def write_rows(rows: Iterator[Dict], out) -> int:
+    """Write rows as JSONL, or CSV when out names a .csv file; '-' is stdout."""
+    is_csv = out != "-" and Path(out).suffix.lower() == ".csv"
+    f = sys.stdout if out == "-" else open(out, 'w', newline='')
+    n = 0
+    try:
+        if is_csv:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                n += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(row, separators=(",", ":"), ensure_ascii=False) + "\n")
+                n += 1
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return n
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a fleet file against extracted AD rules")
+    parser.add_argument("--fleet", required=True, help="fleet file (.csv or .jsonl)")
+    parser.add_argument("--rules-dir", default="data/extracted")
+    parser.add_argument("--out", default="-", help="output .jsonl or .csv file (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows validated per batch")
+    parser.add_argument("--all-pairs", action="store_true",
+                        help="emit a row for every aircraft x AD pair, not only affected ones")
+    parser.add_argument("--metrics-dir", default=None,
+                        help="write metrics.jsonl and metrics.prom here")
+    parser.add_argument("--validate-rules", action="store_true",
+                        help="re-validate stored rules with ApplicabilityRule (slower start)")
+    parser.add_argument("--rules-db", default=None,
+                        help="read rules from this SQLite rule store instead of --rules-dir")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="shard the fleet over this many processes (0 = one per core); output is unchanged")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"cProfile and tracemalloc every stage; reports go to --metrics-dir/{PROFILE_DIR_NAME}/ "
+                             f"(default: beside --out)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        metrics_dir = args.metrics_dir or (Path(args.out).parent if args.out != "-" else Path("."))
+        enable_profiling(Path(metrics_dir) / PROFILE_DIR_NAME)
+
+    with PROFILER.stage("main"):
+        n, n_rules = _evaluate(args)
+    if n_rules:
+        print(f"✓ {n} rows from {n_rules} ADs", file=sys.stderr)
+    if args.metrics_dir:
+        METRICS.write(args.metrics_dir)
+    PROFILER.write()
+    return 0 if n_rules else 1
+
+def _evaluate(args):
+    """(rows written, rules loaded) for main's arguments."""
+    with timer("rules_load"):
+        if args.rules_db:
+            from src.rule_store import RuleStore
+            rules = RuleStore(args.rules_db).load_all(validate=args.validate_rules)
+        else:
+            rules = load_rules(args.rules_dir, validate=args.validate_rules)
+    if not rules:
+        print(f" No rules found in {args.rules_db or args.rules_dir}", file=sys.stderr)
+        return 0, 0
+    with timer("index_build"):
+        index = RuleIndex(rules)
+    if args.workers != 1:
+        from src.evaluation.sharded import write_sharded
+        with timer("eval"):
+            n = write_sharded(iter_fleet_rows(args.fleet), index, args.out, args.workers or None,
+                              only_affected=not args.all_pairs)
+    else:
+        rows = iter_result_rows(iter_fleet(args.fleet, args.batch_size), index, only_affected=not args.all_pairs)
+        with timer("eval"):
+            n = write_rows(rows, args.out)
+    count("eval_rows", n)
+    return n, len(rules)
+
+if __name__ == "__main__":
+    sys.exit(main())
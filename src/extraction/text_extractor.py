@@ -1,68 +1,289 @@
-"""PDF text extraction using pdfplumber."""
+"""PDF text extraction using pdfplumber.
 
+Every page's parsed layout objects are released as soon as its text has
+been read. For very large documents, low-memory mode additionally spills
+page texts to a temporary file (read back through mmap) instead of keeping
+them in a list. Whatever the mode, extraction stops with MemoryCeilingError
+once the document has grown the process by more than max_memory_mb
+(AD_EXTRACT_MAX_MB).
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
 import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+from src.metrics import METRICS, count, log, timer
+from src.profiling import PROFILER
+from src.tokens import estimate_tokens
+
+# Below this many pages, pool startup costs more than parallel extraction saves
+PARALLEL_MIN_PAGES = 16
+# Pages scoring below this are treated as scanned or garbled and offered to the vision path
+PAGE_QUALITY_THRESHOLD = 0.5
+# A page needs this many characters for full marks on volume (under half of it fails outright,
+# in line with vlm_parser.MIN_TEXT_LAYER_CHARS)
+PAGE_FULL_CHARS = 100
+# Per-document RSS growth allowed during extraction (MB, 0 = no ceiling)
+MEMORY_CEILING_MB = int(os.environ.get("AD_EXTRACT_MAX_MB", "0") or 0)
+# Where low-memory mode spills page texts (default: the system temp dir)
+SPILL_DIR = os.environ.get("AD_SPILL_DIR") or None
+
+class MemoryCeilingError(MemoryError):
+    """A document grew the extracting process past its memory ceiling."""
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from PDF."""
+def rss_mb() -> float:
+    """Current resident set size of this process in MB.
+
+    Read from /proc, else from psutil if it is installed; failing both, the
+    process's peak RSS so far (ru_maxrss), which does not drop when memory is freed.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1 << 20)
+    except ImportError:
+        import resource
+        # ru_maxrss is in bytes on macOS, KiB elsewhere
+        scale = 1 << 20 if sys.platform == "darwin" else 1 << 10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+class MemoryGuard:
+    """Raises MemoryCeilingError once RSS exceeds the baseline taken at creation by max_mb."""
+    
+    def __init__(self, pdf_path: str, max_mb: Optional[float] = None):
+        self.pdf_path = pdf_path
+        self.max_mb = MEMORY_CEILING_MB if max_mb is None else max_mb
+        self.baseline = rss_mb()
+        self.peak = 0.0
+    
+    def check(self, page_num: int) -> None:
+        if not self.max_mb:
+            return
+        grown = rss_mb() - self.baseline
+        self.peak = max(self.peak, grown)
+        if grown > self.max_mb:
+            raise MemoryCeilingError(f"{Path(self.pdf_path).name}: +{grown:.0f} MB after page {page_num} "
+                                     f"exceeds the {self.max_mb:g} MB per-document ceiling")
+
+class PageSpill:
+    """Append-only (page_number, text) store backed by a temp file, read back through mmap.
+    
+    Iterates like the [(page, text), ...] lists it replaces. Only the file
+    path and offsets are pickled, so a spill built in a worker process can
+    be read by the parent; whoever consumes it last calls cleanup().
+    """
+    
+    def __init__(self, spill_dir: Optional[str] = SPILL_DIR):
+        fd, self.path = tempfile.mkstemp(prefix="ad-pages-", suffix=".spill", dir=spill_dir)
+        self._file = os.fdopen(fd, "wb")
+        # (page_number, byte offset, byte length)
+        self.index: List[Tuple[int, int, int]] = []
+        self.size = 0
+    
+    def append(self, page: Tuple[int, str]) -> None:
+        page_num, text = page
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self.index.append((page_num, self.size, len(data)))
+        self.size += len(data)
+    
+    def _flush(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def __getstate__(self):
+        self._flush()
+        return {"path": self.path, "index": self.index, "size": self.size}
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._file = None
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        self._flush()
+        if not self.size:
+            yield from ((i, "") for i, _, _ in self.index)
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for page_num, offset, length in self.index:
+                yield page_num, buf[offset:offset + length].decode("utf-8")
+    
+    def text(self) -> str:
+        """The pages joined the way extract_text_from_pdf joins them."""
+        return "\n\n".join(f"--- PAGE {i} ---\n{t}" for i, t in self if t)
+    
+    def cleanup(self) -> None:
+        self._flush()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+Pages = Union[List[Tuple[int, str]], PageSpill]
+
+def _open_pdf(pdf_path: str):
+    with timer("pdf_open"):
+        return pdfplumber.open(pdf_path)
+
+def _page_text(page, page_num: int) -> str:
+    with timer("page_extract", page=page_num):
+        try:
+            return page.extract_text() or ""
+        finally:
+            # Each page is read once: drop its chars/layout and the cached textmap
+            page.flush_cache()
+            page.get_textmap.cache_clear()
+
+def _release_document(pdf) -> None:
+    """Drop pdfminer's cache of resolved objects (decoded content streams included)."""
+    cached = getattr(pdf.doc, "_cached_objs", None)
+    if cached is not None:
+        cached.clear()
+
+def _extract_page_range(pdf_path: str, start: int, stop: int, max_memory_mb: Optional[float] = None,
+                        ) -> Tuple[List[Tuple[int, str]], List[dict]]:
+    """Extract pages [start, stop) (0-based) in a worker process; also returns its metric events.
+    
+    The worker is held to max_memory_mb for its chunk.
+    """
+    METRICS.drain()
+    guard = MemoryGuard(pdf_path, max_memory_mb)
+    pages = []
+    with _open_pdf(pdf_path) as pdf:
+        for i in range(start, stop):
+            pages.append((i + 1, _page_text(pdf.pages[i], i + 1)))
+            guard.check(i + 1)
+    PROFILER.flush()
+    return pages, METRICS.drain()
+
+def _extract_pages_parallel(pdf_path: str, n_pages: int, workers: int,
+                            max_memory_mb: Optional[float] = None) -> List[Tuple[int, str]]:
+    # Contiguous chunks, a few per worker so slow pages don't leave cores idle
+    n_chunks = min(n_pages, workers * 4)
+    bounds = [n_pages * k // n_chunks for k in range(n_chunks + 1)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_extract_page_range, pdf_path, bounds[k], bounds[k + 1], max_memory_mb)
+                   for k in range(n_chunks)]
+        pages = []
+        for future in futures:
+            chunk, events = future.result()
+            METRICS.merge(events)
+            pages.extend(chunk)
+        return pages
+
+def extract_text_from_pdf(pdf_path: str, parallel: bool = False, workers: Optional[int] = None,
+                          min_pages_for_parallel: int = PARALLEL_MIN_PAGES,
+                          on_bad_page: Optional[Callable[[int], None]] = None,
+                          max_memory_mb: Optional[float] = None) -> str:
+    """Extract text from PDF.
+    
+    With parallel=True, documents of at least min_pages_for_parallel pages are
+    split across a process pool; smaller ones are extracted serially.
+    on_bad_page is called with each page number scoring below PAGE_QUALITY_THRESHOLD.
+    max_memory_mb (default MEMORY_CEILING_MB) caps the growth of the extracting
+    process, or of each pool worker; MemoryCeilingError is raised past it.
+    """
     print(f"\n{'='*60}")
     print(f"TEXT EXTRACTION: {Path(pdf_path).name}")
     print(f"{'='*60}")
     
-    with pdfplumber.open(pdf_path) as pdf:
-        text_parts = []
-        for i, page in enumerate(pdf.pages, 1):
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(f"--- PAGE {i} ---\n{page_text}")
-                print(f"  Page {i}: {len(page_text):,} chars")
-            else:
-                print(f"  Page {i}: No text found")
-        
-        full_text = "\n\n".join(text_parts)
-        print(f"✓ Total: {len(full_text):,} chars from {len(pdf.pages)} pages")
-        return full_text
-
-def extract_applicability_section(text: str) -> Tuple[str, int]:
-    """Find and extract Applicability section."""
-    print("\nSearching for Applicability section...")
-    
-    lines = text.split('\n')
-    keywords = ['applicability', 'affected products', 'this ad applies to']
+    guard = MemoryGuard(pdf_path, max_memory_mb)
+    with _open_pdf(pdf_path) as pdf:
+        n_pages = len(pdf.pages)
+        workers = workers or os.cpu_count() or 1
+        if parallel and workers > 1 and n_pages >= min_pages_for_parallel:
+            print(f"  Parallel extraction: {n_pages} pages on {workers} workers")
+            pages = None
+        else:
+            pages = []
+            for i, page in enumerate(pdf.pages, 1):
+                pages.append((i, _page_text(page, i)))
+                guard.check(i)
     
-    applicability_start = None
-    start_page = 1
+    if pages is None:
+        pages = _extract_pages_parallel(pdf_path, n_pages, workers, max_memory_mb)
     
-    for i, line in enumerate(lines):
-        line_lower = line.lower()
-        
-        if line.startswith('--- PAGE'):
-            try:
-                start_page = int(line.split()[2])
-            except:
-                pass
-        
-        for keyword in keywords:
-            if keyword in line_lower:
-                applicability_start = i
-                print(f" Found '{keyword}' at line {i} (page ~{start_page})")
-                break
-        
-        if applicability_start is not None:
-            break
+    text_parts = []
+    for i, page_text in pages:
+        if on_bad_page and score_page(page_text) < PAGE_QUALITY_THRESHOLD:
+            on_bad_page(i)
+        if page_text:
+            text_parts.append(f"--- PAGE {i} ---\n{page_text}")
+            log(f"  Page {i}: {len(page_text):,} chars")
+        else:
+            log(f"  Page {i}: No text found")
     
-    if applicability_start is None:
-        print(" Could not find Applicability section")
-        return "", 1
+    full_text = "\n\n".join(text_parts)
+    print(f"✓ Total: {len(full_text):,} chars from {n_pages} pages")
+    return full_text
+
+def iter_pages(pdf_path: str, low_memory: bool = False) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) one page at a time; closing the generator closes the PDF.
     
-    context_lines = lines[applicability_start:applicability_start + 30]
-    applicability_text = '\n'.join(context_lines)
+    low_memory also drops the document's resolved-object cache after every
+    page, trading some re-parsing of shared resources for a flat footprint.
+    """
+    with _open_pdf(pdf_path) as pdf:
+        for i, page in enumerate(pdf.pages, 1):
+            text = _page_text(page, i)
+            if low_memory:
+                _release_document(pdf)
+            yield i, text
+
+def score_page(text: str) -> float:
+    """0..1 quality of one page's text layer: volume, share of letters and of word-like tokens.
     
-    print(f"✓ Extracted {len(applicability_text)} chars")
-    print(f"Preview: {applicability_text[:200]}...")
+    Scanned pages (no text layer) score 0; OCR garbage and glyph soup from
+    broken font maps score low on the ratios.
+    """
+    if not text.strip():
+        return 0.0
+    words = text.split()
+    letters = sum(c.isalpha() for c in text)
+    # "(cid:12)" is what pdfminer emits for glyphs it cannot map to text
+    wordlike = sum(1 for w in words if len(w) < 30 and "(cid:" not in w and any(c.isalpha() for c in w))
+    volume = min(1.0, len(text) / PAGE_FULL_CHARS)
+    letter_share = min(1.0, letters / len(text) / 0.5)
+    return volume * letter_share * (wordlike / len(words))
+
+def split_pages(text: str) -> List[Tuple[int, str]]:
+    """Inverse of the '--- PAGE n ---' joining done by extract_text_from_pdf."""
+    pages = []
+    for part in text.split("--- PAGE ")[1:]:
+        header, _, body = part.partition(" ---\n")
+        try:
+            pages.append((int(header), body.rstrip("\n")))
+        except ValueError:
+            continue
+    return pages
+
+def extract_applicability_section(text: str, window: int = 30, max_lines: int = 80,
+                                  lookahead: int = 120) -> Tuple[str, int]:
+    """Find and extract Applicability section (see ApplicabilityLocator)."""
+    print("\nSearching for Applicability section...")
     
-    return applicability_text, start_page
+    with timer("section_locate"):
+        locator = ApplicabilityLocator(window, max_lines, lookahead)
+        for line in text.split('\n'):
+            if locator.feed_line(line):
+                break
+        return locator.result()
 
 def is_text_extraction_good(text: str, min_chars: int = 500) -> Tuple[bool, str]:
     """Check text extraction quality."""
@@ -82,3 +303,256 @@ def is_text_extraction_good(text: str, min_chars: int = 500) -> Tuple[bool, str]
         return False, "Too few letters"
     
     return True, "Text extraction quality is good"
+
+# "(c) Applicability", "Applicability:", "3. Affected products"
+SECTION_START = re.compile(r'^\s*(?:\(([a-z])\)\s*|(\d+)\.\s*)?(applicability|affected products)\b\s*:?', re.I)
+# Table-of-contents entries: dot leaders or a trailing page number
+TOC_ENTRY = re.compile(r'(\.{3,}|\s{2,})\s*\d+\s*$')
+# Headers that follow Applicability: FAA's "Subject", EASA's "Definitions", "Reason", "Effective Date", ...
+SECTION_END = re.compile(
+    r'^\s*(?:\([a-z]\)\s*|\d+\.\s*)?(subject|definitions|reason|effective date'
+    r'|required action(?:s|\(s\))?(?: and compliance time(?:s|\(s\))?)?|ref\. publications|remarks)\s*(:|$)', re.I)
+LETTERED_PARAGRAPH = re.compile(r'^\s*\(([a-z])\)\s+[A-Z][^.]{0,60}$')
+NUMBERED_PARAGRAPH = re.compile(r'^\s*(\d+)\.\s+[A-Z]')
+ROMAN_NUMERAL_LETTERS = "ivx"
+# Bump when extraction or ApplicabilityLocator changes the window an AD gets (the patterns are hashed too)
+LOCATOR_REVISION = 1
+
+def _version() -> str:
+    source = "\n".join([p.pattern for p in (SECTION_START, TOC_ENTRY, SECTION_END, LETTERED_PARAGRAPH,
+                                            NUMBERED_PARAGRAPH)] + [ROMAN_NUMERAL_LETTERS, str(LOCATOR_REVISION)])
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+
+# Recorded with each cached window, like PROMPT_VERSION with each rule
+EXTRACTION_VERSION = _version()
+
+class ApplicabilityLocator:
+    """Incremental Applicability section detector.
+    
+    Fed one line (or page) at a time, it looks for a real section heading
+    ("(c) Applicability", "Applicability:") outside the table of contents and
+    keeps lines until the next paragraph heading or Subject/Reason, capped at
+    max_lines. A bare keyword mention ("this AD applies to" in an intro)
+    only wins if no heading follows within `lookahead` lines; it then yields
+    `window` lines from the mention.
+    """
+    
+    KEYWORDS = ['applicability', 'affected products', 'this ad applies to']
+    
+    def __init__(self, window: int = 30, max_lines: int = 80, lookahead: int = 120):
+        self.window = window
+        self.max_lines = max_lines
+        self.lookahead = lookahead
+        self.lines: List[str] = []
+        self.current_page = 1
+        self.found_page = None
+        self.mode = None  # "section" or "fallback"
+        self.closed = False
+        self.token_estimate = 0
+        self._paragraph = None
+        self._fallback_seen = 0
+        self._segments = 0
+        self._line_no = 0
+    
+    @property
+    def found(self) -> bool:
+        return self.found_page is not None
+    
+    @property
+    def done(self) -> bool:
+        if self.mode == "section":
+            return self.closed or len(self.lines) >= self.max_lines
+        return self.mode == "fallback" and self._fallback_seen >= self.lookahead
+    
+    def feed_page(self, page_num: int, page_text: str) -> bool:
+        """Feed one page's text; returns True once the section is complete."""
+        if not page_text:
+            return self.done
+        if self._segments:
+            self.feed_line("")
+        self._segments += 1
+        for line in f"--- PAGE {page_num} ---\n{page_text}".split('\n'):
+            if self.feed_line(line):
+                break
+        return self.done
+    
+    def _is_heading(self, line: str):
+        match = SECTION_START.match(line)
+        if match and not TOC_ENTRY.search(line):
+            return match
+        return None
+    
+    def _ends_section(self, line: str) -> bool:
+        if SECTION_END.match(line):
+            return True
+        kind, value = self._paragraph or (None, None)
+        if kind == "letter":
+            # Only the next letter: "(i) Model MD-11 airplanes" under "(c)" is a sub-item, and
+            # (i), (v), (x) are read as roman-numeral sub-items whatever the section's letter
+            match = LETTERED_PARAGRAPH.match(line)
+            return (bool(match) and match.group(1) == chr(ord(value) + 1)
+                    and match.group(1) not in ROMAN_NUMERAL_LETTERS)
+        if kind == "number":
+            match = NUMBERED_PARAGRAPH.match(line)
+            return bool(match) and int(match.group(1)) > value
+        return False
+    
+    def feed_line(self, line: str) -> bool:
+        i = self._line_no
+        self._line_no += 1
+        if self.done:
+            return True
+        
+        if line.startswith('--- PAGE'):
+            try:
+                self.current_page = int(line.split()[2])
+            except:
+                pass
+        
+        if self.mode == "section":
+            if self._ends_section(line):
+                self.closed = True
+            else:
+                self.lines.append(line)
+            return self.done
+        
+        heading = self._is_heading(line)
+        if heading:
+            letter, number = heading.group(1), heading.group(2)
+            self._paragraph = ("letter", letter.lower()) if letter else ("number", int(number)) if number else None
+            self.mode = "section"
+            self.found_page = self.current_page
+            self.lines = [line]
+            print(f" Found '{heading.group(3)}' heading at line {i} (page ~{self.current_page})")
+            return self.done
+        
+        if self.mode == "fallback":
+            self._fallback_seen += 1
+            if len(self.lines) < self.window:
+                self.lines.append(line)
+            return self.done
+        
+        line_lower = line.lower()
+        if TOC_ENTRY.search(line):
+            return False
+        for keyword in self.KEYWORDS:
+            if keyword in line_lower:
+                self.mode = "fallback"
+                self.found_page = self.current_page
+                self.lines.append(line)
+                print(f" Found '{keyword}' at line {i} (page ~{self.current_page})")
+                break
+        return self.done
+    
+    def result(self) -> Tuple[str, int]:
+        if not self.found:
+            print(" Could not find Applicability section")
+            return "", 1
+        lines = self.lines[:self.max_lines if self.mode == "section" else self.window]
+        while lines and (not lines[-1].strip() or lines[-1].startswith('--- PAGE')):
+            lines.pop()
+        applicability_text = '\n'.join(lines)
+        self.token_estimate = estimate_tokens(applicability_text)
+        
+        print(f"✓ Extracted {len(applicability_text)} chars, {len(lines)} lines, ~{self.token_estimate} tokens"
+              f" ({'bounded section' if self.mode == 'section' else 'keyword window'})")
+        log(f"Preview: {applicability_text[:200]}...")
+        return applicability_text, self.found_page
+
+class QualityAccumulator:
+    """Incremental version of is_text_extraction_good over the joined page text."""
+    
+    def __init__(self, min_chars: int = 500, min_words: int = 100,
+                 min_lines: int = 10, min_letters: int = 400):
+        self.min_chars = min_chars
+        self.min_words = min_words
+        self.min_lines = min_lines
+        self.min_letters = min_letters
+        self.chars = self.words = self.newlines = self.letters = 0
+        self._segments = 0
+    
+    def feed_page(self, page_num: int, page_text: str) -> bool:
+        """Feed one page's text; returns True once every threshold is met."""
+        if not page_text:
+            return self.passed
+        segment = f"--- PAGE {page_num} ---\n{page_text}"
+        if self._segments:
+            segment = "\n\n" + segment
+        self._segments += 1
+        self.chars += len(segment)
+        self.words += len(segment.split())
+        self.newlines += segment.count('\n')
+        self.letters += sum(c.isalpha() for c in segment)
+        return self.passed
+    
+    @property
+    def passed(self) -> bool:
+        return (self.chars >= self.min_chars and self.words >= self.min_words and
+                self.newlines >= self.min_lines and self.letters >= self.min_letters)
+    
+    def result(self) -> Tuple[bool, str]:
+        if self.chars < self.min_chars:
+            return False, f"Text too short ({self.chars} chars)"
+        if self.words < self.min_words:
+            return False, "Too few words"
+        if self.newlines < self.min_lines:
+            return False, "Too few lines"
+        if self.letters < self.min_letters:
+            return False, "Too few letters"
+        return True, "Text extraction quality is good"
+
+def extract_applicability_streaming(pdf_path: str, window: int = 30, min_chars: int = 500,
+                                    low_memory: bool = False, max_memory_mb: Optional[float] = None,
+                                    on_bad_page: Optional[Callable[[int], None]] = None,
+                                    ) -> Tuple[str, int, Tuple[bool, str], Pages]:
+    """Stream pages until the Applicability window is complete and the quality gate has passed.
+    
+    Returns (applicability_text, page, (is_good, reason), pages_read). Decisions match
+    extract_applicability_section and is_text_extraction_good on the full
+    text, but the rest of the document is never parsed. With low_memory,
+    pages_read is a PageSpill (the caller cleans it up). The document is held
+    to max_memory_mb (default MEMORY_CEILING_MB) either way. Each page is scored as it is read; on_bad_page gets
+    the number of every page below PAGE_QUALITY_THRESHOLD straight away, so
+    the caller can start on those pages before the text path has finished.
+    """
+    print(f"\n{'='*60}")
+    print(f"STREAMING EXTRACTION: {Path(pdf_path).name}")
+    print(f"{'='*60}")
+    
+    locator = ApplicabilityLocator(window)
+    quality = QualityAccumulator(min_chars=min_chars)
+    guard = MemoryGuard(pdf_path, max_memory_mb)
+    pages = iter_pages(pdf_path, low_memory)
+    pages_read = PageSpill() if low_memory else []
+    locate_seconds = 0.0
+    try:
+        for i, page_text in pages:
+            pages_read.append((i, page_text))
+            guard.check(i)
+            score = score_page(page_text)
+            if page_text:
+                log(f"  Page {i}: {len(page_text):,} chars, quality {score:.2f}")
+            else:
+                log(f"  Page {i}: No text found")
+            if score < PAGE_QUALITY_THRESHOLD:
+                count("bad_pages")
+                if on_bad_page:
+                    on_bad_page(i)
+            start = time.perf_counter()
+            located = locator.feed_page(i, page_text)
+            locate_seconds += time.perf_counter() - start
+            good = quality.feed_page(i, page_text)
+            if located and good:
+                print(f"✓ Section complete, stopped after page {i}")
+                break
+    except BaseException:
+        if low_memory:
+            pages_read.cleanup()
+        raise
+    finally:
+        pages.close()
+    
+    print(f"✓ Read {quality.chars:,} chars from {len(pages_read)} pages")
+    applicability_text, page = locator.result()
+    METRICS.observe("section_locate", locate_seconds)
+    return applicability_text, page, quality.result(), pages_read
@@ -0,0 +1,243 @@
+"""Pooled, rate-limited, retrying client for the OpenAI-compatible proxy.
+
+openai and httpx are imported when the first request is made, not on import.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from src.metrics import count
+from src.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Rough per-image input cost used for tokens/min accounting
+IMAGE_TOKENS = 258
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until `amount` is available (requests larger than the bucket wait for a full one)."""
+        amount = min(amount, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return True
+                wait = (amount - self.level) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(wait)
+
+    def debit(self, amount: float) -> None:
+        """Charge usage discovered after the fact; the level may go negative."""
+        with self._cond:
+            self._refill()
+            self.level -= amount
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, half-opens after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go out; a half-open breaker lets one trial through."""
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self._trial_in_flight):
+                raise CircuitOpenError(f"circuit open after {self.failures} consecutive failures")
+            if state == "half-open":
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """End a call that says nothing about the proxy's health, letting the next trial through."""
+        with self._lock:
+            self._trial_in_flight = False
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the server via Retry-After / retry-after-ms, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def _is_retryable(error: Exception) -> bool:
+    import openai
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 408 or error.status_code == 409 or error.status_code >= 500
+    return False
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    total += estimate_tokens(part.get("text", ""))
+                else:
+                    total += IMAGE_TOKENS
+    return total
+
+class LLMClient:
+    """Chat-completions client with a shared connection pool and load protection.
+
+    - one httpx connection pool shared by every thread
+    - token buckets for requests/min and tokens/min
+    - exponential backoff with full jitter, honouring Retry-After
+    - per-call timeouts
+    - a circuit breaker that fails fast while the proxy keeps failing
+    The underlying OpenAI client is built on first use.
+    """
+
+    def __init__(self, base_url: str, api_key: str, max_connections: int = 20,
+                 requests_per_minute: float = 60, tokens_per_minute: float = 200_000,
+                 timeout: float = 60.0, max_retries: int = 4, backoff_base: float = 1.0,
+                 backoff_max: float = 30.0, breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = 0
+        self._openai: Optional["OpenAI"] = None
+        self._lock = threading.Lock()
+
+    @property
+    def openai(self) -> "OpenAI":
+        with self._lock:
+            if self._openai is None:
+                import httpx
+                from openai import OpenAI
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_connections),
+                    timeout=self.timeout,
+                )
+                self._openai = OpenAI(base_url=self.base_url, api_key=self.api_key,
+                                      http_client=http_client, max_retries=0, timeout=self.timeout)
+            return self._openai
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def create(self, model: str, messages: List[Dict[str, Any]], timeout: Optional[float] = None, **params) -> Any:
+        """chat.completions.create with rate limiting, retries and the circuit breaker.
+
+        A call counts as one breaker failure however many of its attempts fail.
+        """
+        import openai
+
+        est_tokens = estimate_message_tokens(messages)
+        failed = False
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            try:
+                self.request_bucket.acquire(1)
+                self.token_bucket.acquire(est_tokens)
+                response = self.openai.chat.completions.create(
+                    model=model, messages=messages, timeout=timeout or self.timeout, **params)
+            except Exception as e:
+                if not _is_retryable(e):
+                    if isinstance(e, openai.APIStatusError):
+                        # The proxy answered (400, 401, ...): it is up, the request is wrong
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.release()
+                    raise
+                if failed:
+                    self.breaker.release()
+                else:
+                    failed = True
+                    self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = retry_after_seconds(e)
+                delay = self.backoff(attempt) if delay is None else min(delay, self.backoff_max)
+                self.retries += 1
+                count("llm_retries")
+                print(f"  ↻ {type(e).__name__}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            usage = getattr(response, "usage", None)
+            if usage is not None and usage.total_tokens and usage.total_tokens > est_tokens:
+                self.token_bucket.debit(usage.total_tokens - est_tokens)
+            return response
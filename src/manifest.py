@@ -0,0 +1,141 @@
+"""Per-AD stage artifacts and skip-unchanged manifest for the pipeline."""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_NAME = "manifest.json"
+ARTIFACT_DIR = ".artifacts"
+# Entries recorded between manifest writes; each write replaces the whole file
+MANIFEST_SAVE_EVERY = 100
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _write_json(path: Path, data) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def _write_pages(path: Path, pages: Iterable[Tuple[int, str]]) -> None:
+    """_write_json for page texts, one page at a time (pages may be a PageSpill)."""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, 'w') as f:
+        sep = "[\n  "
+        for i, text in pages:
+            f.write(sep + json.dumps({"page": i, "text": text}))
+            sep = ",\n  "
+        f.write("[]" if sep.startswith("[") else "\n]")
+    os.replace(tmp, path)
+
+class Manifest:
+    """data/extracted/manifest.json: what each AD's outputs were built from.
+
+    Entry per ad_id: pdf_file, pdf_sha256, pages_file (page texts read),
+    applicability_text, source_page, window_tokens (estimate), extraction_version
+    (the extractor and section locator the window came from), prompt_version
+    (with the template patterns' version when the fast path was on),
+    prompt_tokens (reported by the API), rule_file, vision (the window is the
+    VLM's transcription rather than extracted text).
+
+    Records are written every save_every changes and on save(); use the
+    manifest as a context manager to save whatever is left when a run ends.
+    """
+
+    def __init__(self, output_dir: str = "data/extracted", save_every: int = MANIFEST_SAVE_EVERY):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / MANIFEST_NAME
+        self.save_every = save_every
+        self.entries: Dict[str, Dict] = {}
+        self._unsaved = 0
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f).get("ads", {})
+
+    def __enter__(self) -> "Manifest":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._unsaved:
+            self.save()
+
+    def save(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        _write_json(self.path, {"ads": self.entries})
+        self._unsaved = 0
+
+    def _changed(self) -> None:
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def plan(self, ad_id: str, pdf_sha256: str, prompt_version: str,
+             extraction_version: Optional[str] = None) -> str:
+        """'skip' if nothing changed, 'llm' if only the prompt changed, else 'full'.
+
+        A window transcribed by the VLM is never replayed through the text LLM: the
+        vision path has to run again.
+        """
+        entry = self.entries.get(ad_id)
+        if not entry or entry.get("pdf_sha256") != pdf_sha256 or not entry.get("applicability_text"):
+            return "full"
+        if extraction_version is not None and entry.get("extraction_version") != extraction_version:
+            return "full"
+        rule_file = entry.get("rule_file")
+        if entry.get("prompt_version") == prompt_version and rule_file and (self.output_dir / rule_file).exists():
+            return "skip"
+        return "full" if entry.get("vision") else "llm"
+
+    def cached_window(self, ad_id: str) -> Tuple[str, int]:
+        entry = self.entries[ad_id]
+        return entry["applicability_text"], entry.get("source_page", 1)
+
+    def prompt_tokens(self) -> int:
+        return sum(entry.get("prompt_tokens") or 0 for entry in self.entries.values())
+
+    def rule_path(self, ad_id: str) -> Path:
+        return self.output_dir / self.entries[ad_id]["rule_file"]
+
+    def record_text(self, ad_id: str, pdf_path: str, pdf_sha256: str, pages: Iterable[Tuple[int, str]],
+                    applicability_text: str, source_page: int, window_tokens: int, vision: bool = False,
+                    extraction_version: Optional[str] = None) -> None:
+        artifact_dir = self.output_dir / ARTIFACT_DIR
+        artifact_dir.mkdir(parents=True, exist_ok=True)
+        pages_file = Path(ARTIFACT_DIR) / f"{ad_id}.pages.json"
+        _write_pages(self.output_dir / pages_file, pages)
+        self.entries[ad_id] = {
+            "pdf_file": Path(pdf_path).name,
+            "pdf_sha256": pdf_sha256,
+            "pages_file": str(pages_file),
+            "applicability_text": applicability_text,
+            "source_page": source_page,
+            "window_tokens": window_tokens,
+            "extraction_version": extraction_version,
+            "prompt_version": None,
+            "prompt_tokens": None,
+            "rule_file": None,
+            "vision": vision,
+        }
+        self._changed()
+
+    def record_rule(self, ad_id: str, prompt_version: str, rule_file: Path,
+                    prompt_tokens: Optional[int] = None) -> None:
+        entry = self.entries[ad_id]
+        entry["prompt_version"] = prompt_version
+        entry["prompt_tokens"] = prompt_tokens
+        entry["rule_file"] = Path(rule_file).name
+        self._changed()
+
+    def page_texts(self, ad_id: str) -> Optional[List[Tuple[int, str]]]:
+        entry = self.entries.get(ad_id)
+        if not entry or not entry.get("pages_file"):
+            return None
+        with open(self.output_dir / entry["pages_file"], 'r') as f:
+            return [(p["page"], p["text"]) for p in json.load(f)]
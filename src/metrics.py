@@ -0,0 +1,170 @@
+"""Per-stage timings and counters, written as JSON lines and a Prometheus textfile.
+
+    with timer("llm_call", ad_id=ad_id):
+        ...
+    count("cache_hits")
+
+Every observation is kept as an event (with its labels, e.g. ad_id) for the
+JSONL file and folded into per-name totals for the Prometheus textfile.
+Worker processes drain() their events and the parent merge()s them.
+
+With --profile (src/profiling.py) every timer stage also runs under cProfile
+and tracemalloc.
+
+Quiet mode (set_quiet / AD_QUIET=1) silences log(), which the per-page and
+per-line console output in hot loops goes through.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Set
+
+from src.profiling import PROFILER
+
+METRICS_JSONL = "metrics.jsonl"
+METRICS_PROM = "metrics.prom"
+PROM_PREFIX = "ad_pipeline"
+
+_quiet = os.environ.get("AD_QUIET", "").lower() in ("1", "true", "yes", "on")
+
+def set_quiet(quiet: bool = True) -> None:
+    """Toggle quiet mode; exported through the environment so worker processes follow."""
+    global _quiet
+    _quiet = quiet
+    os.environ["AD_QUIET"] = "1" if quiet else "0"
+
+def is_quiet() -> bool:
+    return _quiet
+
+def log(*args, **kwargs) -> None:
+    """print() for hot-loop detail lines; silent in quiet mode."""
+    if not _quiet:
+        print(*args, **kwargs)
+
+class Metrics:
+    """Thread-safe event buffer plus running totals per timer/counter name."""
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        # name -> [count, sum_seconds, max_seconds]
+        self.timings: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        # JSONL files already started by this process (later writes append)
+        self._jsonl_paths: Set[Path] = set()
+        self._lock = threading.Lock()
+
+    def _record(self, event: Dict) -> None:
+        name, value = event["name"], event["value"]
+        with self._lock:
+            self.events.append(event)
+            if event["type"] == "timer":
+                totals = self.timings.setdefault(name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += value
+                totals[2] = max(totals[2], value)
+            else:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        self._record({"ts": time.time(), "type": "timer", "name": name, "value": seconds, **labels})
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        if value:
+            self._record({"ts": time.time(), "type": "counter", "name": name, "value": value, **labels})
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        profiled = PROFILER.enabled
+        if profiled:
+            PROFILER.enter(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiled:
+                PROFILER.exit(name)
+            self.observe(name, elapsed, **labels)
+
+    def drain(self) -> List[Dict]:
+        """Hand over and forget everything recorded so far (for shipping out of a worker).
+
+        Pool tasks also call it on entry: a forked worker inherits whatever
+        the parent had recorded, which the parent already counts.
+        """
+        with self._lock:
+            events, self.events = self.events, []
+            self.timings, self.counters = {}, {}
+        return events
+
+    def merge(self, events: List[Dict]) -> None:
+        for event in events:
+            self._record(event)
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "timings": {name: {"count": int(c), "sum": s, "max": m}
+                            for name, (c, s, m) in sorted(self.timings.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def write_jsonl(self, path) -> int:
+        """Write buffered events to path and clear the buffer (totals are kept).
+
+        The first write to a path replaces whatever an earlier run left there;
+        later writes from this run append.
+        """
+        path = Path(path).resolve()
+        with self._lock:
+            events, self.events = self.events, []
+            mode = 'a' if path in self._jsonl_paths else 'w'
+            self._jsonl_paths.add(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, mode) as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+        return len(events)
+
+    def prometheus_text(self) -> str:
+        summary = self.summary()
+        lines = [f"# HELP {PROM_PREFIX}_stage_seconds Time spent per pipeline stage",
+                 f"# TYPE {PROM_PREFIX}_stage_seconds summary"]
+        for name, t in summary["timings"].items():
+            lines.append(f'{PROM_PREFIX}_stage_seconds_count{{stage="{name}"}} {t["count"]}')
+            lines.append(f'{PROM_PREFIX}_stage_seconds_sum{{stage="{name}"}} {t["sum"]:.6f}')
+        lines.append(f"# HELP {PROM_PREFIX}_stage_seconds_max Slowest single observation per stage")
+        lines.append(f"# TYPE {PROM_PREFIX}_stage_seconds_max gauge")
+        for name, t in summary["timings"].items():
+            lines.append(f'{PROM_PREFIX}_stage_seconds_max{{stage="{name}"}} {t["max"]:.6f}')
+        for name, value in summary["counters"].items():
+            lines.append(f"# TYPE {PROM_PREFIX}_{name}_total counter")
+            lines.append(f"{PROM_PREFIX}_{name}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path) -> None:
+        """Write the node_exporter textfile atomically (it may be scraped mid-write)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def write(self, output_dir) -> None:
+        output_dir = Path(output_dir)
+        n_events = self.write_jsonl(output_dir / METRICS_JSONL)
+        self.write_prometheus(output_dir / METRICS_PROM)
+        print(f"Metrics: {n_events} events -> {output_dir / METRICS_JSONL}, totals -> {output_dir / METRICS_PROM}")
+
+METRICS = Metrics()
+
+def timer(name: str, **labels):
+    return METRICS.timer(name, **labels)
+
+def count(name: str, value: float = 1, **labels) -> None:
+    METRICS.count(name, value, **labels)
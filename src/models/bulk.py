@@ -0,0 +1,103 @@
+"""Low-overhead bulk representations of aircraft and evaluation results.
+
+Input is validated once per batch with a TypeAdapter; pydantic models are
+only built on demand with to_model(). Nothing here imports pydantic until
+it is needed, so evaluation against stored rules starts quickly.
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from src.models.schemas import Aircraft, EvaluationResult
+
+_FLEET_ADAPTER = None
+
+def fleet_adapter():
+    """TypeAdapter for a list of AircraftRow dicts, built on first use."""
+    global _FLEET_ADAPTER
+    if _FLEET_ADAPTER is None:
+        from pydantic import Field, TypeAdapter
+        from typing_extensions import Annotated, NotRequired, TypedDict
+
+        class AircraftRow(TypedDict):
+            model: str
+            msn: Annotated[int, Field(gt=0)]
+            modifications: NotRequired[List[str]]
+            id: NotRequired[str]
+
+        _FLEET_ADAPTER = TypeAdapter(List[AircraftRow])
+    return _FLEET_ADAPTER
+
+class RuleRecord:
+    """A stored rule as RuleIndex reads it, trusted because the pipeline validated it on write."""
+
+    __slots__ = ("ad_id", "aircraft_models", "msn_range", "excluded_modifications", "confidence")
+
+    def __init__(self, ad_id: str, aircraft_models: List[str], msn_range: Optional[Tuple[int, int]],
+                 excluded_modifications: List[str], confidence: float):
+        self.ad_id = ad_id
+        self.aircraft_models = aircraft_models
+        self.msn_range = msn_range
+        self.excluded_modifications = excluded_modifications
+        self.confidence = confidence
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RuleRecord":
+        msn_range = data.get("msn_range")
+        return cls(data["ad_id"], data["aircraft_models"], tuple(msn_range) if msn_range else None,
+                   data.get("excluded_modifications") or [], data.get("confidence", 0.8))
+
+class AircraftRecord:
+    """Trusted, already-normalized aircraft configuration."""
+
+    __slots__ = ("aircraft_id", "model", "msn", "modifications")
+
+    def __init__(self, aircraft_id: str, model: str, msn: int, modifications: List[str]):
+        self.aircraft_id = aircraft_id
+        self.model = model
+        self.msn = msn
+        self.modifications = modifications
+
+    @classmethod
+    def from_model(cls, aircraft_id: str, aircraft: "Aircraft") -> "AircraftRecord":
+        return cls(aircraft_id, aircraft.model, aircraft.msn, aircraft.modifications)
+
+    def to_model(self) -> "Aircraft":
+        from src.models.schemas import Aircraft
+        # Fields were validated and normalized with the batch
+        return Aircraft.model_construct(model=self.model, msn=self.msn, modifications=list(self.modifications))
+
+class ResultRecord:
+    """One aircraft x AD decision, without the copied Aircraft or a timestamp."""
+
+    __slots__ = ("aircraft_id", "ad_id", "is_affected", "reason", "confidence")
+
+    def __init__(self, aircraft_id: str, ad_id: str, is_affected: bool, reason: str, confidence: float):
+        self.aircraft_id = aircraft_id
+        self.ad_id = ad_id
+        self.is_affected = is_affected
+        self.reason = reason
+        self.confidence = confidence
+
+    def to_row(self) -> Dict[str, Any]:
+        return {"aircraft_id": self.aircraft_id, "ad_id": self.ad_id, "is_affected": self.is_affected,
+                "reason": self.reason, "confidence": self.confidence}
+
+    def to_model(self, aircraft: "Aircraft", evaluated_at: Optional[datetime] = None) -> "EvaluationResult":
+        from src.models.schemas import EvaluationResult
+        return EvaluationResult.model_construct(aircraft=aircraft, ad_id=self.ad_id, is_affected=self.is_affected,
+                                                reason=self.reason, confidence=self.confidence,
+                                                evaluated_at=evaluated_at or datetime.now())
+
+def validate_fleet(rows: Iterable[Dict[str, Any]], start: int = 1) -> List[AircraftRecord]:
+    """Validate a batch of raw rows in one pass and normalize them like Aircraft does.
+
+    Rows without an id get their row number, counting from start.
+    """
+    validated = fleet_adapter().validate_python(list(rows))
+    return [
+        AircraftRecord(row.get("id") or str(n), row["model"].strip().upper(), row["msn"],
+                       [m.strip().lower() for m in row.get("modifications", ())])
+        for n, row in enumerate(validated, start)
+    ]
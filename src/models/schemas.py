@@ -37,6 +37,13 @@ class ApplicabilityRule(BaseModel):
         data = self.model_dump()
         data['extracted_at'] = data['extracted_at'].isoformat()
         return data
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "ApplicabilityRule":
+        data = dict(data)
+        if data.get('msn_range'):
+            data['msn_range'] = tuple(data['msn_range'])
+        return cls(**data)
 
 class Aircraft(BaseModel):
     """Aircraft configuration."""
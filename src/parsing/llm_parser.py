@@ -1,56 +1,220 @@
+import hashlib
 import json
-from typing import Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from src.config import get_completion
+from src.tokens import estimate_tokens
 
-def parse_with_llm(text: str, ad_id: str, page: int = 1) -> Dict:
-    print(f"\n{'='*60}\nLLM PARSING: {ad_id}\n{'='*60}")
-    
-    prompt = f"""Extract applicability rules from this AD text.
+PROMPT_TEMPLATE = """Extract applicability rules from this AD text.
 
 Return ONLY valid JSON:
-{{
+{
   "aircraft_models": ["list of models"],
   "msn_range": [min, max] or null,
   "excluded_modifications": ["mods that exempt"],
   "confidence": 0.0-1.0,
   "raw_applicability_text": "original text"
-}}
+}
 
 AD TEXT:
 {text}"""
+
+BATCH_PROMPT_TEMPLATE = """Extract applicability rules from each AD text below.
+
+Return ONLY valid JSON: one object whose keys are the ad_id values given below,
+each mapping to:
+{
+  "aircraft_models": ["list of models"],
+  "msn_range": [min, max] or null,
+  "excluded_modifications": ["mods that exempt"],
+  "confidence": 0.0-1.0,
+  "raw_applicability_text": "original text"
+}
+
+{items}"""
+
+VISION_PROMPT_TEMPLATE = """Extract applicability rules from the attached AD page images.
+
+Return ONLY valid JSON:
+{
+  "aircraft_models": ["list of models"],
+  "msn_range": [min, max] or null,
+  "excluded_modifications": ["mods that exempt"],
+  "confidence": 0.0-1.0,
+  "raw_applicability_text": "applicability text as printed on the page"
+}
+
+If the pages contain no applicability statement, return "aircraft_models": []."""
+
+# Changes whenever a template text changes; recorded with each extracted AD
+PROMPT_VERSION = hashlib.sha256((PROMPT_TEMPLATE + BATCH_PROMPT_TEMPLATE).encode("utf-8")).hexdigest()[:12]
+
+# Input-token budget per batched request (AD windows only, excluding the template)
+BATCH_TOKEN_BUDGET = 6000
+
+def create_extraction_prompt() -> str:
+    """Instruction text sent with the page images on the vision path."""
+    return VISION_PROMPT_TEMPLATE
+
+def _set_defaults(result_dict: Dict, text: str, page: int) -> Dict:
+    result_dict.setdefault('aircraft_models', [])
+    result_dict.setdefault('msn_range', None)
+    result_dict.setdefault('excluded_modifications', [])
+    result_dict.setdefault('confidence', 0.8)
+    result_dict.setdefault('source_page', page)
+    result_dict.setdefault('raw_applicability_text', text[:200])
+    return result_dict
+
+def _parse_result(response: Any, text: str, page: int) -> Dict:
+    result_dict = json.loads(response.choices[0].message.content)
+    
+    # Handle if LLM returns list instead of dict
+    if isinstance(result_dict, list):
+        result_dict = result_dict[0] if result_dict else {}
+    
+    # Set defaults
+    if not isinstance(result_dict, dict):
+        raise ValueError("Invalid response format")
+    return _set_defaults(result_dict, text, page)
+
+def parse_with_llm(text: str, ad_id: str, page: int = 1,
+                   validate: Optional[Callable[[Dict, str], Any]] = None) -> Dict:
+    """validate(result_dict, ad_id) should raise on a bad answer, which is then not cached."""
+    print(f"\n{'='*60}\nLLM PARSING: {ad_id}\n{'='*60}")
     
+    prompt = PROMPT_TEMPLATE.replace("{text}", text)
+    parsed: Dict[str, Dict] = {}
+    
+    def check(response: Any) -> None:
+        result_dict = _parse_result(response, text, page)
+        if validate:
+            validate(result_dict, ad_id)
+        parsed["result"] = result_dict
+    
+    result_text = ""
     try:
-        response = get_completion(messages=[{"role": "user", "content": prompt}], use_vision=False)
+        response = get_completion(messages=[{"role": "user", "content": prompt}], use_vision=False,
+                                  validate=check)
         result_text = response.choices[0].message.content
         print(f"✓ Received {len(result_text)} chars")
         
-        # Parse JSON
-        result_dict = json.loads(result_text)
-        
-        # Handle if LLM returns list instead of dict
-        if isinstance(result_dict, list):
-            result_dict = result_dict[0] if result_dict else {}
-        
-        # Set defaults
-        if not isinstance(result_dict, dict):
-            raise ValueError("Invalid response format")
-            
-        result_dict.setdefault('aircraft_models', [])
-        result_dict.setdefault('msn_range', None)
-        result_dict.setdefault('excluded_modifications', [])
-        result_dict.setdefault('confidence', 0.8)
-        result_dict.setdefault('source_page', page)
-        result_dict.setdefault('raw_applicability_text', text[:200])
+        result_dict = parsed["result"]
+        usage = getattr(response, 'usage', None)
+        result_dict['prompt_tokens'] = usage.prompt_tokens if usage else None
         
         print(f"✓ Parsed successfully")
         print(f"  Models: {result_dict['aircraft_models']}")
         print(f"  Confidence: {result_dict['confidence']:.2f}")
+        print(f"  Prompt tokens: {result_dict['prompt_tokens']}")
         
         return result_dict
     except json.JSONDecodeError as e:
         print(f"✗ JSON error: {e}")
-        print(f"Response: {result_text[:200]}")
         raise
     except Exception as e:
         print(f"✗ Failed: {e}")
         raise
+
+def pack_batches(items: List[Tuple[str, str, int]], token_budget: int = BATCH_TOKEN_BUDGET,
+                 max_items: Optional[int] = None) -> List[List[Tuple[str, str, int]]]:
+    """Group (ad_id, text, page) items so each batch's windows fit the token budget."""
+    batches, current, used = [], [], 0
+    for item in items:
+        tokens = estimate_tokens(item[1])
+        if current and (used + tokens > token_budget or (max_items and len(current) >= max_items)):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _request_batch(batch: List[Tuple[str, str, int]],
+                   validate: Optional[Callable[[Dict, str], Any]] = None) -> Tuple[Dict[str, Any], Optional[int]]:
+    """The batch response is cached only if every entry in it validates."""
+    items = "\n\n".join(f"=== ad_id: {ad_id} ===\n{text}" for ad_id, text, _ in batch)
+    prompt = BATCH_PROMPT_TEMPLATE.replace("{items}", items)
+    parsed: Dict[str, Dict] = {}
+    
+    def check(response: Any) -> bool:
+        result = json.loads(response.choices[0].message.content)
+        if not isinstance(result, dict):
+            raise ValueError("Invalid batch response format")
+        parsed["result"] = result
+        for ad_id, text, page in batch:
+            entry = result.get(ad_id)
+            if not isinstance(entry, dict):
+                return False
+            try:
+                if validate:
+                    validate(_set_defaults(dict(entry), text, page), ad_id)
+            except Exception:
+                return False
+        return True
+    
+    response = get_completion(messages=[{"role": "user", "content": prompt}], use_vision=False,
+                              max_tokens=max(2000, 600 * len(batch)), validate=check)
+    usage = getattr(response, 'usage', None)
+    return parsed["result"], usage.prompt_tokens if usage else None
+
+def parse_batch_with_llm(items: List[Tuple[str, str, int]],
+                         validate: Optional[Callable[[Dict, str], Any]] = None,
+                         token_budget: int = BATCH_TOKEN_BUDGET,
+                         max_items: Optional[int] = None) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """Parse several ADs' applicability windows with one request per batch.
+    
+    items are (ad_id, text, page). Each entry of a response is checked with
+    validate(result_dict, ad_id), which should raise on a bad entry. Entries
+    that fail are re-requested in halved batches; a single failing entry
+    falls back to parse_with_llm. Returns (results by ad_id, errors by ad_id);
+    each result carries its share of the batch's prompt tokens.
+    """
+    results: Dict[str, Dict] = {}
+    errors: Dict[str, str] = {}
+    
+    def run(batch: List[Tuple[str, str, int]]) -> None:
+        if len(batch) == 1:
+            ad_id, text, page = batch[0]
+            try:
+                results[ad_id] = parse_with_llm(text, ad_id, page, validate)
+            except Exception as e:
+                errors[ad_id] = str(e)
+            return
+        
+        print(f"\n{'='*60}\nLLM BATCH: {len(batch)} ADs\n{'='*60}")
+        try:
+            response, prompt_tokens = _request_batch(batch, validate)
+        except Exception as e:
+            print(f"✗ Batch failed: {e}")
+            response, prompt_tokens = {}, None
+        
+        total_est = sum(estimate_tokens(text) for _, text, _ in batch) or 1
+        failed = []
+        for ad_id, text, page in batch:
+            entry = response.get(ad_id)
+            try:
+                if not isinstance(entry, dict):
+                    raise ValueError("missing from batch response")
+                _set_defaults(entry, text, page)
+                if validate:
+                    validate(entry, ad_id)
+            except Exception as e:
+                print(f"  ✗ {ad_id}: {str(e)[:80]}")
+                failed.append((ad_id, text, page))
+                continue
+            if prompt_tokens is not None:
+                entry['prompt_tokens'] = round(prompt_tokens * estimate_tokens(text) / total_est)
+            else:
+                entry['prompt_tokens'] = None
+            results[ad_id] = entry
+        print(f"✓ {len(batch) - len(failed)}/{len(batch)} entries valid")
+        
+        if failed:
+            half = (len(failed) + 1) // 2
+            run(failed[:half])
+            if failed[half:]:
+                run(failed[half:])
+    
+    for batch in pack_batches(items, token_budget, max_items):
+        run(batch)
+    return results, errors
@@ -0,0 +1,309 @@
+"""Deterministic fast path for boilerplate applicability wording.
+
+Most ADs state applicability in one of a few fixed shapes:
+
+    Applicability: Airbus A320-211, -212, -214 aeroplanes, all manufacturer
+    serial numbers (MSN), except those on which Airbus modification 24591
+    has been embodied in production.
+
+    (c) Applicability
+    This AD applies to The Boeing Company Model MD-11 and MD-11F airplanes,
+    certificated in any category.
+
+parse_with_templates() returns the same raw result dict as parse_with_llm
+when the whole applicability sentence is accounted for by the patterns
+below, and None otherwise. Any word it does not recognise ("unless",
+"as identified in", a second sentence, "all variants") sends the AD to the
+LLM, so a template answer is only given when nothing was left over.
+
+    python -m src templates --output-dir data/extracted
+
+reports the hit rate over the manifest's cached windows and how often the
+template answer agrees with the LLM-extracted rules stored beside them.
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from src.evaluation.normalize import normalize_mod, normalize_model
+from src.metrics import count, log, timer
+
+# Confidence given to a template answer (the LLM reports its own)
+TEMPLATE_CONFIDENCE = 0.95
+
+HEADING = re.compile(r'^\s*(?:\([a-z]\)\s*|\d+\.\s*)?(?:applicability|affected products)\s*:?\s*', re.I)
+PREAMBLE = r'(?:this (?:ad|directive) applies to\s+)?(?:the\s+)?(?:all\s+)?'
+MANUFACTURER = (r'(?:(?:airbus sas|airbus canada limited partnership|airbus|boeing company|boeing|'
+                r'mcdonnell douglas corporation|mcdonnell douglas|bombardier inc|bombardier|embraer)\s+)?')
+# A320-214, A321-271NX, MD-11F, 737-900ER, DC-10-30F; a bare number ("Bombardier 100") is not one
+DESIGNATOR = r'(?:[A-Z]{1,4}-?\d{1,4}(?:-\d{1,4})?|\d{1,4}-\d{1,4})[A-Z]{0,3}(?:-\d{1,4}[A-Z]{0,3})?'
+# "-212" in "A320-211, -212, -214"
+SUFFIX = r'-\d{1,4}[A-Z]{0,3}'
+MODEL_ITEM = rf'(?:models?\s+)?(?:{DESIGNATOR}|{SUFFIX})'
+MODEL_LIST = rf'{MODEL_ITEM}(?:(?:\s*,\s*(?:and\s+)?|\s+and\s+|\s*&\s*){MODEL_ITEM})*'
+TYPE_WORD = r'(?:\s+(?:series\s+)?(?:airplanes|aeroplanes|aircraft|helicopters))?'
+CATEGORY = r'(?:\s*,?\s*certificated in any category)?'
+ALL_MSN = r"all (?:manufacturer(?:'s)? )?serial numbers(?: \(msns?\))?|all msns?"
+RANGE_MSN = (r"(?:(?:manufacturer(?:'s)? )?serial numbers?(?: \(msns?\))?|msns?)\s+(?:from\s+)?"
+             r"(?P<low>\d+)\s*(?:to|through|thru|-)\s*(?P<high>\d+)(?:\s+inclusive)?")
+SENTENCE = re.compile(
+    rf'^{PREAMBLE}{MANUFACTURER}(?P<models>{MODEL_LIST}){TYPE_WORD}{CATEGORY}'
+    rf'(?:\s*,?\s*(?:(?P<all_msn>{ALL_MSN})|{RANGE_MSN}))?{CATEGORY}'
+    rf'(?:\s*,?\s*except\b(?P<exceptions>.+))?$', re.I)
+MODEL_TOKEN = re.compile(rf'{DESIGNATOR}|{SUFFIX}', re.I)
+
+# Tokens of an exception clause; the clause itself is checked by _exceptions()
+EXCEPTION_TOKENS = re.compile(r'''
+      (?P<sb>(?:airbus\s+)?(?:service\s+bulletin|sb)\s+(?:\(sb\)\s+)?(?P<sb_ref>[A-Z0-9]+(?:-[A-Z0-9]+)+)
+             (?:\s*,?\s*(?:at\s+)?(?:revision|rev)\s*\d+)?)
+    | (?P<mod>(?:airbus\s+)?(?:modifications?|mods?)\s+(?:\(mod\)\s+)?(?P<mod_ref>\d{3,6}))
+    | (?P<num>\d{3,6})
+    | (?P<word>[a-z]+|,)
+''', re.I | re.X)
+VERBS = {"embodied", "incorporated", "accomplished"}
+# Bump when _exceptions() accepts a different clause shape (the patterns alone don't show it)
+EXCEPTION_GRAMMAR = 2
+
+def _version() -> str:
+    source = "\n".join([p.pattern for p in (HEADING, SENTENCE, EXCEPTION_TOKENS)] + [str(EXCEPTION_GRAMMAR)])
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+
+# Changes whenever a pattern changes, like PROMPT_VERSION for the LLM prompts
+TEMPLATE_VERSION = _version()
+
+def applicability_sentence(text: str) -> Optional[str]:
+    """The window as one line without its heading, or None unless it is exactly one sentence."""
+    lines = [line for line in text.split('\n') if not line.startswith('--- PAGE')]
+    joined = re.sub(r'-\s*\n\s*', '-', '\n'.join(lines).strip())
+    sentence = ' '.join(HEADING.sub('', joined, count=1).split())
+    if sentence.endswith('.'):
+        sentence = sentence[:-1].rstrip()
+    if not sentence or '.' in sentence or ';' in sentence:
+        return None
+    return sentence
+
+def _expand_models(models: str) -> List[str]:
+    """'A320-211, -212 and -214' -> ['A320-211', 'A320-212', 'A320-214']"""
+    expanded = []
+    for token in MODEL_TOKEN.findall(models):
+        token = token.upper()
+        if token.startswith('-'):
+            if not expanded or '-' not in expanded[-1]:
+                return []
+            token = expanded[-1].rsplit('-', 1)[0] + token
+        if token not in expanded:
+            expanded.append(token)
+    return expanded
+
+def _tokens(clause: str) -> Optional[List[Tuple[str, str]]]:
+    """(kind, value) per token: kind is sb, mod, num or word; None if anything else is in the clause."""
+    tokens, pos = [], 0
+    while pos < len(clause):
+        if clause[pos].isspace():
+            pos += 1
+            continue
+        match = EXCEPTION_TOKENS.match(clause, pos)
+        if not match:
+            return None
+        if match.group('sb'):
+            tokens.append(('sb', f"SB {match.group('sb_ref').upper()}"))
+        elif match.group('mod'):
+            tokens.append(('mod', f"mod {match.group('mod_ref')}"))
+        elif match.group('num'):
+            tokens.append(('num', match.group('num')))
+        else:
+            tokens.append(('word', match.group('word').lower()))
+        pos = match.end()
+    return tokens
+
+def _exceptions(clause: str) -> Optional[List[str]]:
+    """Excluded modifications named by an except clause, or None unless it has the expected shape.
+
+    Accepted: "those [aeroplanes] on which <items> has/have been embodied/incorporated/accomplished
+    [in production|in service]", repeated with ", or on which ...". Items are joined by "," or
+    "or" only: "mod 1 and mod 2 have been embodied" excludes aircraft with both, which an
+    excluded_modifications list cannot say, so it goes to the LLM.
+    """
+    tokens = _tokens(clause.strip())
+    if not tokens:
+        return None
+    tokens.append(('end', ''))
+    pos = 0
+
+    def accept(*words: str) -> bool:
+        nonlocal pos
+        if tokens[pos] in [('word', w) for w in words]:
+            pos += 1
+            return True
+        return False
+
+    mods = []
+    if not accept('those'):
+        return None
+    accept('aeroplanes', 'airplanes', 'aircraft')
+    while True:
+        if not (accept('on') and accept('which')):
+            return None
+        accept('either')
+        last_kind = None
+        while True:
+            kind, value = tokens[pos]
+            # "modifications 24591 or 24977": a bare number continues a mod list only
+            if kind in ('sb', 'mod') or (kind == 'num' and last_kind == 'mod'):
+                mods.append(value if kind != 'num' else f"mod {value}")
+                last_kind = 'mod' if kind == 'num' else kind
+                pos += 1
+            else:
+                return None
+            if accept(','):
+                accept('or')
+            elif not accept('or'):
+                break
+        if not (accept('has', 'have') and accept('been') and accept(*VERBS)):
+            return None
+        if accept('in') and not accept('production', 'service'):
+            return None
+        if tokens[pos][0] == 'end':
+            break
+        accept(',')
+        if not accept('or'):
+            return None
+    return list(dict.fromkeys(mods))
+
+def match_templates(text: str) -> Optional[Dict]:
+    """aircraft_models / msn_range / excluded_modifications for a fully matched window, else None."""
+    sentence = applicability_sentence(text)
+    if sentence is None:
+        return None
+    match = SENTENCE.match(sentence)
+    if not match:
+        return None
+    models = _expand_models(match.group('models'))
+    if not models or not any(c.isdigit() for m in models for c in m):
+        return None
+    msn_range = None
+    if match.group('low'):
+        msn_range = [int(match.group('low')), int(match.group('high'))]
+        if msn_range[0] > msn_range[1]:
+            return None
+    excluded = []
+    if match.group('exceptions'):
+        excluded = _exceptions(match.group('exceptions'))
+        if excluded is None:
+            return None
+    return {
+        "aircraft_models": models,
+        "msn_range": msn_range,
+        "excluded_modifications": excluded,
+        "raw_applicability_text": sentence,
+    }
+
+def parse_with_templates(text: str, ad_id: str, page: int = 1) -> Optional[Dict]:
+    """parse_with_llm's result dict from the patterns alone, or None to fall through to the LLM."""
+    with timer("template_parse", ad_id=ad_id):
+        result = match_templates(text)
+    if result is None:
+        count("template_misses")
+        log(f"  {ad_id}: no template match, using the LLM")
+        return None
+    count("template_hits")
+    print(f"\n{'='*60}\nTEMPLATE PARSING: {ad_id}\n{'='*60}")
+    print(f"✓ Matched without the LLM")
+    print(f"  Models: {result['aircraft_models']}")
+    result.update({"confidence": TEMPLATE_CONFIDENCE, "source_page": page, "prompt_tokens": 0})
+    return result
+
+def agreement(template: Dict, rule: Dict) -> Dict[str, bool]:
+    """Field-by-field comparison under the evaluator's normalization."""
+    rule_range = list(rule["msn_range"]) if rule.get("msn_range") else None
+    return {
+        "models": ({normalize_model(m) for m in template["aircraft_models"]} ==
+                   {normalize_model(m) for m in rule["aircraft_models"]}),
+        "msn_range": template["msn_range"] == rule_range,
+        "excluded_modifications": ({normalize_mod(m) for m in template["excluded_modifications"]} ==
+                                   {normalize_mod(m) for m in rule.get("excluded_modifications", [])}),
+    }
+
+def validation_report(windows: List[Tuple[str, str, Optional[Dict]]]) -> Dict:
+    """Hit rate over (ad_id, window, reference rule or None) and agreement on the hits with a reference."""
+    hits, compared, agreed = [], 0, 0
+    fields = {"models": 0, "msn_range": 0, "excluded_modifications": 0}
+    disagreements = []
+    for ad_id, window, reference in windows:
+        result = match_templates(window)
+        if result is None:
+            continue
+        hits.append(ad_id)
+        if reference is None:
+            continue
+        compared += 1
+        checks = agreement(result, reference)
+        for name, ok in checks.items():
+            fields[name] += ok
+        if all(checks.values()):
+            agreed += 1
+        else:
+            disagreements.append({"ad_id": ad_id, "fields": [k for k, ok in checks.items() if not ok],
+                                  "template": result, "reference": {k: reference.get(k) for k in fields}})
+    return {
+        "template_version": TEMPLATE_VERSION,
+        "windows": len(windows),
+        "hits": len(hits),
+        "hit_rate": len(hits) / len(windows) if windows else 0.0,
+        "compared": compared,
+        "agreed": agreed,
+        "agreement": agreed / compared if compared else 0.0,
+        "field_agreement": {k: v / compared if compared else 0.0 for k, v in fields.items()},
+        "disagreements": disagreements,
+    }
+
+def manifest_windows(output_dir: str) -> List[Tuple[str, str, Optional[Dict]]]:
+    """Cached applicability windows from the manifest, each with its LLM-extracted rule if there is one."""
+    from src.manifest import Manifest
+
+    manifest = Manifest(output_dir)
+    windows = []
+    for ad_id, entry in sorted(manifest.entries.items()):
+        if not entry.get("applicability_text") or entry.get("vision"):
+            continue
+        reference = None
+        rule_file = entry.get("rule_file")
+        if rule_file and (manifest.output_dir / rule_file).exists():
+            with open(manifest.output_dir / rule_file, 'r') as f:
+                rule = json.load(f)
+            if rule.get("extraction_method") != "text+template":
+                reference = rule
+        windows.append((ad_id, entry["applicability_text"], reference))
+    return windows
+
+def print_report(report: Dict) -> None:
+    print(f"Template fast path {report['template_version']}: {report['hits']}/{report['windows']} windows matched "
+          f"({report['hit_rate']:.0%})")
+    print(f"Agreement with the LLM: {report['agreed']}/{report['compared']} rules ({report['agreement']:.0%}); "
+          + ", ".join(f"{k} {v:.0%}" for k, v in report["field_agreement"].items()))
+    if not report["compared"]:
+        print("  (no LLM-extracted rules to compare with; run `python -m src extract --no-templates --force` first)")
+    for d in report["disagreements"]:
+        print(f"  ✗ {d['ad_id']}: {', '.join(d['fields'])} differ")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Template fast-path hit rate and agreement with the LLM")
+    parser.add_argument("--output-dir", default="data/extracted",
+                        help="pipeline output with manifest.json (rules from a --no-templates run are the reference)")
+    parser.add_argument("--out", default=None, help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = validation_report(manifest_windows(args.output_dir))
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report saved to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
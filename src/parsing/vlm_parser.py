@@ -2,69 +2,173 @@
 
 import base64
 import json
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 
-from pdf2image import convert_from_path
+import pdfplumber
 from src.config import get_completion
+from src.metrics import log, timer
 from src.parsing.llm_parser import create_extraction_prompt
 
-def convert_pdf_to_images(pdf_path: str, max_pages: int = 10, dpi: int = 200) -> List[str]:
-    """Convert PDF to base64 images."""
+VLM_DPI = 200
+VLM_FORMAT = "PNG"
+VLM_MAX_IMAGE_BYTES = 1_500_000
+VLM_MAX_PAGES = 10
+VLM_RENDER_WORKERS = 4
+# Pages with fewer characters than this in their text layer are treated as scanned
+MIN_TEXT_LAYER_CHARS = 50
+
+def select_vision_pages(pdf_path: str, applicability_page: Optional[int] = None,
+                        neighbours: int = 1, max_pages: int = VLM_MAX_PAGES) -> List[int]:
+    """Pages that need vision: the applicability page and its neighbours, plus pages with no text layer."""
+    selected = set()
+    with pdfplumber.open(pdf_path) as pdf:
+        n_pages = len(pdf.pages)
+        if applicability_page:
+            selected.update(p for p in range(applicability_page - neighbours, applicability_page + neighbours + 1)
+                            if 1 <= p <= n_pages)
+        for i, page in enumerate(pdf.pages, 1):
+            if len(selected) >= max_pages:
+                break
+            if len(page.chars) < MIN_TEXT_LAYER_CHARS:
+                selected.add(i)
+            page.flush_cache()
+    return sorted(selected)[:max_pages]
+
+def first_pages(pdf_path: str, max_pages: int = VLM_MAX_PAGES) -> List[int]:
+    with pdfplumber.open(pdf_path) as pdf:
+        return list(range(1, min(len(pdf.pages), max_pages) + 1))
+
+def _encode(img, fmt: str, quality: int) -> bytes:
+    buffered = BytesIO()
+    if fmt == "JPEG":
+        img.convert("RGB").save(buffered, format="JPEG", quality=quality, optimize=True)
+    else:
+        img.save(buffered, format=fmt, optimize=True)
+    return buffered.getvalue()
+
+def render_page(pdf_path: str, page: int, dpi: int = VLM_DPI, fmt: str = VLM_FORMAT,
+                max_bytes: int = VLM_MAX_IMAGE_BYTES) -> str:
+    """Render one page and return it base64-encoded, within max_bytes of encoded image data.
+
+    Over budget, JPEG quality is lowered first, then the image is downscaled.
+    """
+    # Pulls in PIL; only needed once a page is rendered
+    from pdf2image import convert_from_path
+    from pdf2image.exceptions import PDFInfoNotInstalledError
+
+    fmt = fmt.upper().replace("JPG", "JPEG")
+    with timer("page_render", page=page):
+        try:
+            img = convert_from_path(pdf_path, dpi=dpi, first_page=page, last_page=page)[0]
+        except PDFInfoNotInstalledError:
+            # No poppler on this machine: pdfplumber renders through pypdfium2 instead
+            with pdfplumber.open(pdf_path) as pdf:
+                img = pdf.pages[page - 1].to_image(resolution=dpi).original.copy()
+    try:
+        quality = 85
+        data = _encode(img, fmt, quality)
+        while max_bytes and len(data) > max_bytes:
+            if fmt == "JPEG" and quality > 40:
+                quality -= 15
+            elif min(img.size) > 300:
+                scaled = img.resize((int(img.width * 0.8), int(img.height * 0.8)))
+                img.close()
+                img = scaled
+            else:
+                break
+            data = _encode(img, fmt, quality)
+    finally:
+        img.close()
+    return base64.b64encode(data).decode('utf-8')
+
+def iter_page_images(pdf_path: str, pages: Iterable[int], dpi: int = VLM_DPI, fmt: str = VLM_FORMAT,
+                     max_bytes: int = VLM_MAX_IMAGE_BYTES,
+                     workers: int = VLM_RENDER_WORKERS) -> Iterator[Tuple[int, str]]:
+    """Render pages in parallel, yielding (page, base64) in page order.
+
+    Each worker encodes and drops its PIL image before taking the next page,
+    so at most `workers` pages are held as images at once.
+    """
+    pages = list(pages)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rendered = pool.map(lambda p: render_page(pdf_path, p, dpi, fmt, max_bytes), pages)
+        for page, img_b64 in zip(pages, rendered):
+            log(f" Page {page} converted ({len(img_b64) * 3 // 4:,} bytes)")
+            yield page, img_b64
+
+def convert_pdf_to_images(pdf_path: str, max_pages: int = VLM_MAX_PAGES, dpi: int = VLM_DPI,
+                          pages: Optional[List[int]] = None, fmt: str = VLM_FORMAT,
+                          max_bytes: int = VLM_MAX_IMAGE_BYTES) -> List[str]:
+    """Convert PDF pages (default: the first max_pages) to base64 images."""
     print(f"\nConverting PDF to images (DPI: {dpi}, Max pages: {max_pages})...")
     
     try:
-        images = convert_from_path(pdf_path, dpi=dpi, first_page=1, last_page=max_pages)
-        
-        base64_images = []
-        for i, img in enumerate(images, 1):
-            buffered = BytesIO()
-            img.save(buffered, format="PNG")
-            img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-            base64_images.append(img_base64)
-            print(f" Page {i} converted")
-        
+        if pages is None:
+            pages = first_pages(pdf_path, max_pages)
+        base64_images = [img for _, img in iter_page_images(pdf_path, pages[:max_pages], dpi, fmt, max_bytes)]
         print(f" Converted {len(base64_images)} pages")
         return base64_images
     except Exception as e:
         print(f" Conversion failed: {e}")
         raise
 
-def parse_with_vlm(pdf_path: str, ad_id: str) -> Dict:
-    """Parse with Vision-Language Model."""
+def _parse_answer(response) -> Dict:
+    result_dict = json.loads(response.choices[0].message.content)
+    if not isinstance(result_dict, dict):
+        raise ValueError("Invalid response format")
+    return result_dict
+
+def parse_with_vlm(pdf_path: str, ad_id: str, pages: Optional[List[int]] = None,
+                   applicability_page: Optional[int] = None, dpi: int = VLM_DPI,
+                   fmt: str = VLM_FORMAT, max_bytes: int = VLM_MAX_IMAGE_BYTES) -> Dict:
+    """Parse with Vision-Language Model.
+
+    Only the given pages are rendered; by default select_vision_pages picks them,
+    or the first VLM_MAX_PAGES pages if it finds none.
+    """
     print(f"\n{'='*60}")
     print(f"VLM PARSING: {ad_id}")
     print(f"{'='*60}")
     
-    images = convert_pdf_to_images(pdf_path, max_pages=10)
+    if pages is None:
+        pages = select_vision_pages(pdf_path, applicability_page) or first_pages(pdf_path)
+    if not pages:
+        raise ValueError(f"No pages to send to the VLM for {ad_id}")
+    print(f"Vision pages: {pages}")
     
+    mime = "jpeg" if fmt.upper() in ("JPEG", "JPG") else fmt.lower()
     prompt = create_extraction_prompt()
     message_content = [{"type": "text", "text": prompt}]
     
-    for img_b64 in images:
+    for _, img_b64 in iter_page_images(pdf_path, pages, dpi, fmt, max_bytes):
         message_content.append({
             "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{img_b64}"}
+            "image_url": {"url": f"data:image/{mime};base64,{img_b64}"}
         })
     
     try:
         print(f"Calling Gemini Vision...")
         response = get_completion(
             messages=[{"role": "user", "content": message_content}],
-            use_vision=True
+            use_vision=True,
+            validate=_parse_answer
         )
         
-        result_text = response.choices[0].message.content
-        result_dict = json.loads(result_text)
+        result_dict = _parse_answer(response)
         
         # Set defaults
         result_dict.setdefault('aircraft_models', [])
         result_dict.setdefault('msn_range', None)
         result_dict.setdefault('excluded_modifications', [])
         result_dict.setdefault('required_modifications', [])
-        result_dict.setdefault('source_page', 1)
+        result_dict.setdefault('source_page', pages[0] if pages else 1)
         result_dict.setdefault('confidence', 0.8)
+        result_dict.setdefault('raw_applicability_text', '')
+        usage = getattr(response, 'usage', None)
+        result_dict['prompt_tokens'] = usage.prompt_tokens if usage else None
         
         print(f" VLM parsing successful")
         return result_dict
@@ -2,53 +2,344 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import argparse
 import json
-from src.extraction.text_extractor import extract_text_from_pdf, extract_applicability_section, is_text_extraction_good
-from src.parsing.llm_parser import parse_with_llm
+import multiprocessing
+import os
+import queue
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+from src.extraction.text_extractor import (extract_text_from_pdf, extract_applicability_section,
+                                           is_text_extraction_good, extract_applicability_streaming,
+                                           split_pages, PageSpill, EXTRACTION_VERSION)
+from src.tokens import estimate_tokens
+from src.parsing.llm_parser import parse_with_llm, parse_batch_with_llm, PROMPT_VERSION, BATCH_TOKEN_BUDGET
+from src.parsing.template_parser import TEMPLATE_VERSION, parse_with_templates
+from src.parsing.vlm_parser import VLM_MAX_PAGES, VLM_RENDER_WORKERS, parse_with_vlm
 from src.models.schemas import ApplicabilityRule
+from src.manifest import Manifest, file_sha256
+from src.metrics import METRICS, count, set_quiet, timer
+from src.profiling import PROFILE_DIR_NAME, PROFILER, enable_profiling
+from src.rule_store import RULES_DB_NAME, RuleStore
 
-def extract_ad_rules(pdf_path: str, ad_id: str) -> ApplicabilityRule:
-    print(f"\n{'#'*60}\n# PROCESSING: {ad_id}\n{'#'*60}")
+# Rules written to the store per transaction during a batch run
+STORE_BATCH = 100
+# Vision modes: start VLM calls on failing pages while the text path runs, only once it
+# has failed, or never
+VISION_MODES = ("speculative", "fallback", "off")
+# How often batch mode checks for pages the extraction workers flagged
+VISION_POLL_SECONDS = 0.05
+
+class ExtractionError(Exception):
+    """The text path produced no usable applicability window."""
+
+def ad_id_from_filename(pdf_file: str) -> str:
+    """FAA_AD_2025_23_53.pdf -> FAA-2025-23-53"""
+    parts = [p for p in re.split(r"[_\s-]+", Path(pdf_file).stem) if p]
+    if len(parts) > 1 and parts[1].upper() == "AD":
+        del parts[1]
+    return "-".join(parts)
+
+def extract_stage(pdf_path: str, parallel_pages: bool = False, low_memory: bool = False,
+                  max_memory_mb: Optional[float] = None,
+                  on_bad_page: Optional[Callable[[int], None]] = None,
+                  page_workers: Optional[int] = None) -> Tuple[str, int, List[Tuple[int, str]]]:
+    """Text extraction, quality gate and section lookup (runs in a worker process).
     
-    full_text = extract_text_from_pdf(pdf_path)
-    is_good, reason = is_text_extraction_good(full_text)
+    By default pages are streamed and parsing stops once the section is found;
+    parallel_pages extracts the whole document on a pool of page_workers
+    processes (default: CPU count) instead.
+    low_memory streams with page texts spilled to disk (it takes precedence
+    over parallel_pages); pages_read is then a PageSpill for the caller to
+    clean up. Every path holds the document to max_memory_mb. on_bad_page is called with
+    each page that fails the per-page quality score, as soon as it is read.
+    Returns (applicability_text, page_num, pages_read); raises ExtractionError
+    if the text path has no window to offer.
+    """
+    if low_memory:
+        applicability_text, page_num, (is_good, reason), pages = extract_applicability_streaming(
+            pdf_path, low_memory=True, max_memory_mb=max_memory_mb, on_bad_page=on_bad_page)
+    elif parallel_pages:
+        full_text = extract_text_from_pdf(pdf_path, parallel=True, workers=page_workers, on_bad_page=on_bad_page,
+                                         max_memory_mb=max_memory_mb)
+        is_good, reason = is_text_extraction_good(full_text)
+        applicability_text, page_num = extract_applicability_section(full_text) if is_good else ("", 1)
+        pages = split_pages(full_text)
+    else:
+        applicability_text, page_num, (is_good, reason), pages = extract_applicability_streaming(
+            pdf_path, max_memory_mb=max_memory_mb, on_bad_page=on_bad_page)
     print(f"\nQuality: {reason}")
     
+    if not is_good or not applicability_text:
+        discard_pages(pages)
     if not is_good:
-        raise Exception("Text extraction failed")
+        raise ExtractionError("Text extraction failed")
     
-    applicability_text, page_num = extract_applicability_section(full_text)
     if not applicability_text:
-        raise Exception("Applicability section not found")
+        raise ExtractionError("Applicability section not found")
+    return applicability_text, page_num, pages
+
+def discard_pages(pages) -> None:
+    """Remove a low-memory spill file once its pages have been recorded."""
+    if isinstance(pages, PageSpill):
+        pages.cleanup()
+
+def _extract_worker(pdf_path: str, parallel_pages: bool = False, low_memory: bool = False,
+                    max_memory_mb: Optional[float] = None, ad_id: Optional[str] = None, bad_pages=None,
+                    page_workers: Optional[int] = None):
+    """extract_stage in a pool process; also returns the metric events it recorded.
+    
+    Failing pages are put on the bad_pages queue as (ad_id, page) while extraction runs.
+    """
+    METRICS.drain()
+    on_bad_page = (lambda page: bad_pages.put((ad_id, page))) if bad_pages is not None else None
+    try:
+        return (extract_stage(pdf_path, parallel_pages, low_memory, max_memory_mb, on_bad_page, page_workers),
+                METRICS.drain())
+    finally:
+        PROFILER.flush()
+
+def vision_run_stage(pdf_path: str, ad_id: str, pages: List[int]) -> Optional[Dict]:
+    """VLM parse of consecutive pages that failed the text quality score; None if they have no applicability."""
+    raw_result = parse_with_vlm(pdf_path, ad_id, pages=pages)
+    if not raw_result.get("aircraft_models"):
+        return None
+    if raw_result.get("source_page") not in pages:
+        raw_result["source_page"] = pages[0]
+    return raw_result
+
+class VisionPages:
+    """VLM calls for pages that fail the text quality score, one call per run of consecutive pages.
+    
+    Speculative mode submits a run as soon as its pages are flagged (a page
+    extending a run resubmits it) and drops the calls if the text path
+    succeeds; fallback mode submits only once the text path has failed.
+    At most max_pages pages per AD go to vision.
+    """
+    
+    def __init__(self, pool: ThreadPoolExecutor, speculative: bool = True, max_pages: int = VLM_MAX_PAGES):
+        self.pool = pool
+        self.speculative = speculative
+        self.max_pages = max_pages
+        # ad_id -> {first page of a run: (pages, future or None until submitted)}
+        self.jobs: Dict[str, Dict[int, Tuple[List[int], Optional[Future]]]] = {}
+        self.paths: Dict[str, str] = {}
+        self.sent: Dict[str, set] = {}
+        self.failed: set = set()
+    
+    def pages(self, ad_id: str) -> List[int]:
+        return sorted(page for pages, _ in self.jobs.get(ad_id, {}).values() for page in pages)
+    
+    def _submit(self, ad_id: str, first: int) -> Future:
+        pages, _ = self.jobs[ad_id][first]
+        sent = self.sent.setdefault(ad_id, set())
+        count("vision_pages", len(set(pages) - sent))
+        count("vision_calls")
+        sent.update(pages)
+        future = self.pool.submit(vision_run_stage, self.paths[ad_id], ad_id, list(pages))
+        self.jobs[ad_id][first] = (pages, future)
+        return future
+    
+    def page_failed(self, ad_id: str, pdf_path: str, page: int) -> Optional[Future]:
+        """A page failed the text score; returns its run's future if it was submitted now."""
+        runs = self.jobs.setdefault(ad_id, {})
+        if page in self.pages(ad_id) or len(self.pages(ad_id)) >= self.max_pages:
+            return None
+        self.paths[ad_id] = pdf_path
+        # Join the runs just before and after the page (pages may be flagged out of order)
+        merged = [page]
+        for first in [f for f, (pages, _) in runs.items() if pages[-1] == page - 1 or pages[0] == page + 1]:
+            pages, previous = runs.pop(first)
+            merged.extend(pages)
+            if previous is not None and not previous.cancel():
+                count("vision_calls_superseded")
+        first = min(merged)
+        runs[first] = (sorted(merged), None)
+        if self.speculative or ad_id in self.failed:
+            return self._submit(ad_id, first)
+        return None
+    
+    def forget(self, ad_id: str) -> Dict[int, Tuple[List[int], Optional[Future]]]:
+        self.failed.discard(ad_id)
+        self.paths.pop(ad_id, None)
+        self.sent.pop(ad_id, None)
+        return self.jobs.pop(ad_id, {})
     
-    raw_result = parse_with_llm(applicability_text, ad_id, page_num)
+    def discard(self, ad_id: str) -> None:
+        """The AD no longer needs vision (its text path succeeded, or it failed outright)."""
+        for _, future in self.forget(ad_id).values():
+            if future is not None:
+                count("vision_pages_cancelled" if future.cancel() else "vision_pages_discarded")
     
-    rule = ApplicabilityRule(
+    def text_failed(self, ad_id: str) -> List[Future]:
+        """The text path gave up: every vision run for this AD, submitting any still held back."""
+        self.failed.add(ad_id)
+        runs = self.jobs.get(ad_id, {})
+        return [future or self._submit(ad_id, first) for first, (_, future) in sorted(runs.items())]
+    
+    def ready(self, ad_id: str) -> bool:
+        """The text path failed and every vision run for the AD has an answer."""
+        return ad_id in self.failed and all(f is not None and f.done() for _, f in self.jobs.get(ad_id, {}).values())
+    
+    def result(self, ad_id: str) -> Tuple[ApplicabilityRule, Dict]:
+        """Rule from the first run of pages (in page order) whose VLM answer names aircraft models."""
+        runs = self.forget(ad_id)
+        answers, errors = [], []
+        for first, (pages, future) in sorted(runs.items()):
+            try:
+                answers.append(future.result())
+            except Exception as e:
+                errors.append(f"pages {pages[0]}-{pages[-1]}: {e}" if len(pages) > 1 else f"page {first}: {e}")
+        for raw_result in answers:
+            if raw_result:
+                # Every run's call was paid for, not only the one that answered
+                raw_result["prompt_tokens"] = sum((r or {}).get("prompt_tokens") or 0 for r in answers)
+                return build_rule(raw_result, ad_id, extraction_method="vlm"), raw_result
+        n_pages = sum(len(pages) for pages, _ in runs.values())
+        detail = f" ({'; '.join(errors)})" if errors else ""
+        raise ExtractionError(f"no applicability found on {n_pages} vision pages{detail}")
+
+def extract_with_vision(pdf_path: str, ad_id: str, vision: Optional[VisionPages], parallel_pages: bool = False,
+                        low_memory: bool = False, max_memory_mb: Optional[float] = None):
+    """extract_stage in this process with the vision fallback for failing pages.
+    
+    Returns (applicability_text, page_num, pages, vision_rule, prompt_tokens); vision_rule is
+    None when the text path succeeded.
+    """
+    on_bad_page = (lambda page: vision.page_failed(ad_id, pdf_path, page)) if vision else None
+    try:
+        applicability_text, page_num, pages = extract_stage(pdf_path, parallel_pages, low_memory,
+                                                            max_memory_mb, on_bad_page)
+    except ExtractionError as e:
+        futures = vision.text_failed(ad_id) if vision else []
+        if not futures:
+            if vision:
+                vision.discard(ad_id)
+            raise
+        print(f"✗ {e}; using the VLM answers for pages {vision.pages(ad_id)}")
+        wait(futures)
+        rule, raw_result = vision.result(ad_id)
+        return (raw_result.get("raw_applicability_text", ""), rule.source_page, [], rule,
+                raw_result.get("prompt_tokens"))
+    except Exception:
+        if vision:
+            vision.discard(ad_id)
+        raise
+    if vision:
+        vision.discard(ad_id)
+    return applicability_text, page_num, pages, None, None
+
+def build_rule(raw_result: Dict, ad_id: str, extraction_method: str = "text+llm") -> ApplicabilityRule:
+    with timer("validation", ad_id=ad_id):
+        return _build_rule(raw_result, ad_id, extraction_method)
+
+def _build_rule(raw_result: Dict, ad_id: str, extraction_method: str) -> ApplicabilityRule:
+    return ApplicabilityRule(
         ad_id=ad_id,
         aircraft_models=raw_result["aircraft_models"],
         msn_range=tuple(raw_result["msn_range"]) if raw_result.get("msn_range") else None,
         excluded_modifications=raw_result.get("excluded_modifications", []),
         required_modifications=[],
-        extraction_method="text+llm",
+        extraction_method=extraction_method,
         source_page=raw_result.get("source_page", 1),
         confidence=raw_result.get("confidence", 0.8),
         raw_applicability_text=raw_result.get("raw_applicability_text", "")
     )
+
+def template_stage(applicability_text: str, ad_id: str, page_num: int) -> Optional[ApplicabilityRule]:
+    """Rule from the template fast path, or None if the LLM has to parse this window."""
+    raw_result = parse_with_templates(applicability_text, ad_id, page_num)
+    if raw_result is None:
+        return None
+    try:
+        rule = build_rule(raw_result, ad_id, extraction_method="text+template")
+    except Exception as e:
+        print(f"✗ Template result rejected ({e}), using the LLM")
+        return None
+    print(f"\n{'='*60}\nModels: {', '.join(rule.aircraft_models)}\nExcluded: {rule.excluded_modifications}\n{'='*60}\n")
+    return rule
+
+def llm_stage(applicability_text: str, ad_id: str, page_num: int) -> Tuple[ApplicabilityRule, Optional[int]]:
+    """LLM parse and validation; returns the rule and the prompt tokens billed."""
+    rules: Dict[str, ApplicabilityRule] = {}
     
+    def validate(raw_result: Dict, ad_id: str) -> None:
+        rules[ad_id] = build_rule(raw_result, ad_id)
+    
+    raw_result = parse_with_llm(applicability_text, ad_id, page_num, validate)
+    rule = rules[ad_id]
     print(f"\n{'='*60}\nModels: {', '.join(rule.aircraft_models)}\nExcluded: {rule.excluded_modifications}\n{'='*60}\n")
+    return rule, raw_result.get("prompt_tokens")
+
+def llm_batch_stage(items: List[Tuple[str, str, int]], token_budget: int = BATCH_TOKEN_BUDGET
+                    ) -> Tuple[Dict[str, Tuple[ApplicabilityRule, Optional[int]]], Dict[str, str]]:
+    """Batched LLM parse of (ad_id, text, page) items, validated against ApplicabilityRule."""
+    rules: Dict[str, ApplicabilityRule] = {}
+    
+    def validate(raw_result: Dict, ad_id: str) -> None:
+        rules[ad_id] = build_rule(raw_result, ad_id)
+    
+    raw_results, errors = parse_batch_with_llm(items, validate, token_budget, max_items=len(items))
+    return {ad_id: (rules[ad_id], raw.get("prompt_tokens")) for ad_id, raw in raw_results.items()}, errors
+
+def extract_ad_rules(pdf_path: str, ad_id: str, parallel_pages: bool = False,
+                     low_memory: bool = False, templates: bool = True,
+                     vision: str = "speculative") -> ApplicabilityRule:
+    print(f"\n{'#'*60}\n# PROCESSING: {ad_id}\n{'#'*60}")
+    
+    with ThreadPoolExecutor(max_workers=VLM_RENDER_WORKERS) as vision_pool:
+        pages_to_vision = VisionPages(vision_pool, vision == "speculative") if vision != "off" else None
+        applicability_text, page_num, pages, rule, _ = extract_with_vision(
+            pdf_path, ad_id, pages_to_vision, parallel_pages, low_memory)
+    discard_pages(pages)
+    if rule is None and templates:
+        rule = template_stage(applicability_text, ad_id, page_num)
+    if rule is None:
+        rule, _ = llm_stage(applicability_text, ad_id, page_num)
     return rule
 
-def process_all_ads(pdf_dir: str = "data/raw", output_dir: str = "data/extracted"):
+def write_rule(rule: ApplicabilityRule, output_dir: Path) -> Path:
+    output_file = output_dir / f"{rule.ad_id}.json"
+    with open(output_file, 'w') as f:
+        json.dump(rule.to_dict(), f, indent=2)
+    return output_file
+
+def load_rule(path: Path) -> ApplicabilityRule:
+    with open(path, 'r') as f:
+        return ApplicabilityRule.from_dict(json.load(f))
+
+def rule_version(templates: bool = True) -> str:
+    """Version rules are recorded under: the prompt's, plus the template patterns' when the fast path is on."""
+    return f"{PROMPT_VERSION}+{TEMPLATE_VERSION}" if templates else PROMPT_VERSION
+
+def plan_ad(manifest: Manifest, ad_id: str, pdf_sha256: str, force: bool = False,
+            templates: bool = True) -> str:
+    plan = "full" if force else manifest.plan(ad_id, pdf_sha256, rule_version(templates), EXTRACTION_VERSION)
+    if plan == "skip":
+        print(f"  {ad_id}: unchanged, skipping")
+    elif plan == "llm":
+        print(f"  {ad_id}: prompt or templates changed, reusing extracted text")
+    return plan
+
+def process_all_ads(pdf_dir: str = "data/raw", output_dir: str = "data/extracted",
+                    parallel_pages: bool = False, force: bool = False, low_memory: bool = False,
+                    max_memory_mb: Optional[float] = None, templates: bool = True,
+                    vision: str = "speculative"):
     pdf_dir = Path(pdf_dir)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    manifest = Manifest(output_dir)
+    
     ad_files = {
         "FAA_AD_2025_23_53.pdf": "FAA-2025-23-53",
         "EASA_AD_2025_0254.pdf": "EASA-2025-0254"
     }
     
     results = {}
+    vision_pool = ThreadPoolExecutor(max_workers=VLM_RENDER_WORKERS)
+    pages_to_vision = VisionPages(vision_pool, vision == "speculative") if vision != "off" else None
     for pdf_file, ad_id in ad_files.items():
         pdf_path = pdf_dir / pdf_file
         if not pdf_path.exists():
@@ -56,19 +347,278 @@ def process_all_ads(pdf_dir: str = "data/raw", output_dir: str = "data/extracted
             continue
         
         try:
-            rule = extract_ad_rules(str(pdf_path), ad_id)
+            pdf_sha256 = file_sha256(str(pdf_path))
+            plan = plan_ad(manifest, ad_id, pdf_sha256, force, templates)
+            if plan == "skip":
+                results[ad_id] = load_rule(manifest.rule_path(ad_id))
+                continue
+            
+            rule = None
+            if plan == "llm":
+                applicability_text, page_num = manifest.cached_window(ad_id)
+            else:
+                print(f"\n{'#'*60}\n# PROCESSING: {ad_id}\n{'#'*60}")
+                applicability_text, page_num, pages, rule, prompt_tokens = extract_with_vision(
+                    str(pdf_path), ad_id, pages_to_vision, parallel_pages, low_memory, max_memory_mb)
+                try:
+                    manifest.record_text(ad_id, str(pdf_path), pdf_sha256, pages, applicability_text, page_num,
+                                         estimate_tokens(applicability_text), vision=rule is not None,
+                                         extraction_version=EXTRACTION_VERSION)
+                finally:
+                    discard_pages(pages)
+            
+            if rule is None and templates:
+                rule = template_stage(applicability_text, ad_id, page_num)
+                prompt_tokens = 0
+            if rule is None:
+                rule, prompt_tokens = llm_stage(applicability_text, ad_id, page_num)
             results[ad_id] = rule
             
-            output_file = output_dir / f"{ad_id}.json"
-            with open(output_file, 'w') as f:
-                json.dump(rule.to_dict(), f, indent=2)
+            output_file = write_rule(rule, output_dir)
+            manifest.record_rule(ad_id, rule_version(templates), output_file, prompt_tokens)
             print(f"✓ Saved to {output_file}\n")
         except Exception as e:
             print(f"✗ Failed: {e}\n")
+    vision_pool.shutdown(cancel_futures=True)
+    manifest.save()
     
+    written = RuleStore(output_dir / RULES_DB_NAME).upsert(results.values())
+    print(f"✓ {written} rules updated in {output_dir / RULES_DB_NAME}")
     return results
 
+def process_directory(pdf_dir: str = "data/raw", output_dir: str = "data/extracted",
+                      workers: Optional[int] = None,
+                      llm_concurrency: int = 4,
+                      parallel_pages: bool = False,
+                      force: bool = False,
+                      llm_batch_size: int = 1,
+                      token_budget: int = BATCH_TOKEN_BUDGET,
+                      low_memory: bool = False,
+                      max_memory_mb: Optional[float] = None,
+                      templates: bool = True,
+                      vision: str = "speculative") -> Tuple[Dict[str, ApplicabilityRule], Dict[str, str]]:
+    """Batch mode: extract every PDF in pdf_dir with overlapping stages.
+    
+    PDF extraction runs on a process pool and LLM/VLM calls on a thread pool;
+    each rule is written as soon as it is ready. Failures are collected per
+    AD, and ADs unchanged since the manifest was written are skipped.
+    """
+    pdf_dir = Path(pdf_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    pdf_files = sorted(p for p in pdf_dir.iterdir() if p.suffix.lower() == ".pdf")
+    print(f"Found {len(pdf_files)} PDFs in {pdf_dir}")
+    
+    results: Dict[str, ApplicabilityRule] = {}
+    failures: Dict[str, str] = {}
+    manifest = Manifest(output_dir)
+    store = RuleStore(output_dir / RULES_DB_NAME)
+    unstored: List[ApplicabilityRule] = []
+    hashes: Dict[str, Tuple[str, str]] = {}
+    
+    workers = workers or os.cpu_count() or 1
+    # --parallel-pages gets each worker's share of the cores, not a full pool per worker
+    page_workers = max(1, (os.cpu_count() or 1) // workers)
+    
+    with manifest, ProcessPoolExecutor(max_workers=workers) as extract_pool, \
+         ThreadPoolExecutor(max_workers=max(1, llm_concurrency)) as llm_pool:
+        # A fork-based pool starts every worker on its first submit: do that while this
+        # process has no Manager or LLM threads for them to inherit
+        extract_pool.submit(int)
+        # Extraction workers report failing pages here while they are still reading the PDF
+        manager = multiprocessing.Manager() if vision != "off" else None
+        bad_pages = manager.Queue() if manager else None
+        pending = {}
+        ready: List[Tuple[str, str, int]] = []
+        pages_to_vision = VisionPages(llm_pool, vision == "speculative") if manager else None
+        
+        def submit_llm(ad_id: str, applicability_text: str, page_num: int) -> None:
+            rule = template_stage(applicability_text, ad_id, page_num) if templates else None
+            if rule is not None:
+                save(ad_id, rule, 0)
+            elif llm_batch_size > 1:
+                ready.append((ad_id, applicability_text, page_num))
+            else:
+                pending[llm_pool.submit(llm_stage, applicability_text, ad_id, page_num)] = ("llm", ad_id)
+        
+        def flush(final: bool) -> None:
+            while ready and (final or len(ready) >= llm_batch_size):
+                batch = ready[:llm_batch_size]
+                del ready[:llm_batch_size]
+                future = llm_pool.submit(llm_batch_stage, batch, token_budget)
+                pending[future] = ("llm_batch", tuple(ad_id for ad_id, _, _ in batch))
+        
+        def save(ad_id: str, rule: ApplicabilityRule, prompt_tokens: Optional[int]) -> None:
+            results[ad_id] = rule
+            output_file = write_rule(rule, output_dir)
+            manifest.record_rule(ad_id, rule_version(templates), output_file, prompt_tokens)
+            print(f"✓ Saved to {output_file}")
+            unstored.append(rule)
+            if len(unstored) >= STORE_BATCH:
+                store.upsert(unstored)
+                unstored.clear()
+        
+        def take_bad_pages() -> None:
+            while True:
+                try:
+                    ad_id, page = bad_pages.get_nowait()
+                except queue.Empty:
+                    return
+                future = pages_to_vision.page_failed(ad_id, hashes[ad_id][0], page)
+                if future is not None:
+                    pending[future] = ("vision", ad_id)
+        
+        def finish_vision(ad_id: str) -> None:
+            pdf_path, pdf_sha256 = hashes[ad_id]
+            try:
+                rule, raw_result = pages_to_vision.result(ad_id)
+                text = raw_result.get("raw_applicability_text", "")
+                manifest.record_text(ad_id, pdf_path, pdf_sha256, [], text, rule.source_page, estimate_tokens(text),
+                                     vision=True, extraction_version=EXTRACTION_VERSION)
+                save(ad_id, rule, raw_result.get("prompt_tokens"))
+            except Exception as e:
+                failures[ad_id] = f"vision: {e}"
+                print(f"✗ {ad_id} failed in vision: {e}")
+        
+        for pdf_path in pdf_files:
+            ad_id = ad_id_from_filename(pdf_path.name)
+            try:
+                pdf_sha256 = file_sha256(str(pdf_path))
+                hashes[ad_id] = (str(pdf_path), pdf_sha256)
+                plan = plan_ad(manifest, ad_id, pdf_sha256, force, templates)
+                if plan == "skip":
+                    results[ad_id] = load_rule(manifest.rule_path(ad_id))
+                elif plan == "llm":
+                    submit_llm(ad_id, *manifest.cached_window(ad_id))
+                else:
+                    future = extract_pool.submit(_extract_worker, str(pdf_path), parallel_pages,
+                                                 low_memory, max_memory_mb, ad_id, bad_pages, page_workers)
+                    pending[future] = ("extract", ad_id)
+            except Exception as e:
+                failures[ad_id] = f"manifest: {e}"
+                print(f"✗ {ad_id} failed in manifest: {e}")
+        
+        flush(final=not pending)
+        while pending:
+            done, _ = wait(pending, timeout=VISION_POLL_SECONDS if manager else None,
+                           return_when=FIRST_COMPLETED)
+            if manager:
+                # Before handling finished extractions: a worker's pages are queued before it returns
+                take_bad_pages()
+            for future in done:
+                stage, key = pending.pop(future)
+                if stage == "vision":
+                    if pages_to_vision.ready(key):
+                        finish_vision(key)
+                    continue
+                try:
+                    value = future.result()
+                except Exception as e:
+                    if stage == "extract" and pages_to_vision:
+                        futures = pages_to_vision.text_failed(key) if isinstance(e, ExtractionError) else []
+                        if futures:
+                            print(f"✗ {key}: {e}; using the VLM answers for pages {pages_to_vision.pages(key)}")
+                            pending.update({f: ("vision", key) for f in futures if not f.done()})
+                            if pages_to_vision.ready(key):
+                                finish_vision(key)
+                            continue
+                        pages_to_vision.discard(key)
+                    for ad_id in (key if stage == "llm_batch" else (key,)):
+                        failures[ad_id] = f"{stage}: {e}"
+                        print(f"✗ {ad_id} failed in {stage}: {e}")
+                    continue
+                
+                if stage == "extract":
+                    (applicability_text, page_num, pages), events = value
+                    METRICS.merge(events)
+                    if pages_to_vision:
+                        pages_to_vision.discard(key)
+                    pdf_path, pdf_sha256 = hashes[key]
+                    try:
+                        manifest.record_text(key, pdf_path, pdf_sha256, pages, applicability_text, page_num,
+                                             estimate_tokens(applicability_text),
+                                             extraction_version=EXTRACTION_VERSION)
+                    finally:
+                        discard_pages(pages)
+                    submit_llm(key, applicability_text, page_num)
+                elif stage == "llm_batch":
+                    batch_results, batch_errors = value
+                    for ad_id, (rule, prompt_tokens) in batch_results.items():
+                        save(ad_id, rule, prompt_tokens)
+                    for ad_id, error in batch_errors.items():
+                        failures[ad_id] = f"{stage}: {error}"
+                        print(f"✗ {ad_id} failed in {stage}: {error}")
+                else:
+                    save(key, *value)
+            
+            extracting = any(stage == "extract" for stage, _ in pending.values())
+            flush(final=not extracting)
+    if manager:
+        manager.shutdown()
+    
+    # Also covers skipped ADs, in case the store was deleted; unchanged rules are not rewritten
+    store.upsert(results.values())
+    print(f"Rule store: {len(store)} rules in {store.path}")
+    print(f"Prompt tokens recorded across ADs: {manifest.prompt_tokens():,}")
+    if failures:
+        print(f"\n{len(failures)} ADs failed:")
+        for ad_id, error in sorted(failures.items()):
+            print(f"  ✗ {ad_id}: {error}")
+    return results, failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract applicability rules from AD PDFs")
+    parser.add_argument("--pdf-dir", default="data/raw")
+    parser.add_argument("--output-dir", default="data/extracted")
+    parser.add_argument("--batch", action="store_true", help="scan --pdf-dir and process every PDF concurrently")
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes (default: CPU count)")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="max LLM calls in flight")
+    parser.add_argument("--parallel-pages", action="store_true",
+                        help="split large PDFs' pages across a process pool "
+                             "(with --batch, each extraction worker gets CPU count / --workers processes)")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and re-run every stage")
+    parser.add_argument("--llm-batch-size", type=int, default=1,
+                        help="ADs packed into one LLM request in batch mode")
+    parser.add_argument("--token-budget", type=int, default=BATCH_TOKEN_BUDGET,
+                        help="max estimated window tokens per batched request")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="spill page texts to disk and release each page after use (very large PDFs)")
+    parser.add_argument("--max-doc-memory-mb", type=float, default=None,
+                        help="fail a document that grows its worker by more than this "
+                             "(default: AD_EXTRACT_MAX_MB, 0 = no ceiling)")
+    parser.add_argument("--no-templates", action="store_true",
+                        help="send every window to the LLM, even boilerplate the template fast path would parse")
+    parser.add_argument("--vision", choices=VISION_MODES, default="speculative",
+                        help="VLM for pages failing the text quality score: start while the text path runs "
+                             "(speculative), only once it has failed (fallback), or never (off)")
+    parser.add_argument("--quiet", action="store_true", help="no per-page console output")
+    parser.add_argument("--metrics-dir", default=None,
+                        help="where to write metrics.jsonl and metrics.prom (default: --output-dir)")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"cProfile and tracemalloc every stage; reports go to {PROFILE_DIR_NAME}/ beside the metrics")
+    args = parser.parse_args(argv)
+    if args.quiet:
+        set_quiet()
+    if args.profile:
+        enable_profiling(Path(args.metrics_dir or args.output_dir) / PROFILE_DIR_NAME)
+    
+    with PROFILER.stage("main"):
+        print("="*60 + "\nAD EXTRACTION PIPELINE\n" + "="*60)
+        if args.batch:
+            results, failures = process_directory(args.pdf_dir, args.output_dir, args.workers,
+                                                  args.llm_concurrency, args.parallel_pages, args.force,
+                                                  args.llm_batch_size, args.token_budget,
+                                                  args.low_memory, args.max_doc_memory_mb, not args.no_templates,
+                                                  args.vision)
+            total = len(results) + len(failures)
+        else:
+            results = process_all_ads(args.pdf_dir, args.output_dir, args.parallel_pages, args.force,
+                                      args.low_memory, args.max_doc_memory_mb, not args.no_templates, args.vision)
+            total = 2
+    print(f"\n{'='*60}\nCOMPLETE: {len(results)}/{total} ADs\n{'='*60}")
+    METRICS.write(args.metrics_dir or args.output_dir)
+    PROFILER.write()
+
 if __name__ == "__main__":
-    print("="*60 + "\nAD EXTRACTION PIPELINE\n" + "="*60)
-    results = process_all_ads()
-    print(f"\n{'='*60}\nCOMPLETE: {len(results)}/2 ADs\n{'='*60}")
+    main()
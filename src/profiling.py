@@ -0,0 +1,289 @@
+"""Opt-in per-stage profiling: cProfile and tracemalloc around every metrics timer.
+
+    python -m src extract --batch --profile
+    python -m src evaluate --fleet fleet.csv --out results.jsonl --profile
+
+With profiling on, every `timer(name)` stage (pdf_open, page_extract,
+section_locate, llm_call, validation, eval, ...) also runs under a cProfile
+profiler of its own. A nested stage pauses the enclosing one, so each
+function's time is charged to the innermost stage it ran in; anything
+outside a stage (orchestration, waiting on futures) is charged to the
+command's own stage, e.g. "main".
+
+Allocations are sampled: up to ALLOC_SAMPLES occurrences of each stage per
+process run with tracemalloc started on entry and stopped on exit, which
+gives the stage's peak traced memory and the allocation sites still live
+when it ended. Tracing only while a sampled stage runs keeps the cost to
+that stage. tracemalloc is process-wide, so one stage holds it at a time:
+a stage nested in a traced one, or one running concurrently on another
+thread, is not sampled, and the traced stage's numbers include them.
+
+Worker processes flush() their stages to part files when a task ends, and
+the parent merges everything in write():
+
+    <output-dir>/profile/<stage>.prof   pstats dump (python -m pstats, snakeviz)
+    <output-dir>/profile/<stage>.txt    top functions by cumulative and own time,
+                                        top allocation sites still live at stage exit
+
+When profiling is off, the only cost is one attribute check per timer.
+"""
+
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+PROFILE_DIR_NAME = "profile"
+# Functions and allocation sites listed per stage in <stage>.txt
+PROFILE_TOP_N = 25
+# Occurrences per stage and process traced with tracemalloc
+ALLOC_SAMPLES = 5
+# Allocation sites kept per stage between flushes
+ALLOC_SITES_KEPT = 1000
+
+class StageProfiler:
+    """cProfile profiles per (thread, stage) and sampled tracemalloc statistics per stage."""
+
+    def __init__(self, out_dir: Optional[str] = None, top_n: int = PROFILE_TOP_N):
+        self.out_dir = Path(out_dir) if out_dir else None
+        self.enabled = out_dir is not None
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        # stage -> profiles, one per thread that ran it
+        self._profiles: Dict[str, List] = {}
+        # stage -> {"calls", "sampled", "skipped", "peak_bytes", "sites": {"file:line": [bytes, blocks]}}
+        self._stages: Dict[str, Dict] = {}
+        self._local = threading.local()
+        self._seq = 0
+        # Whether a stage currently holds tracemalloc
+        self._tracing = False
+        # stage -> occurrences traced in this process, kept across flushes
+        self._traced: Dict[str, int] = {}
+
+    def _thread_state(self):
+        if os.getpid() != self._pid:
+            # A forked child: forget the parent's profiles and stop any profiler it had running
+            sys.setprofile(None)
+            if self._tracing:
+                import tracemalloc
+                tracemalloc.stop()
+            if hasattr(sys, "monitoring") and sys.monitoring.get_tool(sys.monitoring.PROFILER_ID):
+                sys.monitoring.set_events(sys.monitoring.PROFILER_ID, 0)
+                sys.monitoring.free_tool_id(sys.monitoring.PROFILER_ID)
+            self._reset()
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack, local.profiles = [], {}
+        return local
+
+    def _stage(self, name: str) -> Dict:
+        return self._stages.setdefault(name, _empty_stage())
+
+    def enter(self, name: str, trace_allocations: bool = True) -> None:
+        import cProfile
+        import tracemalloc
+
+        local = self._thread_state()
+        if local.stack and local.stack[-1][1] is not None:
+            local.stack[-1][1].disable()
+        profile = local.profiles.get(name)
+        if profile is None:
+            profile = local.profiles[name] = cProfile.Profile()
+            with self._lock:
+                self._profiles.setdefault(name, []).append(profile)
+        traced = False
+        with self._lock:
+            stage = self._stage(name)
+            stage["calls"] += 1
+            if (trace_allocations and self._traced.get(name, 0) < ALLOC_SAMPLES and not self._tracing
+                    and not tracemalloc.is_tracing()):
+                self._traced[name] = self._traced.get(name, 0) + 1
+                stage["sampled"] += 1
+                self._tracing = True
+                traced = True
+        if traced:
+            tracemalloc.start()
+        try:
+            profile.enable()
+        except ValueError:
+            # 3.12+ allows one active profiler per process; this occurrence goes unprofiled
+            profile = None
+            with self._lock:
+                self._stage(name)["skipped"] += 1
+        local.stack.append((name, profile, traced))
+
+    def exit(self, name: str) -> None:
+        import tracemalloc
+
+        local = self._thread_state()
+        if not local.stack:
+            return
+        _, profile, traced = local.stack.pop()
+        if profile is not None:
+            profile.disable()
+        if traced:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            with self._lock:
+                self._tracing = False
+                stage = self._stage(name)
+                stage["peak_bytes"] = max(stage["peak_bytes"], peak)
+                sites = stage["sites"]
+                for stat in snapshot.statistics("lineno"):
+                    frame = stat.traceback[0]
+                    site = sites.setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+                    site[0] += stat.size
+                    site[1] += stat.count
+                if len(sites) > ALLOC_SITES_KEPT:
+                    kept = sorted(sites.items(), key=lambda kv: -kv[1][0])[:ALLOC_SITES_KEPT]
+                    sites.clear()
+                    sites.update(kept)
+        if local.stack and local.stack[-1][1] is not None:
+            try:
+                local.stack[-1][1].enable()
+            except ValueError:
+                pass
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Profile a block as a stage without recording a metrics event (e.g. a command's "main").
+
+        Its allocations are not traced: it would hold tracemalloc for the whole run.
+        """
+        if not self.enabled:
+            yield
+            return
+        self.enter(name, trace_allocations=False)
+        try:
+            yield
+        finally:
+            self.exit(name)
+
+    def _take(self):
+        """Hand over everything recorded so far; call only while no stage is running."""
+        with self._lock:
+            profiles, stages = self._profiles, self._stages
+            self._profiles, self._stages = {}, {}
+        # Threads hold their own profile per stage: give them fresh ones
+        self._local = threading.local()
+        return profiles, stages
+
+    def flush(self) -> None:
+        """Dump this process's stages to part files for the parent to merge (end of a worker task)."""
+        if not self.enabled:
+            return
+        self._thread_state()
+        profiles, stages = self._take()
+        if not stages:
+            return
+        parts = self.out_dir / "parts"
+        parts.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        tag = f"{os.getpid()}.{self._seq}"
+        for name, stage_profiles in profiles.items():
+            stats = _stats(stage_profiles)
+            if stats is not None:
+                stats.dump_stats(str(parts / f"{name}.{tag}.prof"))
+        with open(parts / f"alloc.{tag}.json", 'w') as f:
+            json.dump(stages, f)
+
+    def write(self) -> int:
+        """Merge worker parts with this process's stages into <stage>.prof and <stage>.txt."""
+        if not self.enabled:
+            return 0
+        import pstats
+
+        profiles, stages = self._take()
+        stats = {name: _stats(stage_profiles) for name, stage_profiles in profiles.items()}
+        parts = self.out_dir / "parts"
+        for path in sorted(parts.glob("*.prof")) if parts.exists() else []:
+            name = path.name.split(".", 1)[0]
+            if stats.get(name) is None:
+                stats[name] = pstats.Stats(str(path))
+            else:
+                stats[name].add(str(path))
+            path.unlink()
+        for path in sorted(parts.glob("alloc.*.json")) if parts.exists() else []:
+            with open(path) as f:
+                for name, part in json.load(f).items():
+                    stage = stages.setdefault(name, _empty_stage())
+                    for key in ("calls", "sampled", "skipped"):
+                        stage[key] += part[key]
+                    stage["peak_bytes"] = max(stage["peak_bytes"], part["peak_bytes"])
+                    for site, (size, blocks) in part["sites"].items():
+                        total = stage["sites"].setdefault(site, [0, 0])
+                        total[0] += size
+                        total[1] += blocks
+            path.unlink()
+        if parts.exists() and not any(parts.iterdir()):
+            parts.rmdir()
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        names = sorted(set(stats) | set(stages))
+        for name in names:
+            if stats.get(name) is not None:
+                stats[name].dump_stats(str(self.out_dir / f"{name}.prof"))
+            with open(self.out_dir / f"{name}.txt", 'w') as f:
+                f.write(self.report(name, stats.get(name), stages.get(name)))
+        # stderr: `evaluate --out -` writes its results to stdout
+        print(f"Profile: {len(names)} stages -> {self.out_dir}", file=sys.stderr)
+        return len(names)
+
+    def report(self, name: str, stats, stage: Optional[Dict]) -> str:
+        import io
+
+        out = io.StringIO()
+        stage = stage or _empty_stage()
+        out.write(f"Stage {name}: {stage['calls']} occurrences, {stage['sampled']} traced for allocations "
+                  f"(peak {stage['peak_bytes'] / 1024 / 1024:.1f} MiB)")
+        if stage["skipped"]:
+            out.write(f", {stage['skipped']} not profiled (another profiler was active)")
+        out.write("\n")
+        if stats is not None:
+            stats.stream = out
+            stats.files = []  # don't list every merged part file
+            for order, title in (("cumulative", "cumulative time"), ("tottime", "own time")):
+                out.write(f"\n=== Top {self.top_n} functions by {title} ===\n")
+                stats.sort_stats(order).print_stats(self.top_n)
+        sites = sorted(stage["sites"].items(), key=lambda kv: -kv[1][0])[:self.top_n]
+        out.write(f"\n=== Top {self.top_n} allocation sites (made in the stage and live at its exit, "
+                  f"summed over {stage['sampled']} traced occurrences) ===\n")
+        for site, (size, blocks) in sites:
+            out.write(f"{size / 1024:12.1f} KiB {blocks:9d} blocks  {site}\n")
+        return out.getvalue()
+
+def _empty_stage() -> Dict:
+    return {"calls": 0, "sampled": 0, "skipped": 0, "peak_bytes": 0, "sites": {}}
+
+def _stats(profiles: List):
+    """pstats.Stats over profiles that recorded something, or None."""
+    import pstats
+
+    stats = None
+    for profile in profiles:
+        profile.create_stats()
+        if not profile.stats:
+            continue
+        if stats is None:
+            stats = pstats.Stats(profile)
+        else:
+            stats.add(profile)
+    return stats
+
+# Off unless enable_profiling() ran here or in the parent (exported through the environment)
+PROFILER = StageProfiler(os.environ.get("AD_PROFILE") or None)
+
+def enable_profiling(out_dir, top_n: int = PROFILE_TOP_N) -> StageProfiler:
+    """Profile every stage from now on; worker processes follow through AD_PROFILE."""
+    out_dir = Path(out_dir)
+    os.environ["AD_PROFILE"] = str(out_dir)
+    PROFILER.out_dir, PROFILER.top_n, PROFILER.enabled = out_dir, top_n, True
+    return PROFILER
@@ -0,0 +1,264 @@
+"""SQLite rule store indexed by normalized model, MSN bounds and ad_id.
+
+The per-AD JSON files stay the pipeline's primary output; the store is
+what evaluation reads when there are too many ADs to re-parse every file.
+Model lookups follow evaluate_aircraft's rule (equal, or either name
+contained in the other): rule_models answers "rule model in aircraft
+model", rule_model_substrings answers "aircraft model in rule model".
+
+    python -m src.rule_store import data/extracted
+    python -m src.rule_store query A320-214 --msn 4500
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from src.evaluation.normalize import normalize_model
+from src.models.bulk import RuleRecord
+
+if TYPE_CHECKING:
+    from src.models.schemas import ApplicabilityRule
+
+RULES_DB_NAME = "rules.sqlite"
+RULES_DB_PATH = os.environ.get("AD_RULES_DB", str(Path("data/extracted") / RULES_DB_NAME))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    ad_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    rule_hash TEXT NOT NULL,
+    payload_hash TEXT,
+    msn_low INTEGER,
+    msn_high INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rules_msn ON rules(msn_low, msn_high);
+CREATE TABLE IF NOT EXISTS rule_models (
+    model_norm TEXT NOT NULL,
+    ad_id TEXT NOT NULL,
+    PRIMARY KEY (model_norm, ad_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_rule_models_ad ON rule_models(ad_id);
+CREATE TABLE IF NOT EXISTS rule_model_substrings (
+    substring TEXT NOT NULL,
+    ad_id TEXT NOT NULL,
+    PRIMARY KEY (substring, ad_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_rule_model_substrings_ad ON rule_model_substrings(ad_id);
+"""
+
+Rule = Union["ApplicabilityRule", RuleRecord]
+
+def _substrings(s: str) -> List[str]:
+    return sorted({s[i:j] for i in range(len(s)) for j in range(i + 1, len(s) + 1)})
+
+def _rule_dict(rule) -> Dict[str, Any]:
+    return rule if isinstance(rule, dict) else rule.to_dict()
+
+class RuleStore:
+    """Embedded rule store; one connection per thread, WAL so readers never block the writer."""
+
+    def __init__(self, path: str = RULES_DB_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._init_done = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if not self._init_done:
+                    conn.executescript(_SCHEMA)
+                    columns = {row[1] for row in conn.execute("PRAGMA table_info(rules)")}
+                    if "payload_hash" not in columns:
+                        # Stores written before payload_hash: their rows are rewritten on the next upsert
+                        conn.execute("ALTER TABLE rules ADD COLUMN payload_hash TEXT")
+                    self._init_done = True
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def upsert(self, rules: Iterable[Union["ApplicabilityRule", Dict[str, Any]]]) -> int:
+        """Insert or replace rules in one transaction; unchanged rules are not rewritten.
+
+        "Unchanged" means the whole payload (extraction_method, source text and page
+        included); rule_hash covers the decision fields only and is kept for
+        evaluation invalidation. Returns the number of rules written.
+        """
+        from src.evaluation.incremental import rule_hash
+
+        incoming = {}
+        for rule in rules:
+            data = _rule_dict(rule)
+            incoming[data["ad_id"]] = data
+        if not incoming:
+            return 0
+
+        conn = self._conn()
+        existing = self._payload_hashes(list(incoming))
+        now = time.time()
+        rows, models, substrings = [], [], []
+        for ad_id, data in incoming.items():
+            payload = json.dumps(data, default=str)
+            payload_digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            if existing.get(ad_id) == payload_digest:
+                continue
+            msn_range = data.get("msn_range")
+            low, high = (msn_range[0], msn_range[1]) if msn_range else (None, None)
+            rows.append((ad_id, payload, rule_hash(RuleRecord.from_dict(data)), payload_digest, low, high, now))
+            norms = {normalize_model(m) for m in data["aircraft_models"]}
+            models.extend((m, ad_id) for m in norms)
+            substrings.extend((s, ad_id) for s in {s for m in norms for s in _substrings(m)})
+        if not rows:
+            return 0
+
+        changed = [(row[0],) for row in rows]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM rule_models WHERE ad_id = ?", changed)
+            conn.executemany("DELETE FROM rule_model_substrings WHERE ad_id = ?", changed)
+            conn.executemany(
+                "INSERT OR REPLACE INTO rules (ad_id, payload, rule_hash, payload_hash, msn_low, msn_high, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany("INSERT INTO rule_models (model_norm, ad_id) VALUES (?, ?)", models)
+            conn.executemany("INSERT INTO rule_model_substrings (substring, ad_id) VALUES (?, ?)", substrings)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def delete(self, ad_ids: Iterable[str]) -> int:
+        keys = [(ad_id,) for ad_id in ad_ids]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM rule_models WHERE ad_id = ?", keys)
+            conn.executemany("DELETE FROM rule_model_substrings WHERE ad_id = ?", keys)
+            removed = sum(conn.execute("DELETE FROM rules WHERE ad_id = ?", key).rowcount for key in keys)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def _payload_hashes(self, ad_ids: List[str]) -> Dict[str, str]:
+        hashes = {}
+        for i in range(0, len(ad_ids), 500):
+            chunk = ad_ids[i:i + 500]
+            hashes.update(self._conn().execute(
+                f"SELECT ad_id, payload_hash FROM rules WHERE ad_id IN ({','.join('?' * len(chunk))})", chunk))
+        return hashes
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM rules").fetchone()[0]
+
+    def ad_ids(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT ad_id FROM rules ORDER BY ad_id")]
+
+    @staticmethod
+    def _decode(payload: str, validate: bool) -> Rule:
+        data = json.loads(payload)
+        if validate:
+            from src.models.schemas import ApplicabilityRule
+            return ApplicabilityRule.from_dict(data)
+        return RuleRecord.from_dict(data)
+
+    def get(self, ad_id: str, validate: bool = False) -> Optional[Rule]:
+        row = self._conn().execute("SELECT payload FROM rules WHERE ad_id = ?", (ad_id,)).fetchone()
+        return self._decode(row[0], validate) if row else None
+
+    def iter_rules(self, validate: bool = False) -> Iterator[Rule]:
+        """Every rule in ad_id order, decoded one row at a time."""
+        for (payload,) in self._conn().execute("SELECT payload FROM rules ORDER BY ad_id"):
+            yield self._decode(payload, validate)
+
+    def load_all(self, validate: bool = False) -> Dict[str, Rule]:
+        return {rule.ad_id: rule for rule in self.iter_rules(validate)}
+
+    def candidate_ids(self, model: str, msn: Optional[int] = None) -> List[str]:
+        """ad_ids whose models match `model` the way evaluate_aircraft does, optionally within MSN bounds."""
+        aircraft_norm = normalize_model(model)
+        msn_filter = ("" if msn is None else
+                      " AND (r.msn_low IS NULL OR (r.msn_low <= :msn AND r.msn_high >= :msn))")
+        if not aircraft_norm:
+            # An empty model is contained in every rule model
+            sql = f"SELECT r.ad_id FROM rules r WHERE 1{msn_filter} ORDER BY r.ad_id"
+            return [row[0] for row in self._conn().execute(sql, {"msn": msn})]
+        subs = [""] + _substrings(aircraft_norm)
+        params = {"norm": aircraft_norm, "msn": msn}
+        params.update({f"s{i}": s for i, s in enumerate(subs)})
+        placeholders = ",".join(f":s{i}" for i in range(len(subs)))
+        sql = (f"SELECT r.ad_id FROM rules r WHERE r.ad_id IN ("
+               f"SELECT ad_id FROM rule_model_substrings WHERE substring = :norm "
+               f"UNION SELECT ad_id FROM rule_models WHERE model_norm IN ({placeholders}))"
+               f"{msn_filter} ORDER BY r.ad_id")
+        return [row[0] for row in self._conn().execute(sql, params)]
+
+    def rules_for(self, model: str, msn: Optional[int] = None, validate: bool = False) -> List[Rule]:
+        """Only the rules that can affect this model (and MSN); nothing else is decoded."""
+        return [self.get(ad_id, validate) for ad_id in self.candidate_ids(model, msn)]
+
+    def rules_for_models(self, models: Iterable[str], validate: bool = False) -> Dict[str, Rule]:
+        """Rules relevant to any of the given models, e.g. everything a fleet could need."""
+        ad_ids = sorted({ad_id for model in set(models) for ad_id in self.candidate_ids(model)})
+        return {ad_id: self.get(ad_id, validate) for ad_id in ad_ids}
+
+    def import_json_dir(self, rules_dir: str) -> int:
+        """Upsert every rule JSON file in rules_dir (other outputs there are skipped)."""
+        from src.evaluation.stream import load_rules
+        return self.upsert(rule.to_dict() for rule in load_rules(rules_dir, validate=True).values())
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        return {
+            "rules": len(self),
+            "models": conn.execute("SELECT COUNT(*) FROM rule_models").fetchone()[0],
+            "substrings": conn.execute("SELECT COUNT(*) FROM rule_model_substrings").fetchone()[0],
+            "bytes": self.path.stat().st_size if self.path.exists() else 0,
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the SQLite rule store")
+    parser.add_argument("--db", default=RULES_DB_PATH, help=f"store path (default: {RULES_DB_PATH})")
+    sub = parser.add_subparsers(dest="action", required=True)
+    import_parser = sub.add_parser("import", help="import per-AD rule JSON files")
+    import_parser.add_argument("rules_dir", nargs="?", default="data/extracted")
+    query_parser = sub.add_parser("query", help="list the ADs that can affect a model")
+    query_parser.add_argument("model")
+    query_parser.add_argument("--msn", type=int, default=None)
+    sub.add_parser("stats", help="row counts and file size")
+    args = parser.parse_args(argv)
+
+    store = RuleStore(args.db)
+    if args.action == "import":
+        start = time.perf_counter()
+        written = store.import_json_dir(args.rules_dir)
+        print(f"✓ {written} rules written to {args.db} in {time.perf_counter() - start:.2f}s ({len(store)} total)")
+    elif args.action == "query":
+        for ad_id in store.candidate_ids(args.model, args.msn):
+            print(ad_id)
+    else:
+        print(json.dumps(store.stats(), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
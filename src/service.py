@@ -0,0 +1,320 @@
+"""Local HTTP service answering "which ADs affect this aircraft?" from stored rules.
+
+    python -m src serve --rules-dir data/extracted --port 8080
+    curl -s localhost:8080/affected -d '{"model": "A320-214", "msn": 4500, "modifications": []}'
+    curl -s localhost:8080/affected/batch -d '{"aircraft": [{"id": "F-ABCD", "model": "A320-214", "msn": 4500}]}'
+    curl -s localhost:8080/stats
+
+Add ?all=1 to a query to get every AD's decision, not only the affecting ones.
+
+Rules are compiled once into a RuleIndex (same decisions as evaluate_aircraft)
+and kept in memory. A watcher thread polls the rules directory (or the
+rule store) and builds a new index off to the side when it changes; the
+live one is replaced with a single reference swap, so a request sees
+either the old rule set or the new one, never a mix. A reload that fails
+(e.g. a rule file caught half-written) keeps the old index and is retried
+on the next poll.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.evaluation.index import RuleIndex
+from src.evaluation.stream import load_rules
+from src.models.bulk import validate_fleet
+
+# Max aircraft per /affected/batch request
+MAX_BATCH = 10_000
+# Latencies kept per endpoint for percentiles
+LATENCY_WINDOW = 10_000
+# Completed requests remembered for the recent-throughput figure
+THROUGHPUT_WINDOW = 60.0
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+class RequestStats:
+    """Per-endpoint counts and recent latencies, plus recent throughput."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.aircraft = 0
+        self._latencies: Dict[str, deque] = {}
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, ok: bool, aircraft: int = 0) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            self.aircraft += aircraft
+            self._latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+            self._recent.append(now)
+            while self._recent and now - self._recent[0] > THROUGHPUT_WINDOW:
+                self._recent.popleft()
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > THROUGHPUT_WINDOW:
+                self._recent.popleft()
+            uptime = time.time() - self.started
+            endpoints = {}
+            for endpoint, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                endpoints[endpoint] = {
+                    "requests": self.requests[endpoint],
+                    "errors": self.errors.get(endpoint, 0),
+                    "p50_ms": _percentile(ordered, 50) * 1000,
+                    "p99_ms": _percentile(ordered, 99) * 1000,
+                    "max_ms": ordered[-1] * 1000,
+                }
+            total = sum(self.requests.values())
+            return {
+                "uptime_seconds": uptime,
+                "requests": total,
+                "aircraft_evaluated": self.aircraft,
+                "requests_per_sec": total / uptime if uptime else 0.0,
+                "recent_requests_per_sec": len(self._recent) / min(THROUGHPUT_WINDOW, max(uptime, 1e-9)),
+                "endpoints": endpoints,
+            }
+
+class RuleSource:
+    """Where rules come from: a directory of per-AD JSON files or a rule store."""
+
+    def __init__(self, rules_dir: str = "data/extracted", rules_db: Optional[str] = None):
+        self.rules_dir = Path(rules_dir)
+        self.rules_db = Path(rules_db) if rules_db else None
+
+    def signature(self) -> str:
+        """Cheap fingerprint (names, sizes, mtimes) that changes whenever the rules may have."""
+        h = hashlib.sha256()
+        if self.rules_db:
+            paths = [self.rules_db, self.rules_db.with_name(self.rules_db.name + "-wal")]
+        else:
+            paths = sorted(self.rules_dir.glob("*.json"))
+        for path in paths:
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            h.update(f"{path.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        return h.hexdigest()
+
+    def load(self) -> RuleIndex:
+        if self.rules_db:
+            from src.rule_store import RuleStore
+            store = RuleStore(str(self.rules_db))
+            try:
+                rules = store.load_all()
+            finally:
+                store.close()
+        else:
+            rules = load_rules(str(self.rules_dir), validate=False)
+        return RuleIndex(rules)
+
+    def __str__(self) -> str:
+        return str(self.rules_db or self.rules_dir)
+
+class QueryService:
+    """The live RuleIndex, its hot reload, and request stats."""
+
+    def __init__(self, source: RuleSource, poll_interval: float = 2.0):
+        self.source = source
+        self.poll_interval = poll_interval
+        self.stats = RequestStats()
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_reload: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._signature = source.signature()
+        self._failed_signature: Optional[str] = None
+        # (index, generation), replaced as one reference so readers never see a mismatched pair
+        self._live = (source.load(), 0)
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @property
+    def index(self) -> RuleIndex:
+        return self._live[0]
+
+    @property
+    def generation(self) -> int:
+        return self._live[1]
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild the index if the source changed; returns True if a new index went live."""
+        with self._reload_lock:
+            signature = self.source.signature()
+            if not force and signature in (self._signature, self._failed_signature):
+                return False
+            start = time.perf_counter()
+            try:
+                index = self.source.load()
+            except Exception as e:
+                self.reload_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._failed_signature = signature
+                print(f"✗ Reload failed, keeping {len(self.index)} ADs: {self.last_error}", file=sys.stderr)
+                return False
+            # The swap: handlers read self._live once per request
+            self._live = (index, self.generation + 1)
+            self._signature = signature
+            self.reloads += 1
+            self.last_reload = time.time()
+            self.last_error = None
+            print(f"✓ Reloaded {len(index)} ADs from {self.source} in {time.perf_counter() - start:.2f}s",
+                  file=sys.stderr)
+            return True
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"✗ Watcher error: {e}", file=sys.stderr)
+
+    def start_watcher(self) -> None:
+        if self.poll_interval > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="rule-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+
+    @staticmethod
+    def _answer(index: RuleIndex, record, include_unaffected: bool) -> Dict[str, Any]:
+        decisions = index.decisions(record) if include_unaffected else index.affected_decisions(record)
+        return {
+            "id": record.aircraft_id,
+            "model": record.model,
+            "msn": record.msn,
+            "decisions": [{"ad_id": ad_id, "is_affected": is_affected, "reason": reason, "confidence": confidence}
+                          for ad_id, is_affected, reason, confidence in decisions],
+        }
+
+    def query(self, aircraft: Dict[str, Any], include_unaffected: bool = False) -> Dict[str, Any]:
+        """ADs affecting one aircraft ({model, msn, modifications, id?}); all pairs if include_unaffected."""
+        index, generation = self._live
+        record = validate_fleet([aircraft])[0]
+        return {"generation": generation, **self._answer(index, record, include_unaffected)}
+
+    def query_batch(self, aircraft: List[Dict[str, Any]], include_unaffected: bool = False) -> Dict[str, Any]:
+        if len(aircraft) > MAX_BATCH:
+            raise ValueError(f"batch of {len(aircraft)} aircraft exceeds {MAX_BATCH}")
+        index, generation = self._live
+        records = validate_fleet(aircraft)
+        return {"generation": generation,
+                "results": [self._answer(index, record, include_unaffected) for record in records]}
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "rules": len(self.index),
+            "source": str(self.source),
+            "generation": self.generation,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_reload": self.last_reload,
+            "last_error": self.last_error,
+        }
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service: QueryService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        path, _, query = self.path.partition("?")
+        return path, "all=1" in query.split("&") or "all=true" in query.split("&")
+
+    def do_GET(self):
+        path, _ = self._route()
+        if path == "/health":
+            self._send(200, self.service.health())
+        elif path == "/stats":
+            self._send(200, {**self.service.stats.snapshot(), **self.service.health()})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        path, include_unaffected = self._route()
+        service = self.service
+        n_aircraft = 0
+        try:
+            if path == "/affected":
+                status, answer = 200, service.query(json.loads(body), include_unaffected)
+                n_aircraft = 1
+            elif path == "/affected/batch":
+                answer = service.query_batch(json.loads(body)["aircraft"], include_unaffected)
+                status, n_aircraft = 200, len(answer["results"])
+            elif path == "/reload":
+                status, answer = 200, {"reloaded": service.reload(force=True), **service.health()}
+            else:
+                status, answer = 404, {"error": "not found"}
+        except Exception as e:
+            status, answer = 400, {"error": f"{type(e).__name__}: {e}"}
+        self._send(status, answer)
+        if status != 404:
+            service.stats.record(path, time.perf_counter() - start, status == 200, n_aircraft)
+
+def make_server(service: QueryService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    handler = type("BoundQueryHandler", (QueryHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve applicability queries over local HTTP")
+    parser.add_argument("--rules-dir", default="data/extracted")
+    parser.add_argument("--rules-db", default=None, help="serve rules from this SQLite rule store instead")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="seconds between checks for changed rules (0 disables hot reload)")
+    args = parser.parse_args(argv)
+
+    service = QueryService(RuleSource(args.rules_dir, args.rules_db), args.poll_interval)
+    server = make_server(service, args.host, args.port)
+    service.start_watcher()
+    print(f"Serving {len(service.index)} ADs from {service.source} on "
+          f"http://{args.host}:{server.server_address[1]} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop_watcher()
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Prompt-size estimates."""
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt-token estimate (~4 chars per token)."""
+    return (len(text) + 3) // 4
@@ -0,0 +1,223 @@
+"""Offline throughput benchmark: synthetic ADs -> pipeline -> fleet evaluation.
+
+Runs src.pipeline's batch mode against tests/stub_llm_server.py (fixed
+latency, deterministic answers) and the RuleIndex evaluator against a
+synthetic fleet, then reports ADs/sec, aircraft x AD pairs/sec, p50/p99
+stage latencies and peak RSS. Use --out to keep a JSON report to diff
+between runs.
+
+    python tests/benchmark.py --ads 200 --fleet 200000 --latency 0.3 --llm-concurrency 16
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from tests.stub_llm_server import start_stub
+from tests.synthetic import generate_corpus, generate_fleet
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+def stage_latencies(events: List[Dict]) -> Dict[str, Dict[str, float]]:
+    by_stage: Dict[str, List[float]] = {}
+    for event in events:
+        if event["type"] == "timer":
+            by_stage.setdefault(event["name"], []).append(event["value"])
+    return {name: {"count": len(v), "p50_ms": percentile(v, 50) * 1000, "p99_ms": percentile(v, 99) * 1000}
+            for name, v in sorted(by_stage.items())}
+
+def peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is in KiB on Linux; children covers the extraction pool
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024}
+
+def rule_accuracy(rules, truth: Dict[str, Dict]) -> float:
+    correct = 0
+    for ad_id, rule in rules.items():
+        expected = truth.get(ad_id)
+        if (expected and set(rule.aircraft_models) == set(expected["aircraft_models"])
+                and (list(rule.msn_range) if rule.msn_range else None) == expected["msn_range"]):
+            correct += 1
+    return correct / len(truth) if truth else 0.0
+
+def bench_pipeline(args, work_dir: Path) -> Dict:
+    from src.metrics import METRICS
+    from src.pipeline import process_directory
+
+    pdf_dir, output_dir = work_dir / "raw", work_dir / "extracted"
+    start = time.perf_counter()
+    truth = generate_corpus(pdf_dir, args.ads, args.seed, args.min_pages, args.max_pages)
+    print(f"Generated {len(truth)} AD PDFs in {time.perf_counter() - start:.1f}s")
+
+    METRICS.drain()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results, failures = process_directory(str(pdf_dir), str(output_dir), args.workers,
+                                              args.llm_concurrency, force=True,
+                                              llm_batch_size=args.llm_batch_size,
+                                              templates=args.templates)
+    elapsed = time.perf_counter() - start
+    events = METRICS.drain()
+    return {
+        "ads": len(truth),
+        "rules": len(results),
+        "failures": len(failures),
+        "accuracy": rule_accuracy(results, truth),
+        "seconds": elapsed,
+        "ads_per_sec": len(truth) / elapsed if elapsed else 0.0,
+        "stages": stage_latencies(events),
+    }, results
+
+def bench_evaluation(args, rules) -> Dict:
+    from src.evaluation.index import RuleIndex
+    from src.models.bulk import validate_fleet
+
+    # Mix the rules' excluded mods into the pool so exclusions actually fire
+    excluded = {m.split()[-1] for r in rules.values() for m in r.excluded_modifications}
+    mod_pool = sorted(excluded | {str(n) for n in range(10000, 10500)})
+    rows = generate_fleet(args.fleet, args.seed, mod_pool=mod_pool)
+
+    start = time.perf_counter()
+    fleet = validate_fleet(rows)
+    validate_seconds = time.perf_counter() - start
+    del rows
+
+    start = time.perf_counter()
+    index = RuleIndex(list(rules.values()))
+    index_seconds = time.perf_counter() - start
+
+    report = {"aircraft": len(fleet), "rules": len(index.rules),
+              "validate_seconds": validate_seconds, "index_seconds": index_seconds}
+    for mode, decide in (("all_pairs", index.decisions), ("affected", index.affected_decisions)):
+        latencies = []
+        emitted = 0
+        clock = time.perf_counter
+        start = clock()
+        for record in fleet:
+            t0 = clock()
+            for _ in decide(record):
+                emitted += 1
+            latencies.append(clock() - t0)
+        elapsed = clock() - start
+        pairs = len(fleet) * len(index.rules)
+        report[mode] = {
+            "seconds": elapsed,
+            "rows": emitted,
+            "pairs_per_sec": pairs / elapsed if elapsed else 0.0,
+            "aircraft_p50_us": percentile(latencies, 50) * 1e6,
+            "aircraft_p99_us": percentile(latencies, 99) * 1e6,
+        }
+    if args.eval_workers != 1:
+        report["sharded"] = bench_sharded(args, index, rows_for_sharding(fleet))
+    return report
+
+def rows_for_sharding(fleet) -> List[Dict]:
+    return [{"id": r.aircraft_id, "model": r.model, "msn": r.msn, "modifications": r.modifications} for r in fleet]
+
+def bench_sharded(args, index, rows) -> Dict:
+    """All-pairs JSONL output through the process pool, validation included, as `evaluate --workers` runs it."""
+    from src.evaluation.sharded import SHARD_CHUNK_SIZE, _format, evaluate_rows_sharded
+    from src.models.bulk import validate_fleet
+
+    # The same work in this process, chunk by chunk, as the baseline
+    start = time.perf_counter()
+    for n in range(0, len(rows), SHARD_CHUNK_SIZE):
+        records = validate_fleet(rows[n:n + SHARD_CHUNK_SIZE], start=n + 1)
+        _format(index.evaluate_records(records), "jsonl")
+    serial = time.perf_counter() - start
+
+    workers = args.eval_workers or os.cpu_count()
+    start = time.perf_counter()
+    emitted = sum(n for n, _ in evaluate_rows_sharded(rows, index, workers, only_affected=False))
+    elapsed = time.perf_counter() - start
+    pairs = len(rows) * len(index.rules)
+    return {"workers": workers, "cores": os.cpu_count(), "seconds": elapsed, "serial_seconds": serial,
+            "rows": emitted, "pairs_per_sec": pairs / elapsed if elapsed else 0.0,
+            "speedup": serial / elapsed if elapsed else 0.0}
+
+def print_report(report: Dict) -> None:
+    p = report["pipeline"]
+    print("\n" + "=" * 72 + "\nBENCHMARK\n" + "=" * 72)
+    print(f"Pipeline:   {p['ads']} ADs in {p['seconds']:.2f}s = {p['ads_per_sec']:.2f} ADs/sec "
+          f"({p['failures']} failed, {p['accuracy']:.0%} rules match ground truth)")
+    for name, s in p["stages"].items():
+        print(f"  {name:<16} n={s['count']:<7} p50={s['p50_ms']:9.2f}ms  p99={s['p99_ms']:9.2f}ms")
+    e = report["evaluation"]
+    print(f"Evaluation: {e['aircraft']:,} aircraft x {e['rules']} ADs "
+          f"(validate {e['validate_seconds']:.2f}s, index {e['index_seconds'] * 1000:.1f}ms)")
+    for mode in ("all_pairs", "affected"):
+        m = e[mode]
+        print(f"  {mode:<16} {m['pairs_per_sec']:>14,.0f} pairs/sec  rows={m['rows']:<9,} "
+              f"p50={m['aircraft_p50_us']:.1f}us  p99={m['aircraft_p99_us']:.1f}us per aircraft")
+    if "sharded" in e:
+        m = e["sharded"]
+        print(f"  {'sharded x' + str(m['workers']):<16} {m['pairs_per_sec']:>14,.0f} pairs/sec  rows={m['rows']:<9,} "
+              f"{m['speedup']:.1f}x serial on {m['cores']} cores (all pairs, validation and JSONL included)")
+    rss = report["peak_rss_mb"]
+    print(f"Peak RSS:   {rss['self']:.0f} MB (main), {rss['children']:.0f} MB (largest worker)")
+    print("=" * 72)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline pipeline and evaluator benchmark")
+    parser.add_argument("--ads", type=int, default=50, help="synthetic AD PDFs to generate")
+    parser.add_argument("--min-pages", type=int, default=1)
+    parser.add_argument("--max-pages", type=int, default=12)
+    parser.add_argument("--fleet", type=int, default=100_000, help="synthetic aircraft to evaluate")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency per request (s)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--eval-workers", type=int, default=1,
+                        help="also time sharded evaluation on this many processes (0 = one per core)")
+    parser.add_argument("--llm-batch-size", type=int, default=1)
+    parser.add_argument("--templates", action="store_true",
+                        help="use the template fast path (synthetic wording always matches, so the stub "
+                             "LLM and --latency go unused)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=None, help="keep generated PDFs and outputs here")
+    parser.add_argument("--out", default=None, help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    server, stub, base_url = start_stub(latency=args.latency)
+    # Must be set before src.config is imported; limits are lifted so only the stub latency counts
+    os.environ.update({"AD_LLM_BASE_URL": base_url, "AD_LLM_API_KEY": "stub", "AD_LLM_CACHE": "off",
+                       "AD_LLM_RPM": "1000000", "AD_LLM_TPM": "1000000000", "AD_QUIET": "1",
+                       "AD_LLM_MAX_CONNECTIONS": str(max(20, args.llm_concurrency))})
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="ad-bench-"))
+    try:
+        pipeline_report, rules = bench_pipeline(args, work_dir)
+        report = {
+            "config": vars(args),
+            "pipeline": pipeline_report,
+            "evaluation": bench_evaluation(args, rules),
+            "llm_requests": stub.requests,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        server.shutdown()
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report saved to {args.out}")
+    return 0 if pipeline_report["failures"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
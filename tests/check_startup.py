@@ -0,0 +1,82 @@
+"""Startup budget for the evaluate-only CLI path.
+
+Runs `python -m src evaluate` on a one-aircraft fleet against one stored
+rule and checks that
+  - none of the extraction/LLM stacks (or the pydantic rule schemas) are imported
+  - its wall time, best of --runs, stays within STARTUP_BUDGET_MS of a bare interpreter
+
+    python tests/check_startup.py [--runs 7] [--budget-ms 300]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Measured overhead over `python -c pass`: ~235ms, of which ~200ms is importing pydantic
+# and building the fleet-row TypeAdapter (validation needs both). It was ~300ms when the
+# rule schemas were loaded too. The budget leaves some headroom for noisy machines.
+STARTUP_BUDGET_MS = 300
+
+FORBIDDEN = ["openai", "httpx", "pdfplumber", "pdf2image", "PIL", "src.config", "src.models.schemas"]
+
+RULE = {"ad_id": "AD-0001", "aircraft_models": ["A320-214"], "msn_range": [1, 5000],
+        "excluded_modifications": ["mod 24591"], "required_modifications": [],
+        "extraction_method": "text+llm", "source_page": 1, "confidence": 0.9,
+        "raw_applicability_text": "", "ambiguity_flags": [], "extracted_at": "2025-01-01T00:00:00"}
+
+def best_of(cmd, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def imported_modules(cmd) -> set:
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + cmd[1:], cwd=ROOT, check=True,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return {line.rsplit("|", 1)[-1].strip() for line in proc.stderr.splitlines() if line.startswith("import time:")}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the evaluate-only startup budget")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rules_dir = Path(tmp)
+        (rules_dir / "AD-0001.json").write_text(json.dumps(RULE))
+        fleet = rules_dir / "fleet.csv"
+        fleet.write_text("id,model,msn,modifications\nt1,A320-214,4500,\n")
+        cmd = [sys.executable, "-m", "src", "evaluate", "--fleet", str(fleet), "--rules-dir", str(rules_dir)]
+
+        loaded = imported_modules(cmd)
+        leaked = sorted(m for m in FORBIDDEN if m in loaded)
+        baseline = best_of([sys.executable, "-c", "pass"], args.runs)
+        evaluate = best_of(cmd, args.runs)
+
+    overhead = evaluate - baseline
+    print(f"Interpreter:      {baseline:7.1f} ms")
+    print(f"evaluate (total): {evaluate:7.1f} ms")
+    print(f"overhead:         {overhead:7.1f} ms (budget {args.budget_ms:.0f} ms)")
+    ok = True
+    if leaked:
+        print(f"✗ evaluate imported heavy modules: {', '.join(leaked)}")
+        ok = False
+    else:
+        print(f"✓ no heavy imports ({', '.join(FORBIDDEN)})")
+    if overhead > args.budget_ms:
+        print(f"✗ startup over budget by {overhead - args.budget_ms:.1f} ms")
+        ok = False
+    else:
+        print("✓ startup within budget")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
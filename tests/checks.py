@@ -0,0 +1,13 @@
+"""Shared helpers for the tests/run_*_check.py scripts."""
+
+from typing import List
+
+def check(name: str, ok: bool) -> bool:
+    """Print one check's ✓/✗ line and pass its outcome through."""
+    print(f"{'✓' if ok else '✗'} {name}")
+    return ok
+
+def summary(results: List[bool]) -> int:
+    """Print the "N/M checks passed" footer and return the script's exit code."""
+    print(f"\n{sum(results)}/{len(results)} checks passed")
+    return 0 if all(results) else 1
@@ -0,0 +1,119 @@
+"""Offline checks for src.llm_client against tests/stub_llm_server.py."""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.llm_client import CircuitBreaker, CircuitOpenError, LLMClient, TokenBucket
+from tests.checks import check, summary
+from tests.stub_llm_server import start_stub
+
+MESSAGES = [{"role": "user", "content": "Applies to A320-214 and A321-211, MSN 100 to 200, except mod 12345"}]
+
+def check_cache(base_url, state):
+    """get_completion caches an answer only once the caller's validate() accepts it."""
+    cache_dir = tempfile.mkdtemp()
+    os.environ.update({"AD_LLM_BASE_URL": base_url, "AD_LLM_API_KEY": "stub",
+                       "AD_LLM_CACHE_PATH": os.path.join(cache_dir, "completions.sqlite")})
+    from src.cache import get_cache
+    from src.config import get_completion
+
+    def reject(response):
+        raise ValueError("bad answer")
+
+    results = []
+    try:
+        get_completion(MESSAGES, use_cache=True, validate=reject)
+    except ValueError:
+        pass
+    results.append(check("a rejected answer is not cached", get_cache().stats()["entries"] == 0))
+    get_completion(MESSAGES, use_cache=True, validate=lambda response: None)
+    served = state.requests
+    get_completion(MESSAGES, use_cache=True, validate=lambda response: None)
+    results.append(check("an accepted answer is replayed from the cache", state.requests == served))
+    get_completion(MESSAGES, use_cache=True, validate=lambda response: False)
+    results.append(check("a cached answer the caller rejects is evicted and re-requested",
+                         state.requests == served + 1 and get_cache().stats()["entries"] == 0))
+    return results
+
+def main():
+    results = []
+    server, state, base_url = start_stub()
+    try:
+        client = LLMClient(base_url, "stub", requests_per_minute=6000, backoff_base=0.01, backoff_max=0.5)
+
+        response = client.create("stub-model", MESSAGES)
+        results.append(check("plain completion", '"A320-214"' in response.choices[0].message.content))
+
+        state.fail_next, state.retry_after = 2, 0.2
+        start = time.monotonic()
+        client.create("stub-model", MESSAGES)
+        elapsed = time.monotonic() - start
+        results.append(check(f"retries honour Retry-After ({client.retries} retries, {elapsed:.2f}s)",
+                             client.retries == 2 and elapsed >= 0.4))
+
+        limited = LLMClient(base_url, "stub", requests_per_minute=600)
+        limited.request_bucket = TokenBucket(600, burst=1)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: limited.create("stub-model", MESSAGES), range(6)))
+        elapsed = time.monotonic() - start
+        results.append(check(f"requests/min limit (6 calls at 10/s took {elapsed:.2f}s)", elapsed >= 0.45))
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.3)
+        fragile = LLMClient(base_url, "stub", max_retries=1, backoff_base=0.01, breaker=breaker)
+        state.fail_next, state.retry_after = 2, None
+        try:
+            fragile.create("stub-model", MESSAGES)
+        except Exception:
+            pass
+        results.append(check("a call's retries count as one breaker failure",
+                             breaker.failures == 1 and breaker.state == "closed"))
+        state.fail_next = 1  # opens the breaker, so the retry fails fast
+        try:
+            fragile.create("stub-model", MESSAGES)
+        except Exception:
+            pass
+        served = state.requests
+        try:
+            fragile.create("stub-model", MESSAGES)
+            opened = False
+        except CircuitOpenError:
+            opened = state.requests == served
+        results.append(check("breaker opens and fails fast", opened))
+        time.sleep(0.35)
+        fragile.create("stub-model", MESSAGES)
+        results.append(check("breaker closes after a half-open success", breaker.state == "closed"))
+
+        breaker.opened_at, breaker.failures = time.monotonic() - 1.0, 2
+        state.fail_next, state.fail_status = 1, 400
+        try:
+            fragile.create("stub-model", MESSAGES)
+        except Exception:
+            pass
+        state.fail_status = 429
+        fragile.create("stub-model", MESSAGES)
+        results.append(check("a non-retryable error on the half-open trial does not wedge the breaker",
+                             breaker.state == "closed"))
+
+        results.extend(check_cache(base_url, state))
+
+        state.latency = 0.5
+        try:
+            client.create("stub-model", MESSAGES, timeout=0.1)
+            timed_out = False
+        except Exception as e:
+            timed_out = "Timeout" in type(e).__name__
+        state.latency = 0.0
+        results.append(check("per-call timeout", timed_out))
+    finally:
+        server.shutdown()
+
+    return summary(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
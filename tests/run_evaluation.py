@@ -1,37 +1,32 @@
-import json, sys
+import argparse, json, sys
 from pathlib import Path
 from tabulate import tabulate
 from colorama import Fore, Style, init
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from src.models.schemas import ApplicabilityRule
-from src.evaluation.evaluator import evaluate_test_cases
+from src.rule_store import RULES_DB_NAME, RuleStore
+from src.evaluation.evaluator import sample_fleet
+from src.evaluation.incremental import EvaluationState
+from src.metrics import timer
+from src.profiling import PROFILE_DIR_NAME, PROFILER, enable_profiling
 
 init(autoreset=True)
 
-def load_existing_rules():
-    """Load rules from existing JSON files instead of re-extracting."""
-    rules = {}
-    
-    json_files = {
-        "FAA-2025-23-53.json": "FAA-2025-23-53",
-        "EASA-2025-0254.json": "EASA-2025-0254"
-    }
+RULES_DIR = "data/extracted"
+STATE_PATH = "data/extracted/evaluation_state.json"
+
+def load_existing_rules(fleet):
+    """Load the rules relevant to the fleet from the rule store instead of re-extracting.
     
-    for json_file, ad_id in json_files.items():
-        json_path = Path("data/extracted") / json_file
-        if json_path.exists():
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-                # Convert back to ApplicabilityRule
-                if data.get('msn_range'):
-                    data['msn_range'] = tuple(data['msn_range'])
-                rule = ApplicabilityRule(**data)
-                rules[ad_id] = rule
-                print(f"✓ Loaded {ad_id} from existing JSON")
-        else:
-            print(f"  {json_file} not found")
+    A store that doesn't exist yet is filled from the per-AD JSON files first.
+    """
+    store = RuleStore(str(Path(RULES_DIR) / RULES_DB_NAME))
+    if not len(store):
+        print(f"✓ Imported {store.import_json_dir(RULES_DIR)} rules from {RULES_DIR}")
     
+    rules = store.rules_for_models((aircraft.model for aircraft in fleet), validate=True)
+    for ad_id in rules:
+        print(f"✓ Loaded {ad_id} from {store.path}")
     return rules
 
 def print_table(results):
@@ -76,19 +71,41 @@ def verify(results):
     print("="*80 + "\n")
     return passed
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the sample fleet against the extracted rules")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"cProfile and tracemalloc every stage; reports go to {RULES_DIR}/{PROFILE_DIR_NAME}/")
+    args = parser.parse_args(argv)
+    if args.profile:
+        enable_profiling(Path(RULES_DIR) / PROFILE_DIR_NAME)
+    with PROFILER.stage("main"):
+        evaluate()
+    PROFILER.write()
+
+def evaluate():
     print("\n" + "#"*80 + "\nEVALUATION\n" + "#"*80 + "\n")
     
     # Load existing rules instead of re-extracting
-    rules = load_existing_rules()
+    fleet = {f"test-{i:02d}": aircraft for i, aircraft in enumerate(sample_fleet(), 1)}
+    with timer("rules_load"):
+        rules = load_existing_rules(fleet.values())
     
     if not rules:
-        print(" No rules found. Run: python -m src.pipeline first")
+        print(" No rules found. Run: python -m src extract first")
         return
     
     print(f"✓ Loaded {len(rules)} ADs\n")
     
-    results = evaluate_test_cases(rules)
+    # Only pairs whose rule or aircraft changed since the last run are recomputed
+    with timer("state_load"):
+        state = EvaluationState.load(STATE_PATH)
+    with timer("eval"):
+        delta = state.sync(rules, fleet)
+    with timer("state_save"):
+        state.save(STATE_PATH)
+    print(f"✓ {len(delta.changed)} results changed, {len(delta.removed)} removed since last run\n")
+    
+    results = state.all_results()
     print_table(results)
     verify(results)
     
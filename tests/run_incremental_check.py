@@ -0,0 +1,90 @@
+"""Checks for EvaluationState: which pairs a sync recomputes and reports, and save/load.
+
+Syncs a small hand-built fleet and rule set, saves and reloads the state, then
+syncs again after adding, changing and removing both rules and aircraft. The
+delta must name exactly the pairs those edits touch, and the stored results
+must match a full evaluate_fleet.
+
+    python tests/run_incremental_check.py
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.evaluation.incremental import EvaluationState
+from src.evaluation.index import evaluate_fleet
+from src.models.schemas import Aircraft, ApplicabilityRule
+from tests.checks import check, summary
+
+def rule(ad_id, models, msn_range=None, excluded=()):
+    return ApplicabilityRule(ad_id=ad_id, aircraft_models=models, msn_range=msn_range,
+                             excluded_modifications=list(excluded), extraction_method="text+llm", confidence=0.9)
+
+def decisions(results):
+    return [(r.aircraft.model, r.aircraft.msn, r.ad_id, r.is_affected, r.reason, r.confidence) for r in results]
+
+def pairs(state, results):
+    ids = {(a.model, a.msn): aircraft_id for aircraft_id, a in state.fleet.items()}
+    return {(ids[(r.aircraft.model, r.aircraft.msn)], r.ad_id) for r in results}
+
+def round_trip(state, path):
+    state.save(path)
+    loaded = EvaluationState.load(path)
+    return loaded, (decisions(loaded.all_results()) == decisions(state.all_results())
+                    and loaded.rule_hashes == state.rule_hashes and loaded.aircraft_hashes == state.aircraft_hashes)
+
+def main():
+    results = []
+    rules = {
+        "AD-1": rule("AD-1", ["A320-214"], excluded=["mod 24591"]),
+        "AD-2": rule("AD-2", ["A330-202"], (100, 900)),
+        "AD-3": rule("AD-3", ["737-800"]),
+    }
+    fleet = {
+        "a1": Aircraft(model="A320-214", msn=5000),
+        "a2": Aircraft(model="A320-214", msn=6000, modifications=["mod 24591"]),
+        "a3": Aircraft(model="A330-202", msn=500),
+        "a4": Aircraft(model="737-800", msn=30000),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "state.json")
+        state = EvaluationState()
+        delta = state.sync(rules, fleet)
+        results.append(check("the first sync reports every pair and removes nothing",
+                             len(delta.changed) == 12 and pairs(state, delta.changed) == {
+                                 (a, ad) for a in fleet for ad in rules} and not delta.removed))
+
+        state, same = round_trip(state, path)
+        results.append(check("results and hashes survive save/load", same))
+        delta = state.sync(rules, fleet)
+        results.append(check("a sync after load with nothing changed reports nothing",
+                             not delta.changed and not delta.removed))
+
+        # Changed rule (a3 falls out of AD-2's range), changed aircraft (a1 gains AD-1's excluded mod),
+        # added rule and aircraft, removed rule and aircraft
+        rules = {"AD-1": rules["AD-1"], "AD-2": rule("AD-2", ["A330-202"], (100, 400)),
+                 "AD-4": rule("AD-4", ["A320"])}
+        fleet = {"a1": Aircraft(model="A320-214", msn=5000, modifications=["mod 24591"]),
+                 "a2": fleet["a2"], "a3": fleet["a3"], "a5": Aircraft(model="A330-202", msn=200)}
+        delta = state.sync(rules, fleet)
+        results.append(check("only pairs whose decision changed or is new are reported",
+                             pairs(state, delta.changed) == {("a1", "AD-1"), ("a3", "AD-2"),
+                                                             ("a1", "AD-4"), ("a2", "AD-4"), ("a3", "AD-4"),
+                                                             ("a5", "AD-1"), ("a5", "AD-2"), ("a5", "AD-4")}
+                             and len(delta.changed) == 8))
+        results.append(check("removed pairs are the removed rule's and the removed aircraft's, once each",
+                             sorted(delta.removed) == sorted([("a1", "AD-3"), ("a2", "AD-3"), ("a3", "AD-3"),
+                                                              ("a4", "AD-3"), ("a4", "AD-1"), ("a4", "AD-2")])))
+        full = decisions(evaluate_fleet(fleet.values(), rules))
+        results.append(check("all_results() equals a full evaluate_fleet", decisions(state.all_results()) == full))
+
+        state, same = round_trip(state, path)
+        results.append(check("the updated state survives save/load and still equals evaluate_fleet",
+                             same and decisions(state.all_results()) == full))
+
+    return summary(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
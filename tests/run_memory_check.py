@@ -0,0 +1,82 @@
+"""Checks for the per-document memory ceiling (--max-doc-memory-mb / AD_EXTRACT_MAX_MB).
+
+Runs one synthetic AD, with its Applicability section on the last page, through
+every extraction path under a ceiling it cannot meet and under none, and
+checks that the ceiling stops it on each path.
+
+    python tests/run_memory_check.py
+"""
+
+import contextlib
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from tests.checks import check, summary
+from tests.synthetic import LINES_PER_PAGE, _filler, applicability_lines, write_pdf
+
+N_PAGES = 30
+# Far below what parsing N_PAGES pages adds to any process
+CEILING_MB = 0.25
+RULE = {"aircraft_models": ["A320-214"], "msn_range": None, "excluded_modifications": ["24591"]}
+
+def _stops(fn, args, kwargs) -> bool:
+    from src.extraction.text_extractor import MemoryCeilingError
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            fn(*args, **kwargs)
+        except MemoryCeilingError:
+            return True
+    return False
+
+def stops(fn, *args, **kwargs) -> bool:
+    """Whether fn raises MemoryCeilingError, run in a fresh process.
+    
+    A process that has already parsed the document reuses the memory it freed,
+    so it may not grow at all the second time round.
+    """
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(_stops, fn, args, kwargs).result()
+
+def main():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        os.environ["AD_SPILL_DIR"] = str(tmp / "spill")
+        (tmp / "spill").mkdir()
+        from src.extraction.text_extractor import extract_applicability_streaming, extract_text_from_pdf
+        from src.pipeline import extract_stage
+
+        rng = random.Random(0)
+        pages = [_filler(rng, LINES_PER_PAGE) for _ in range(N_PAGES - 1)]
+        pages.append(["Applicability:"] + applicability_lines(RULE) + ["", "Reason:"])
+        pdf = str(tmp / "EASA_AD_2024-0001.pdf")
+        write_pdf(pdf, pages)
+
+        default = stops(extract_stage, pdf, max_memory_mb=CEILING_MB)
+        low_memory = stops(extract_stage, pdf, low_memory=True, max_memory_mb=CEILING_MB)
+        parallel_stage = stops(extract_stage, pdf, parallel_pages=True, max_memory_mb=CEILING_MB)
+        # Forced onto a pool even on a single core, so the ceiling has to hold inside the workers
+        pool = stops(extract_text_from_pdf, pdf, parallel=True, workers=2, min_pages_for_parallel=1,
+                     max_memory_mb=CEILING_MB)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            window, page, _ = extract_stage(pdf, max_memory_mb=0)
+            text, _, (is_good, _), _ = extract_applicability_streaming(pdf)
+
+        results.append(check("the ceiling stops the default streaming path (no --low-memory)", default))
+        results.append(check("the ceiling stops the low-memory path", low_memory))
+        results.append(check("the low-memory spill file is removed when the ceiling stops it",
+                             not any((tmp / "spill").iterdir())))
+        results.append(check("the ceiling stops the --parallel-pages path", parallel_stage))
+        results.append(check("the ceiling holds inside page-pool workers", pool))
+        results.append(check(f"with no ceiling the same document is read to page {N_PAGES}",
+                             page == N_PAGES and "A320-214" in window and is_good and "A320-214" in text))
+
+    return summary(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
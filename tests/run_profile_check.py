@@ -0,0 +1,84 @@
+"""Checks for --profile: per-stage dumps and reports beside the outputs, nothing when off.
+
+Runs `python -m src evaluate` on synthetic rules and a synthetic fleet with
+and without --profile, serially and sharded (so worker stages have to be
+merged back), and checks the files it leaves behind. Also checks that each
+run replaces metrics.jsonl rather than appending to it.
+
+    python tests/run_profile_check.py
+"""
+
+import pstats
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from tests.checks import check, summary
+from tests.run_shard_check import write_inputs
+
+def evaluate(tmp: Path, out_dir: Path, *extra) -> None:
+    out_dir.mkdir()
+    subprocess.run([sys.executable, "-m", "src", "evaluate", "--fleet", str(tmp / "fleet.csv"), "--rules-dir",
+                    str(tmp), "--out", str(out_dir / "results.jsonl"), *extra],
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def main():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_inputs(tmp, n_ads=50, n_fleet=2000, seed=0)
+
+        evaluate(tmp, tmp / "off")
+        results.append(check("no profile output without --profile", not (tmp / "off" / "profile").exists()))
+
+        evaluate(tmp, tmp / "serial", "--profile")
+        profile = tmp / "serial" / "profile"
+        stages = {p.stem for p in profile.glob("*.prof")}
+        results.append(check(f"one dump per stage beside the output ({', '.join(sorted(stages))})",
+                             {"main", "rules_load", "index_build", "validation", "eval"} <= stages
+                             and stages == {p.stem for p in profile.glob("*.txt")}))
+        eval_stats = pstats.Stats(str(profile / "eval.prof"))
+        functions = {name for _, _, name in eval_stats.stats}
+        results.append(check("dumps load with pstats and show the evaluator's hot functions",
+                             {"normalize_mod", "affected_decisions"} <= functions))
+        report = (profile / "index_build.txt").read_text()
+        results.append(check("reports list top functions and allocation sites",
+                             "by cumulative time" in report and "by own time" in report
+                             and "KiB" in report.split("allocation sites")[1]))
+        results.append(check("validation is charged to its own stage, not to eval",
+                             "validate_fleet" not in functions
+                             and "validate_fleet" in (profile / "validation.txt").read_text()))
+
+        evaluate(tmp, tmp / "sharded", "--profile", "--workers", "2")
+        profile = tmp / "sharded" / "profile"
+        chunk_report = (profile / "eval_chunk.txt").read_text() if (profile / "eval_chunk.txt").exists() else ""
+        results.append(check("worker stages are merged into the parent's report",
+                             chunk_report.startswith("Stage eval_chunk: 1 occurrences")
+                             and "affected_decisions" in chunk_report and not (profile / "parts").exists()))
+        results.append(check("profiling does not change the results",
+                             (tmp / "sharded" / "results.jsonl").read_bytes()
+                             == (tmp / "off" / "results.jsonl").read_bytes()))
+
+    from src.metrics import timer
+    with timer("check"):
+        pass
+    results.append(check("with profiling off, timers never load cProfile", "cProfile" not in sys.modules))
+
+    from src.metrics import Metrics
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "metrics.jsonl"
+        for run in range(2):
+            metrics = Metrics()
+            for _ in range(2):
+                metrics.count("check")
+                metrics.write_jsonl(path)
+        results.append(check("metrics.jsonl holds the latest run's events only",
+                             len(path.read_text().splitlines()) == 2))
+
+    return summary(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Offline checks for src.service: answers match evaluate_aircraft, hot reload is atomic."""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.evaluation.evaluator import evaluate_aircraft, sample_fleet
+from src.models.schemas import ApplicabilityRule
+from src.service import QueryService, RuleSource, make_server
+from tests.checks import check, summary
+
+RULES = [
+    ApplicabilityRule(ad_id="FAA-2025-23-53", aircraft_models=["MD-11", "MD-11F"], extraction_method="text+llm",
+                      confidence=0.9),
+    ApplicabilityRule(ad_id="EASA-2025-0254", aircraft_models=["A320-214", "A321-111"], msn_range=(1, 8000),
+                      excluded_modifications=["mod 24591", "SB A320-57-1089"], extraction_method="text+llm",
+                      confidence=0.85),
+]
+
+def write_rules(rules_dir: Path, rules) -> None:
+    for rule in rules:
+        (rules_dir / f"{rule.ad_id}.json").write_text(json.dumps(rule.to_dict()))
+
+def post(base_url: str, path: str, body) -> dict:
+    request = urllib.request.Request(base_url + path, data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+def get(base_url: str, path: str) -> dict:
+    with urllib.request.urlopen(base_url + path) as response:
+        return json.loads(response.read())
+
+def main():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        rules_dir = Path(tmp)
+        write_rules(rules_dir, RULES)
+        service = QueryService(RuleSource(str(rules_dir)), poll_interval=0.1)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        service.start_watcher()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            fleet = sample_fleet()
+            answers = post(base_url, "/affected/batch?all=1", {"aircraft": [
+                {"id": str(i), "model": a.model, "msn": a.msn, "modifications": a.modifications}
+                for i, a in enumerate(fleet)]})["results"]
+            # Rules are served in ad_id order (as loaded from the directory)
+            same = all(
+                sorted((d["ad_id"], d["is_affected"], d["reason"]) for d in answer["decisions"]) ==
+                sorted((r.ad_id, evaluate_aircraft(a, r).is_affected, evaluate_aircraft(a, r).reason) for r in RULES)
+                for a, answer in zip(fleet, answers))
+            results.append(check(f"batch decisions match evaluate_aircraft ({len(fleet)} aircraft)", same))
+
+            single = post(base_url, "/affected", {"model": "A320-214", "msn": 4500, "modifications": []})
+            results.append(check("single query", [d["ad_id"] for d in single["decisions"]] == ["EASA-2025-0254"]))
+
+            try:
+                post(base_url, "/affected", {"model": "A320-214", "msn": -1})
+                rejected = False
+            except urllib.error.HTTPError as e:
+                rejected = e.code == 400
+            results.append(check("invalid aircraft rejected with 400", rejected))
+
+            # Hammer the service while the rules change underneath it
+            errors, generations = [], set()
+            stop = threading.Event()
+
+            def load():
+                while not stop.is_set():
+                    try:
+                        answer = post(base_url, "/affected", {"model": "MD-11F", "msn": 48400})
+                        ads = [d["ad_id"] for d in answer["decisions"]]
+                        # generation 0 has the FAA AD; later generations add FAA-2026-0001 as well
+                        expected = ["FAA-2025-23-53"] if answer["generation"] == 0 else ["FAA-2025-23-53", "FAA-2026-0001"]
+                        if sorted(ads) != expected:
+                            errors.append(answer)
+                        generations.add(answer["generation"])
+                    except Exception as e:
+                        errors.append(repr(e))
+
+            workers = [threading.Thread(target=load) for _ in range(4)]
+            for w in workers:
+                w.start()
+            time.sleep(0.3)
+            (rules_dir / "FAA-2026-0001.json").write_text('{"ad_id": "FAA-2026-0001", "aircraft_mo')  # half-written
+            time.sleep(0.3)
+            write_rules(rules_dir, [ApplicabilityRule(ad_id="FAA-2026-0001", aircraft_models=["MD-11F"],
+                                                      extraction_method="text+llm", confidence=0.9)])
+            deadline = time.time() + 5
+            while service.generation == 0 and time.time() < deadline:
+                time.sleep(0.05)
+            time.sleep(0.3)
+            stop.set()
+            for w in workers:
+                w.join()
+            health = get(base_url, "/health")
+            results.append(check(f"hot reload under load (generations {sorted(generations)}, "
+                                 f"{health['reload_errors']} failed reload kept the old index)",
+                                 not errors and health["generation"] == 1 and health["reload_errors"] >= 1))
+
+            stats = get(base_url, "/stats")
+            endpoint = stats["endpoints"]["/affected"]
+            print(f"  /affected: {endpoint['requests']} requests, p50 {endpoint['p50_ms']:.2f}ms, "
+                  f"p99 {endpoint['p99_ms']:.2f}ms, {stats['recent_requests_per_sec']:.0f} req/s recently")
+            results.append(check("stats", endpoint["requests"] > 0 and endpoint["errors"] == 1))
+        finally:
+            service.stop_watcher()
+            server.shutdown()
+            server.server_close()
+
+    return summary(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
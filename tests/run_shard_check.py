@@ -0,0 +1,117 @@
+"""Sharded fleet evaluation must produce exactly the serial output.
+
+Writes synthetic rules and a synthetic fleet (JSONL and CSV, some rows
+without an id), runs `python -m src evaluate` serially and with --workers,
+and compares the output files byte for byte. Also checks evaluate_fleet's
+sharded path and prints serial vs sharded throughput.
+
+    python tests/run_shard_check.py [--fleet 20000] [--ads 300] [--workers 4]
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from tests.checks import check, summary
+from tests.synthetic import generate_fleet, random_rule
+
+def write_inputs(tmp: Path, n_ads: int, n_fleet: int, seed: int):
+    rng = random.Random(seed)
+    rules = []
+    for n in range(n_ads):
+        rule = {"ad_id": f"SYN-{n:05d}", **random_rule(rng), "confidence": round(rng.uniform(0.6, 1.0), 2),
+                "extraction_method": "text+llm"}
+        rule["excluded_modifications"] = [f"mod {m}" for m in rule["excluded_modifications"]]
+        (tmp / f"SYN_{n:05d}.json").write_text(json.dumps(rule))
+        rules.append(rule)
+    mod_pool = sorted({m.split()[-1] for r in rules for m in r["excluded_modifications"]})
+    rows = generate_fleet(n_fleet, seed, mod_pool=mod_pool)
+    for row in rows[::7]:
+        row["id"] = ""  # numbered by row position
+    with open(tmp / "fleet.jsonl", 'w') as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    with open(tmp / "fleet.csv", 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "model", "msn", "modifications"])
+        for row in rows:
+            writer.writerow([row["id"], row["model"], row["msn"], ";".join(row["modifications"])])
+    return rules, rows
+
+def evaluate(tmp: Path, fleet: str, out: str, *extra) -> float:
+    cmd = [sys.executable, "-m", "src", "evaluate", "--fleet", str(tmp / fleet), "--rules-dir", str(tmp),
+           "--out", str(tmp / out), *extra]
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=ROOT, check=True, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded evaluation equivalence checks")
+    parser.add_argument("--fleet", type=int, default=20_000)
+    parser.add_argument("--ads", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    workers = str(args.workers)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        rules, rows = write_inputs(tmp, args.ads, args.fleet, args.seed)
+
+        timings = {}
+        for fleet, out, extra in [("fleet.jsonl", "affected.jsonl", ()), ("fleet.csv", "affected.csv", ()),
+                                  ("fleet.jsonl", "all.jsonl", ("--all-pairs",))]:
+            serial = evaluate(tmp, fleet, "serial-" + out, *extra)
+            sharded = evaluate(tmp, fleet, "sharded-" + out, "--workers", workers, *extra)
+            timings[out] = (serial, sharded)
+            same = (tmp / ("serial-" + out)).read_bytes() == (tmp / ("sharded-" + out)).read_bytes()
+            results.append(check(f"{out}: sharded output identical to serial ({args.workers} workers)", same))
+
+        from src.evaluation.index import RuleIndex, evaluate_fleet
+        from src.evaluation.sharded import write_sharded
+        from src.evaluation.stream import iter_fleet_rows, load_rules
+
+        index = RuleIndex(load_rules(str(tmp), validate=False))
+        n = write_sharded(iter_fleet_rows(str(tmp / "fleet.jsonl")), index, str(tmp / "odd.jsonl"),
+                          workers=3, chunk_size=97)
+        results.append(check("uneven chunks merge in fleet order",
+                             (tmp / "odd.jsonl").read_bytes() == (tmp / "serial-affected.jsonl").read_bytes()
+                             and n == len((tmp / "odd.jsonl").read_bytes().splitlines())))
+
+        bad = rows[:10] + [{"id": "BAD", "model": "A320-214", "msn": -1, "modifications": []}]
+        try:
+            write_sharded(iter(bad), index, str(tmp / "bad.jsonl"), workers=2, chunk_size=4)
+            raised = False
+        except ValueError as e:
+            raised = "fleet rows 9-11" in str(e)
+        results.append(check("an invalid row fails the run with its row numbers", raised))
+        import src.evaluation.sharded as sharded
+        results.append(check("the parent drops its rule index once each pool has shut down", sharded._INDEX is None))
+
+        from src.evaluation.evaluator import sample_fleet
+        from src.models.schemas import ApplicabilityRule
+        typed = {r["ad_id"]: ApplicabilityRule.from_dict(r) for r in rules[:50]}
+        fleet = sample_fleet() * 20
+        dump = lambda rs: [r.model_dump(exclude={"evaluated_at"}) for r in rs]
+        results.append(check("evaluate_fleet(workers=N) matches the serial results",
+                             dump(evaluate_fleet(fleet, typed, workers=3)) == dump(evaluate_fleet(fleet, typed))
+                             and dump(evaluate_fleet(fleet, typed, only_affected=True, workers=2))
+                             == dump(evaluate_fleet(fleet, typed, only_affected=True))))
+
+    print(f"\n{args.fleet:,} aircraft x {args.ads} ADs on {os.cpu_count()} cores:")
+    for out, (serial, sharded) in timings.items():
+        print(f"  {out:<16} serial {serial:6.2f}s   {args.workers} workers {sharded:6.2f}s   ({serial / sharded:.1f}x)")
+    return summary(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
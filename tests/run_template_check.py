@@ -0,0 +1,95 @@
+"""Offline checks for the template fast path: known phrasings hit, anything unusual goes to the LLM.
+
+Also scores the fast path on a synthetic validation set (tests/synthetic.py
+windows with ground truth, the stub server's answers standing in for the
+LLM) and prints the same hit-rate/agreement report as `python -m src templates`.
+
+    python tests/run_template_check.py [--ads 500]
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.metrics import set_quiet
+from src.parsing.template_parser import agreement, match_templates, print_report, validation_report
+from tests.checks import check, summary
+from tests.stub_llm_server import answer_for
+from tests.synthetic import applicability_lines, random_rule
+
+# (window, expected result or None for "must fall through to the LLM")
+CASES = [
+    ("Applicability:\nAirbus A320-211, -212, -214 aeroplanes, all manufacturer serial numbers (MSN), except\n"
+     "those on which Airbus modification 24591 has been embodied in production, or on which Service\n"
+     "Bulletin A320-57-1089 at Revision 04 has been embodied in service.",
+     {"aircraft_models": ["A320-211", "A320-212", "A320-214"], "msn_range": None,
+      "excluded_modifications": ["mod 24591", "SB A320-57-1089"]}),
+    ("(c) Applicability\nThis AD applies to The Boeing Company Model MD-11 and MD-11F airplanes, certificated\n"
+     "in any category.",
+     {"aircraft_models": ["MD-11", "MD-11F"], "msn_range": None, "excluded_modifications": []}),
+    ("1. Applicability\nThis AD applies to Model A321-\n271NX airplanes, MSN 1200 through 3400.",
+     {"aircraft_models": ["A321-271NX"], "msn_range": [1200, 3400], "excluded_modifications": []}),
+    ("Applicability:\nAirbus A330-202 aeroplanes, all MSN, except those on which modification 44205 or\n"
+     "44360 has been embodied.",
+     {"aircraft_models": ["A330-202"], "msn_range": None, "excluded_modifications": ["mod 44205", "mod 44360"]}),
+    # Both mods must be embodied for the exclusion: not expressible as an excluded_modifications list
+    ("Applicability:\nAirbus A330-202 aeroplanes, all MSN, except those on which modifications 44205 and\n"
+     "44360 have been embodied.", None),
+    ("Applicability:\nAirbus A320-214 aeroplanes, all MSN, except those on which modification 24591 has been\n"
+     "embodied in production, except 30000.", None),
+    ("Applicability:\nAirbus A320-214 aeroplanes, all MSN, except those on which modification 24591 has been\n"
+     "incorporated with 30000.", None),
+    ("(c) Applicability\nThis AD applies to Model 737-800 airplanes, certificated in any category, as identified\n"
+     "in Boeing Alert Service Bulletin 737-53A1234.", None),
+    ("Applicability:\nAirbus A318, A319, A320 and A321 aeroplanes, all variants, all manufacturer serial numbers.", None),
+    ("Applicability:\nAirbus A320-214 aeroplanes, all MSN, except those on which modification 24591 has not\n"
+     "been embodied.", None),
+    ("Applicability:\nAirbus A350-941 aeroplanes, all MSN.\nNote: AD 2024-0012 remains applicable.", None),
+    ("This AD applies to Model A320-214 airplanes, MSN 5000 to 3000.", None),
+    # A bare number is a model name, not a designator the template can vouch for
+    ("Applicability:\nBombardier 100 aeroplanes, all manufacturer serial numbers.", None),
+]
+
+def synthetic_windows(n_ads: int, seed: int):
+    """Synthetic windows with ground truth, and the stub 'LLM' answer for each as the reference."""
+    rng = random.Random(seed)
+    windows, truth = [], {}
+    for n in range(n_ads):
+        ad_id = f"SYN-{n:05d}"
+        rule = random_rule(rng)
+        heading = rng.choice(["(c) Applicability", "Applicability:", "1. Applicability"])
+        window = "\n".join([heading] + applicability_lines(rule))
+        windows.append((ad_id, window, answer_for(window)))
+        truth[ad_id] = rule
+    return windows, truth
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Template fast-path checks")
+    parser.add_argument("--ads", type=int, default=500, help="synthetic windows in the validation set")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    set_quiet()
+
+    results = []
+    for window, expected in CASES:
+        result = match_templates(window)
+        first_line = window.split("\n")[1 if "\n" in window else 0][:60]
+        if expected is None:
+            results.append(check(f"falls through: {first_line}", result is None))
+        else:
+            got = result and {k: result[k] for k in expected}
+            results.append(check(f"matches:      {first_line}", got == expected))
+
+    windows, truth = synthetic_windows(args.ads, args.seed)
+    wrong = [ad_id for ad_id, window, _ in windows
+             if (r := match_templates(window)) and not all(agreement(r, truth[ad_id]).values())]
+    results.append(check(f"no template answer contradicts ground truth ({len(windows)} synthetic ADs)", not wrong))
+
+    print()
+    print_report(validation_report(windows))
+    return summary(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Offline checks for per-page quality gating and the speculative VLM fallback.
+
+Builds mixed text/"scanned" PDFs (pages without a text layer) and runs them
+through the pipeline against tests/stub_llm_server.py, which answers image
+requests with a fixed rule. Checks which path each AD takes, that vision
+is spent only on failing pages, and that speculative vision overlaps the
+text path instead of running after it.
+
+    python tests/run_vision_check.py
+"""
+
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from tests.checks import check, summary
+from tests.stub_llm_server import start_stub
+from tests.synthetic import LINES_PER_PAGE, _filler, applicability_lines, write_pdf
+
+VISION_ANSWER = {"aircraft_models": ["A330-202"], "msn_range": [100, 900], "excluded_modifications": [],
+                 "confidence": 0.8, "raw_applicability_text": "Airbus A330-202 aeroplanes, MSN 100 to 900."}
+RULE = {"aircraft_models": ["A320-214"], "msn_range": None, "excluded_modifications": ["24591"]}
+
+def text_page(rng, title=None):
+    return ([title, ""] if title else []) + _filler(rng, LINES_PER_PAGE - 2)
+
+def write_ads(pdf_dir: Path, long_pages: int):
+    """ad_id -> pages; [] is a page with no text layer."""
+    rng = random.Random(0)
+    section = ["Applicability:"] + applicability_lines(RULE) + ["", "Reason:"]
+    ads = {
+        # Scanned cover page, applicability in the text layer: text path wins
+        "MIX-0001": [[], text_page(rng, "AIRWORTHINESS DIRECTIVE MIX-0001") + section, text_page(rng)],
+        # Applicability only on the scanned page: the VLM answer is used
+        "MIX-0002": [text_page(rng, "AIRWORTHINESS DIRECTIVE MIX-0002"), [],
+                     *[text_page(rng) for _ in range(long_pages)]],
+        # Fully scanned
+        "MIX-0003": [[], []],
+    }
+    for ad_id, pages in ads.items():
+        write_pdf(pdf_dir / f"{ad_id.replace('-', '_')}.pdf", pages)
+    return ads
+
+def run(pdf_dir: Path, out_dir: Path, vision: str):
+    from src.metrics import METRICS
+    from src.pipeline import process_directory
+
+    METRICS.drain()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results, failures = process_directory(str(pdf_dir), str(out_dir), workers=3, llm_concurrency=4,
+                                              force=True, vision=vision)
+    return results, failures, time.perf_counter() - start, METRICS.summary()["counters"]
+
+def main():
+    server, stub, base_url = start_stub(latency=2.0, vision_answer=VISION_ANSWER)
+    os.environ.update({"AD_LLM_BASE_URL": base_url, "AD_LLM_API_KEY": "stub", "AD_LLM_CACHE": "off",
+                       "AD_QUIET": "1", "AD_LLM_RPM": "100000", "AD_LLM_TPM": "100000000"})
+    from src.extraction.text_extractor import PAGE_QUALITY_THRESHOLD, score_page
+    from src.pipeline import ExtractionError, extract_ad_rules
+
+    results = []
+    results.append(check("blank and glyph-soup pages score below the threshold",
+                         score_page("") < PAGE_QUALITY_THRESHOLD
+                         and score_page("(cid:3)(cid:17) " * 40) < PAGE_QUALITY_THRESHOLD
+                         and score_page("This AD applies to Airbus A320 aeroplanes. " * 5) >= PAGE_QUALITY_THRESHOLD))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_dir = Path(tmp) / "raw"
+            pdf_dir.mkdir()
+            write_ads(pdf_dir, long_pages=30)
+
+            rules, failures, speculative_s, counters = run(pdf_dir, Path(tmp) / "spec", "speculative")
+            results.append(check("no AD fails", not failures))
+            results.append(check("text path wins when the section is in the text layer",
+                                 rules.get("MIX-0001") and rules["MIX-0001"].extraction_method != "vlm"))
+            mixed = rules.get("MIX-0002")
+            results.append(check("applicability on a scanned page comes from the VLM",
+                                 mixed and mixed.extraction_method == "vlm" and mixed.source_page == 2
+                                 and mixed.aircraft_models == VISION_ANSWER["aircraft_models"]))
+            results.append(check("fully scanned AD comes from the VLM",
+                                 rules.get("MIX-0003") and rules["MIX-0003"].extraction_method == "vlm"))
+            results.append(check("only failing pages go to vision (1 + 1 + 2 pages)",
+                                 counters.get("vision_pages") == 4))
+            from src.manifest import Manifest, file_sha256
+            manifest = Manifest(Path(tmp) / "spec")
+            plans = {ad_id: manifest.plan(ad_id, file_sha256(str(pdf_dir / f"{ad_id.replace('-', '_')}.pdf")),
+                                          "new-prompt") for ad_id in ("MIX-0001", "MIX-0002")}
+            results.append(check("after a prompt change, VLM windows are re-extracted, not replayed as text",
+                                 plans == {"MIX-0001": "llm", "MIX-0002": "full"}))
+
+            _, _, fallback_s, counters = run(pdf_dir, Path(tmp) / "fallback", "fallback")
+            results.append(check("fallback mode spends nothing on ADs the text path answers",
+                                 counters.get("vision_pages") == 3))
+            results.append(check("consecutive scanned pages share one VLM call (2 calls for 3 pages)",
+                                 counters.get("vision_calls") == 2))
+            results.append(check(f"speculative vision overlaps the text path "
+                                 f"({speculative_s:.1f}s vs {fallback_s:.1f}s in fallback mode)",
+                                 speculative_s < fallback_s - 1.0))
+
+            rules, failures, _, _ = run(pdf_dir, Path(tmp) / "off", "off")
+            results.append(check("with vision off, mixed ADs fail as before",
+                                 set(failures) == {"MIX-0002", "MIX-0003"}))
+
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                rule = extract_ad_rules(str(pdf_dir / "MIX_0002.pdf"), "MIX-0002")
+                try:
+                    extract_ad_rules(str(pdf_dir / "MIX_0003.pdf"), "MIX-0003", vision="off")
+                    raised = False
+                except ExtractionError:
+                    raised = True
+            results.append(check("single-AD path uses the same fallback", rule.extraction_method == "vlm" and raised))
+    finally:
+        server.shutdown()
+
+    return summary(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""Local OpenAI-compatible stub for exercising the LLM client and pipeline offline.
+
+Serves POST /chat/completions and GET /models (also under /v1/). Answers are
+deterministic JSON built from the prompt text: aircraft models, an MSN range
+and excluded mods are pulled out with regexes, per AD for batched prompts.
+Requests carrying page images get StubState.vision_answer if one is set
+(the stub cannot read images; without it they get "no applicability").
+
+    python tests/stub_llm_server.py --port 8765 --latency 0.05 --fail-every 5
+    AD_LLM_BASE_URL=http://127.0.0.1:8765 python -m src extract --batch
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+MODEL_RE = re.compile(r"\b(A3[0-9]{2}-[0-9]{3,4}[A-Z]{0,2}|A3[0-9]{2}[A-Z]*|MD-[0-9]+[A-Z]?|[0-9]{3}-[0-9]{3}[A-Z]{0,2})\b")
+MSN_RE = re.compile(r"\bMSN\s*(?:from\s*)?(\d+)\s*(?:to|through|-)\s*(\d+)", re.IGNORECASE)
+MOD_RE = re.compile(r"\b(?:mod(?:ification)?|SB)\s+([A-Z0-9][A-Z0-9-]*\d)", re.IGNORECASE)
+BATCH_ITEM_RE = re.compile(r"^=== ad_id: (.+?) ===$", re.MULTILINE)
+
+def _unique(values: List[str]) -> List[str]:
+    return list(dict.fromkeys(values))
+
+def answer_for(text: str) -> Dict:
+    msn = MSN_RE.search(text)
+    return {
+        "aircraft_models": _unique(MODEL_RE.findall(text)),
+        "msn_range": [int(msn.group(1)), int(msn.group(2))] if msn else None,
+        "excluded_modifications": _unique(m.group(0) for m in MOD_RE.finditer(text)),
+        "confidence": 0.9,
+        "raw_applicability_text": text.strip()[:200],
+    }
+
+def answer_prompt(prompt: str) -> Dict:
+    parts = BATCH_ITEM_RE.split(prompt)
+    if len(parts) == 1:
+        return answer_for(prompt)
+    # parts = [preamble, id1, text1, id2, text2, ...]
+    return {ad_id: answer_for(text) for ad_id, text in zip(parts[1::2], parts[2::2])}
+
+def _has_images(messages: List[Dict]) -> bool:
+    return any(isinstance(m.get("content"), list) and any(p.get("type") == "image_url" for p in m["content"])
+               for m in messages)
+
+def _prompt_text(messages: List[Dict]) -> str:
+    chunks = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            chunks.append(content)
+        elif isinstance(content, list):
+            chunks.extend(p.get("text", "") for p in content if p.get("type") == "text")
+    return "\n".join(chunks)
+
+class StubState:
+    """Knobs and counters shared by all handler threads."""
+
+    def __init__(self, latency: float = 0.0, fail_every: int = 0, fail_status: int = 429,
+                 retry_after: Optional[float] = 1.0, vision_answer: Optional[Dict] = None):
+        self.latency = latency
+        self.vision_answer = vision_answer
+        self.vision_requests = 0
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        # Failures to return before anything else, e.g. to trip the breaker
+        self.fail_next = 0
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            fail = self.fail_next > 0 or (self.fail_every and self.requests % self.fail_every == 0)
+            if self.fail_next > 0:
+                self.fail_next -= 1
+            if fail:
+                self.failures += 1
+            return bool(fail)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: StubState = StubState()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (per-call timeout); nothing to answer
+            self.close_connection = True
+
+    def _path(self) -> str:
+        path = self.path.split("?", 1)[0]
+        return path[3:] if path.startswith("/v1/") else path
+
+    def do_GET(self):
+        if self._path() == "/models":
+            self._send(200, {"object": "list", "data": [
+                {"id": "stub-model", "object": "model", "created": 0, "owned_by": "stub"}]})
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self._path() != "/chat/completions":
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        state = self.state
+        if state.latency:
+            time.sleep(state.latency)
+        if state.should_fail():
+            headers = {}
+            if state.retry_after is not None:
+                headers["Retry-After"] = f"{state.retry_after:g}"
+            self._send(state.fail_status, {"error": {"message": "stub failure", "type": "rate_limit"}}, headers)
+            return
+
+        messages = request.get("messages", [])
+        prompt = _prompt_text(messages)
+        if _has_images(messages):
+            with state.lock:
+                state.vision_requests += 1
+        if _has_images(messages) and state.vision_answer is not None:
+            content = json.dumps(state.vision_answer)
+        else:
+            content = json.dumps(answer_prompt(prompt))
+        prompt_tokens = (len(prompt) + 3) // 4
+        completion_tokens = (len(content) + 3) // 4
+        self._send(200, {
+            "id": f"stub-{state.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub-model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, **state_kwargs):
+    """Start the stub on a daemon thread; returns (server, state, base_url)."""
+    state = StubState(**state_kwargs)
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each answer")
+    parser.add_argument("--fail-every", type=int, default=0, help="Fail every Nth request (0 = never)")
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server, _, base_url = start_stub(args.host, args.port, latency=args.latency, fail_every=args.fail_every,
+                                     fail_status=args.fail_status, retry_after=args.retry_after)
+    print(f"Stub LLM server on {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Synthetic AD PDFs and fleets for benchmarks (no PDF library needed to write them)."""
+
+import random
+import textwrap
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MODEL_FAMILIES = {
+    "A320": ["A319-112", "A319-132", "A320-214", "A320-232", "A320-251N", "A321-211", "A321-271NX"],
+    "A330": ["A330-202", "A330-243", "A330-343", "A330-941"],
+    "A350": ["A350-941", "A350-1041"],
+    "MD-11": ["MD-11", "MD-11F"],
+    "737": ["737-700", "737-800", "737-900ER"],
+}
+MODELS = [m for family in MODEL_FAMILIES.values() for m in family]
+
+FILLER = (
+    "This AD was prompted by reports of cracking found during scheduled maintenance. "
+    "The operator must inspect the affected structure at the intervals specified and "
+    "accomplish the applicable corrective actions before further flight. Compliance "
+    "with the service information referenced in this AD is required unless already done. "
+    "Alternative methods of compliance may be approved by the Manager of the certification office. "
+)
+
+LINES_PER_PAGE = 56
+LINE_WIDTH = 95
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, pages: List[List[str]]) -> None:
+    """Minimal text-only PDF: one Helvetica content stream per page."""
+    objs: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objs.append(body)
+        return len(objs)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objs) + 2 * len(pages) + 1
+    page_ids = []
+    for lines in pages:
+        ops = ["BT", "/F1 9 Tf", "13 TL", "40 800 Td"]
+        ops.extend(f"({_escape(line)}) Tj T*" for line in lines)
+        ops.append("ET")
+        data = "\n".join(ops).encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(data), data))
+        page_ids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+                            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    assert add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))) == pages_id
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, catalog, xref)
+    Path(path).write_bytes(bytes(out))
+
+def _paginate(lines: List[str]) -> List[List[str]]:
+    return [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+def _filler(rng: random.Random, n_lines: int) -> List[str]:
+    text = " ".join(FILLER for _ in range(n_lines * LINE_WIDTH // len(FILLER) + 1))
+    start = rng.randrange(len(FILLER))
+    return textwrap.wrap(text[start:], LINE_WIDTH)[:n_lines]
+
+def random_rule(rng: random.Random) -> Dict:
+    family = rng.choice(list(MODEL_FAMILIES))
+    models = rng.sample(MODEL_FAMILIES[family], rng.randint(1, len(MODEL_FAMILIES[family])))
+    low = rng.randrange(1, 8000)
+    msn_range = [low, low + rng.randrange(100, 4000)] if rng.random() < 0.7 else None
+    mods = [str(rng.randrange(10000, 99999)) for _ in range(rng.randint(0, 3))]
+    return {"aircraft_models": models, "msn_range": msn_range, "excluded_modifications": mods}
+
+def applicability_lines(rule: Dict) -> List[str]:
+    sentence = f"This AD applies to Model {', '.join(rule['aircraft_models'])} airplanes"
+    if rule["msn_range"]:
+        sentence += f", MSN {rule['msn_range'][0]} to {rule['msn_range'][1]}"
+    else:
+        sentence += ", all manufacturer serial numbers"
+    if rule["excluded_modifications"]:
+        sentence += ", except those on which " + " or ".join(f"mod {m}" for m in rule["excluded_modifications"])
+        sentence += " has been embodied in production"
+    return textwrap.wrap(sentence + ".", LINE_WIDTH)
+
+def ad_pages(ad_id: str, rule: Dict, rng: random.Random, layout: str, n_pages: int) -> List[List[str]]:
+    """Text lines per page for one AD in one of three layouts.
+
+    faa:  lettered paragraphs, "(c) Applicability" after a short intro
+    easa: "Applicability:" block after a table of contents and a cover page
+    late: applicability buried after several pages of discussion
+    """
+    body = applicability_lines(rule)
+    lines = [f"AIRWORTHINESS DIRECTIVE {ad_id}", ""]
+    if layout == "faa":
+        lines += ["(a) Effective Date", f"This AD is effective {rng.randint(1, 28)} March 2025.", "",
+                  "(b) Affected ADs", "None.", "", "(c) Applicability"] + body
+        lines += ["", "(d) Subject", "Air Transport Association (ATA) of America Code 53, Fuselage.", "",
+                  "(e) Unsafe Condition"]
+    elif layout == "easa":
+        lines += ["Contents", "Applicability ........ 1", "Reason ........ 2", "Required Action(s) ........ 2"]
+        lines += _filler(rng, LINES_PER_PAGE - len(lines))
+        lines += ["Applicability:"] + body + ["", "Reason:"]
+    else:
+        lines += ["Discussion"] + _filler(rng, LINES_PER_PAGE * max(1, n_pages // 2))
+        lines += ["", "1. Applicability"] + body + ["", "2. Reason"]
+    target = LINES_PER_PAGE * n_pages
+    lines += _filler(rng, max(LINES_PER_PAGE // 2, target - len(lines)))
+    return _paginate(lines)
+
+def generate_corpus(out_dir, n_ads: int, seed: int = 0, min_pages: int = 1,
+                    max_pages: int = 12) -> Dict[str, Dict]:
+    """Write n_ads PDFs to out_dir; returns the ground-truth rule per ad_id."""
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    truth = {}
+    for n in range(n_ads):
+        authority = rng.choice(["FAA", "EASA"])
+        ad_id = f"{authority}-2025-{n:05d}"
+        rule = random_rule(rng)
+        layout = rng.choice(["faa", "easa", "late"])
+        pages = ad_pages(ad_id, rule, rng, layout, rng.randint(min_pages, max_pages))
+        write_pdf(out_dir / f"{ad_id.replace('-', '_')}.pdf", pages)
+        truth[ad_id] = rule
+    return truth
+
+def generate_fleet(n_aircraft: int, seed: int = 0, mods_per_aircraft: Tuple[int, int] = (0, 6),
+                   mod_pool: Optional[List[str]] = None) -> List[Dict]:
+    """Raw fleet rows (id, model, msn, modifications) as stream.iter_fleet_rows yields them."""
+    rng = random.Random(seed)
+    mod_pool = mod_pool or [str(rng.randrange(10000, 99999)) for _ in range(500)]
+    rows = []
+    for n in range(1, n_aircraft + 1):
+        mods = [f"mod {m}" for m in rng.sample(mod_pool, rng.randint(*mods_per_aircraft))]
+        rows.append({"id": f"AC{n:06d}", "model": rng.choice(MODELS), "msn": rng.randrange(1, 12000),
+                     "modifications": mods})
+    return rows